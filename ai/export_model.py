@@ -0,0 +1,60 @@
+import argparse
+import os
+
+import joblib
+import numpy as np
+
+def export_forest(model, path, feature_columns=None):
+    """Flatten a fitted RandomForestRegressor into NumPy arrays saved as .npz
+
+    All trees are concatenated into one node table. Child indices are global,
+    and leaves point at themselves, so an evaluator can descend every tree
+    in lockstep for `max_depth` steps. The backend loads this file without
+    scikit-learn (see backend/tree_ensemble.py). The input column names are
+    taken from `feature_columns`, else from the model if it was fitted on a
+    DataFrame.
+    """
+    if feature_columns is None:
+        feature_columns = getattr(model, "feature_names_in_", [])
+    features, thresholds, lefts, rights, values, missing_left, roots = [], [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        values.append(tree.value[:, 0, 0])
+        # NaN routing (scikit-learn >= 1.3); older trees send NaN right
+        missing_left.append(
+            tree.missing_go_to_left.astype(bool) if hasattr(tree, "missing_go_to_left")
+            else np.zeros(tree.node_count, dtype=bool)
+        )
+        offset += tree.node_count
+
+    np.savez_compressed(
+        path,
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        value=np.concatenate(values).astype(np.float64),
+        missing_left=np.concatenate(missing_left),
+        roots=np.array(roots, dtype=np.int32),
+        max_depth=np.int32(max(estimator.tree_.max_depth for estimator in model.estimators_)),
+        n_features=np.int32(model.n_features_in_),
+        feature_columns=np.array(list(feature_columns), dtype=str)
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a pickled forest to the compact .npz format")
+    parser.add_argument("--model", default=os.path.join("model", "regressor.pkl"))
+    parser.add_argument("--output", default=os.path.join("model", "regressor.npz"))
+    args = parser.parse_args()
+
+    export_forest(joblib.load(args.model), args.output)
+    print(f"Exported {args.model} to {args.output}")
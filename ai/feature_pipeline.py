@@ -0,0 +1,94 @@
+"""Feature pipeline shared by training (train_model.py) and serving (backend).
+
+Both sides turn raw maintenance records into the model's input matrix with
+`build_features`, so a column can only be added, removed or reordered here,
+and doing so changes FEATURE_SCHEMA_ID. Models carry their column list
+(see export_model.py) and the backend refuses to serve one whose columns
+differ from FEATURE_COLUMNS.
+"""
+import hashlib
+from typing import Any
+
+import numpy as np
+
+# Raw numeric inputs, in model column order
+NUMERIC_FEATURES = (
+    "pressure",
+    "max_pressure",
+    "flow_rate",
+    "temperature",
+    "age_days",
+    "last_maintenance_days",
+    "num_past_maintenances",
+    "pressure_loss",
+)
+
+# Missing values here mean "none recorded"
+ZERO_FILLED = ("num_past_maintenances", "pressure_loss")
+
+# Every other numeric gap takes the median of the bundled training history
+# (ai/data/maintenance_prediction_data.csv), which has no gaps in these
+# columns. Live components do have them (pipes carry no pressure or
+# temperature, nodes without readings no temperature), and the forest must
+# never see a NaN that no training row had.
+MEDIAN_FILLED = {
+    "pressure": 2.275,
+    "max_pressure": 3.515,
+    "flow_rate": 779.1,
+    "temperature": 25.2,
+    "age_days": 2547.0,
+    "last_maintenance_days": 355.0,
+}
+
+# One-hot encoded with the first value as the dropped baseline; values
+# outside the vocabulary (or missing) encode like the baseline
+MATERIALS = ("concrete", "copper", "pvc", "steel")
+STATUSES = ("active", "leak", "maintenance", "offline", "operational")
+CATEGORICAL_FEATURES = (("material", MATERIALS), ("status", STATUSES))
+
+FEATURE_COLUMNS = NUMERIC_FEATURES + tuple(
+    f"{name}_{value}" for name, vocabulary in CATEGORICAL_FEATURES for value in vocabulary[1:]
+)
+FEATURE_SCHEMA_ID = hashlib.sha1(",".join(FEATURE_COLUMNS).encode()).hexdigest()[:12]
+
+# Raw columns a record batch must provide
+RAW_COLUMNS = NUMERIC_FEATURES + tuple(name for name, _ in CATEGORICAL_FEATURES)
+
+def _category_index(column: Any, vocabulary: tuple) -> np.ndarray:
+    """Position of each value in `vocabulary` (0, the baseline, when absent)"""
+    if hasattr(column, "cat"):
+        # pandas categorical: translate the handful of categories, then the codes
+        lookup = np.array(
+            [0] + [vocabulary.index(c) if c in vocabulary else 0 for c in column.cat.categories],
+            dtype=np.intp
+        )
+        return lookup[column.cat.codes.to_numpy() + 1]
+
+    values = np.asarray(column, dtype=object)
+    index = np.zeros(len(values), dtype=np.intp)
+    for position, value in enumerate(vocabulary[1:], start=1):
+        index[values == value] = position
+    return index
+
+def build_features(records: Any) -> np.ndarray:
+    """(rows, len(FEATURE_COLUMNS)) float32 matrix from a batch of raw records.
+
+    `records` is anything indexable by the RAW_COLUMNS names that yields
+    equal-length columns: a pandas DataFrame, a NumPy structured/record
+    array, or a dict of arrays. Numeric columns may hold NaN; the matrix
+    never does.
+    """
+    rows = len(records[NUMERIC_FEATURES[0]])
+    X = np.zeros((rows, len(FEATURE_COLUMNS)), dtype=np.float32)
+
+    for i, name in enumerate(NUMERIC_FEATURES):
+        X[:, i] = np.asarray(records[name], dtype=np.float32)
+        np.nan_to_num(X[:, i], copy=False, nan=0.0 if name in ZERO_FILLED else MEDIAN_FILLED[name])
+
+    offset = len(NUMERIC_FEATURES)
+    for name, vocabulary in CATEGORICAL_FEATURES:
+        index = _category_index(records[name], vocabulary)
+        encoded = index > 0
+        X[np.flatnonzero(encoded), offset + index[encoded] - 1] = 1.0
+        offset += len(vocabulary) - 1
+    return X
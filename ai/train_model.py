@@ -1,39 +1,195 @@
+"""Train the maintenance regressor and save it as a new model version.
+
+Examples (from the ai directory):
+    python train_model.py
+    python train_model.py --data history.parquet --n-jobs -1 --search 20 --cv 3
+"""
+import argparse
+import json
+import os
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import joblib
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
-import joblib
-import os
+from sklearn.model_selection import RandomizedSearchCV, train_test_split
+
+from export_model import export_forest
+from feature_pipeline import (
+    CATEGORICAL_FEATURES, FEATURE_COLUMNS, FEATURE_SCHEMA_ID, NUMERIC_FEATURES, build_features
+)
+
+AI_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TARGET = "next_maintenance_days"
+
+# Categoricals get fixed categories so every chunk reads the same way
+DTYPES = {
+    **{name: "float32" for name in NUMERIC_FEATURES},
+    **{name: pd.CategoricalDtype(vocabulary) for name, vocabulary in CATEGORICAL_FEATURES},
+    TARGET: "float32",
+}
+
+# Sampled by --search; max_samples bounds the rows each tree sees on large histories
+PARAM_DISTRIBUTIONS = {
+    "n_estimators": [100, 200, 400],
+    "max_depth": [None, 12, 20, 30],
+    "min_samples_leaf": [1, 2, 5, 10],
+    "max_features": [1.0, 0.5, "sqrt"],
+    "max_samples": [None, 0.5, 0.25],
+}
+
+class Report:
+    """Wall-clock time and peak traced memory per pipeline stage"""
+
+    def __init__(self):
+        self.stages = []
+        tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        self.stages.append({"stage": name, "seconds": round(elapsed, 3), "peak_mb": round(peak / 1e6, 1)})
+        print(f"[{name}] {elapsed:.2f}s, peak traced memory {peak / 1e6:.1f} MB")
+
+    def summary(self) -> dict:
+        # ru_maxrss is in KB on Linux; children are joblib workers that have exited
+        return {
+            "stages": self.stages,
+            "total_seconds": round(sum(stage["seconds"] for stage in self.stages), 3),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "max_rss_children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        }
+
+def iter_chunks(path: str, chunksize: int):
+    """DataFrames of at most `chunksize` rows from a CSV or Parquet file"""
+    columns = list(DTYPES)
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas().astype(DTYPES)
+    else:
+        yield from pd.read_csv(path, usecols=columns, dtype=DTYPES, chunksize=chunksize)
+
+def load_dataset(path: str, chunksize: int):
+    """Stream the file chunk by chunk, keeping only the encoded float32 arrays"""
+    features, targets = [], []
+    for chunk in iter_chunks(path, chunksize):
+        features.append(build_features(chunk))
+        targets.append(chunk[TARGET].to_numpy(dtype=np.float32))
+    if not features:
+        raise SystemExit(f"No rows in {path}")
+    return np.concatenate(features), np.concatenate(targets)
+
+def search_hyperparameters(X, y, iterations: int, folds: int, n_jobs: int, random_state: int) -> dict:
+    """Randomized cross-validated search; candidates run in parallel, each on one core"""
+    search = RandomizedSearchCV(
+        RandomForestRegressor(random_state=random_state, n_jobs=1),
+        PARAM_DISTRIBUTIONS,
+        n_iter=iterations,
+        cv=folds,
+        scoring="neg_mean_absolute_error",
+        n_jobs=n_jobs,
+        random_state=random_state,
+    )
+    search.fit(X, y)
+    print(f"Best CV MAE {-search.best_score_:.3f} with {search.best_params_}")
+    return search.best_params_
+
+def save_model(model, output_dir: str, metadata: dict) -> str:
+    """Write a new model version (pickle, compiled export, metadata); returns its name"""
+    # The backend serves the newest version on startup and can switch to it
+    # while running via POST /admin/models/<version>/activate
+    version = datetime.now().strftime("%Y%m%d-%H%M%S")
+    version_dir = os.path.join(output_dir, version)
+    os.makedirs(version_dir, exist_ok=True)
+    joblib.dump(model, os.path.join(version_dir, "regressor.pkl"))
+
+    # Flattened copy the backend evaluates with NumPy alone
+    export_forest(model, os.path.join(version_dir, "regressor.npz"), FEATURE_COLUMNS)
+    with open(os.path.join(version_dir, "metadata.json"), "w") as f:
+        json.dump({
+            "version": version,
+            "features": list(FEATURE_COLUMNS),
+            "feature_schema": FEATURE_SCHEMA_ID,
+            **metadata
+        }, f, indent=2)
+    print(f"Model version {version} saved to {version_dir}")
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=os.path.join(AI_DIR, "data", "maintenance_prediction_data.csv"),
+                        help="CSV or .parquet file")
+    parser.add_argument("--chunksize", type=int, default=250_000, help="rows read per chunk")
+    parser.add_argument("--output-dir", default=os.path.join(AI_DIR, "model"))
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores for fitting and search (-1 = all)")
+    parser.add_argument("--search", type=int, default=0, metavar="N",
+                        help="sample N hyperparameter sets with cross-validation (0 = use defaults)")
+    parser.add_argument("--cv", type=int, default=3, help="cross-validation folds for --search")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--random-state", type=int, default=42)
+    args = parser.parse_args()
 
-# Load dataset
-data_path = os.path.join("data", "maintenance_prediction_data.csv")
-df = pd.read_csv(data_path)
+    report = Report()
+    with report.stage("load"):
+        X, y = load_dataset(args.data, args.chunksize)
+    print(f"Loaded {len(X):,} rows x {X.shape[1]} features ({X.nbytes / 1e6:.1f} MB)")
 
-# Preprocess
-# Fill missing values with 0 or an appropriate value
-df['pressure_loss'] = df['pressure_loss'].fillna(0)  # Fill missing pressure_loss with 0
-df['num_past_maintenances'] = df['num_past_maintenances'].fillna(0)  # Fill missing values with 0
+    with report.stage("split"):
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=args.test_size, random_state=args.random_state
+        )
+        del X, y
 
-# One-hot encode categorical variables
-df = pd.get_dummies(df, columns=["material", "status"], drop_first=True)
+    params = {"n_estimators": args.n_estimators}
+    if args.search:
+        with report.stage("search"):
+            params = search_hyperparameters(
+                X_train, y_train, args.search, args.cv, args.n_jobs, args.random_state
+            )
 
-# Features and target
-X = df.drop(columns=["next_maintenance_days", "entity_id", "entity_type"])  # Drop target and non-feature columns
-y = df["next_maintenance_days"]
+    with report.stage("fit"):
+        model = RandomForestRegressor(**params, random_state=args.random_state, n_jobs=args.n_jobs)
+        model.fit(X_train, y_train)
 
-# Train/test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    with report.stage("evaluate"):
+        preds = model.predict(X_test)
+        metrics = {"mae": float(mean_absolute_error(y_test, preds)), "r2": float(r2_score(y_test, preds))}
+    print("MAE:", metrics["mae"])
+    print("R²:", metrics["r2"])
 
-# Train model
-model = RandomForestRegressor(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
+    # Inference runs single-threaded in the backend
+    model.set_params(n_jobs=None)
+    with report.stage("save"):
+        summary = report.summary()
+        save_model(model, args.output_dir, {
+            "params": params,
+            "metrics": metrics,
+            "train_rows": len(X_train),
+            "data": os.path.abspath(args.data),
+            "training": summary,
+        })
 
-# Evaluate
-preds = model.predict(X_test)
-print("MAE:", mean_absolute_error(y_test, preds))
-print("R²:", r2_score(y_test, preds))
+    summary = report.summary()
+    print(
+        f"Total {summary['total_seconds']:.2f}s, "
+        f"max RSS {summary['max_rss_mb']:.1f} MB (workers {summary['max_rss_children_mb']:.1f} MB)"
+    )
 
-# Save model
-os.makedirs("model", exist_ok=True)
-joblib.dump(model, os.path.join("model", "regressor.pkl"))
-print("Model saved to model/regressor.pkl")
+if __name__ == "__main__":
+    main()
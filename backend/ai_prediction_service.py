@@ -1,30 +1,77 @@
-import joblib
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, Optional
-import os
+from typing import Dict, List, Optional
+import hashlib
+
+from prediction_cache import prediction_cache
+from model_registry import model_registry
+# Importable once model_registry has put ai/ on sys.path
+from feature_pipeline import build_features
+
+# Per-type lookup tables, indexed by TYPE_CODES (the last slot is for unknown types)
+COMPONENT_TYPES = ['pump', 'valve', 'sensor', 'junction', 'pipe']
+TYPE_CODES = {component_type: code for code, component_type in enumerate(COMPONENT_TYPES)}
+UNKNOWN_TYPE = len(COMPONENT_TYPES)
+
+def _type_table(values: Dict, default) -> np.ndarray:
+    return np.array([values.get(t, default) for t in COMPONENT_TYPES] + [default])
+
+DEFAULT_AGE_YEARS = _type_table({'pump': 8.0, 'valve': 12.0, 'sensor': 5.0, 'junction': 15.0, 'pipe': 10.0}, 10.0)
+ESTIMATED_CAPACITY = _type_table({'pump': 2000, 'junction': 1500, 'valve': 1000, 'sensor': 800}, 1000)
+DEFAULT_INSPECTION_DAYS = _type_table({'pump': 90, 'valve': 180, 'sensor': 365, 'junction': 270, 'pipe': 365}, 365)
+ANNUAL_MAINTENANCE = _type_table({'pump': 2, 'valve': 1, 'sensor': 1.5, 'junction': 0.5, 'pipe': 0.3}, 1)
+TYPE_CONFIDENCE = _type_table({'pump': 0.9, 'valve': 0.85, 'pipe': 0.9, 'sensor': 0.75, 'junction': 0.8}, 0.8)
+# Confidence before the interval and type adjustments (every batch row has the full feature vector)
+BASE_CONFIDENCE = 0.9
+TYPE_MAINTENANCE = _type_table({
+    'pump': "calibration",
+    'valve': "inspection",
+    'sensor': "calibration",
+    'junction': "inspection",
+    'pipe': "routine_inspection"
+}, "routine_inspection").astype(object)
+BASE_COSTS_INR = _type_table({
+    'pump': 200000.0,      # ₹2,00,000
+    'valve': 65000.0,      # ₹65,000
+    'sensor': 32000.0,     # ₹32,000
+    'junction': 95000.0,   # ₹95,000
+    'pipe': 12000.0        # ₹12,000 per meter
+}, 80000.0)
+MATERIAL_COST_MULTIPLIERS = {'steel': 1.0, 'pvc': 0.8, 'concrete': 1.3, 'cast_iron': 1.4}
+
+# Live statuses outside the training vocabulary, mapped to their closest equivalent
+MODEL_STATUS_ALIASES = {'damaged': 'leak', 'unreported': 'offline', 'demand': 'active'}
+
+def _number(value) -> float:
+    return np.nan if value is None else float(value)
+
+def _days_since(value, now: datetime) -> float:
+    """Whole days between a datetime/ISO string and now; NaN when unknown"""
+    if not value:
+        return np.nan
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return float((now - value.replace(tzinfo=None)).days)
+
+def _take(batch: Dict, rows: np.ndarray) -> Dict:
+    """Select a subset of rows from every column of a feature batch"""
+    return {
+        key: column[rows] if isinstance(column, np.ndarray) else [column[i] for i in rows]
+        for key, column in batch.items()
+    }
 
 class UniversalMaintenancePredictionService:
     """Enhanced service to predict maintenance dates for any component type using AI model"""
     
     def __init__(self):
-        self.model = None
-        self.model_path = os.path.join("..", "ai", "model", "regressor.pkl")
-        self.load_model()
+        # Artifacts are resolved (and loaded on first use) by the registry
+        self.registry = model_registry
     
-    def load_model(self):
-        """Load the trained model"""
-        try:
-            if os.path.exists(self.model_path):
-                self.model = joblib.load(self.model_path)
-                print("AI maintenance prediction model loaded successfully")
-            else:
-                print(f"Model file not found at {self.model_path}")
-                self.model = None
-        except Exception as e:
-            print(f"Error loading model: {e}")
-            self.model = None
+    def feature_rows(self, components: List[Dict]) -> np.ndarray:
+        """Model input matrix for components, e.g. to warm up a candidate model"""
+        if not components:
+            return np.empty((0, 0))
+        return self._prepare_feature_batch(components)["features"]
     
     def predict_maintenance_date(self, component_data: Dict) -> Dict:
         """
@@ -36,108 +83,272 @@ class UniversalMaintenancePredictionService:
         Returns:
             Dictionary with prediction results
         """
-        if not self.model:
-            return self._fallback_prediction(component_data)
+        return self.predict_maintenance_batch([component_data])[0]
+    
+    def predict_maintenance_batch(self, components: List[Dict]) -> List[Dict]:
+        """
+        Predict next maintenance dates for many components with one model call
         
-        try:
-            # Prepare features for the model
-            features = self._prepare_universal_features(component_data)
-            
-            print(f"Prepared {len(features)} features for prediction: {features}")
-            
-            # Make prediction (returns days until next maintenance)
-            days_until_maintenance = self.model.predict([features])[0]
-            
-            # Ensure reasonable bounds
-            days_until_maintenance = max(7, min(730, days_until_maintenance))
-            
-            # Calculate the actual date
-            next_maintenance_date = datetime.now() + timedelta(days=int(days_until_maintenance))
+        Features, priority, confidence and cost are computed column-wise over
+        the whole batch; only the per-component strings are assembled in Python.
+        
+        Args:
+            components: Component dictionaries (pipes and nodes may be mixed)
             
-            # Determine priority based on days until maintenance
-            priority = self._calculate_priority(days_until_maintenance)
+        Returns:
+            Prediction dictionaries in the same order as `components`
+        """
+        if not components:
+            return []
+        active = self.registry.active()
+        if active is None:
+            return [self._fallback_prediction(component) for component in components]
+        
+        try:
+            batch = self._prepare_feature_batch(components)
+            feature_hashes = [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in batch["features"]]
             
-            # Get confidence score
-            confidence = self._calculate_confidence(features, days_until_maintenance, component_data)
+            # Serve unchanged components from the cache, predict the rest in one call
+            results: List[Optional[Dict]] = [
+                prediction_cache.get(component["id"], feature_hash, active.generation) if component.get("id") else None
+                for component, feature_hash in zip(components, feature_hashes)
+            ]
+            misses = np.array([i for i, result in enumerate(results) if result is None], dtype=np.intp)
+            if len(misses):
+                for i, prediction in zip(misses, self._predict_rows(active.model, _take(batch, misses))):
+                    results[i] = prediction
+                    if components[i].get("id"):
+                        prediction_cache.put(components[i]["id"], feature_hashes[i], active.generation, prediction)
             
-            return {
-                "next_maintenance_date": next_maintenance_date.isoformat(),
-                "days_until_maintenance": int(days_until_maintenance),
-                "priority": priority,
-                "confidence": confidence,
-                "prediction_source": "ai_model",
-                "maintenance_type": self._recommend_maintenance_type(component_data, days_until_maintenance),
-                "estimated_cost": self._estimate_cost_inr(component_data, days_until_maintenance),
-                "factors": self._identify_key_factors(features, component_data)
-            }
+            # The date is relative to today, so it is derived on every read
+            now = datetime.now()
+            return [
+                {
+                    "next_maintenance_date": (now + timedelta(days=result["days_until_maintenance"])).isoformat(),
+                    **result
+                }
+                for result in results
+            ]
             
         except Exception as e:
             print(f"Error in AI prediction: {e}")
-            return self._fallback_prediction(component_data)
+            return [self._fallback_prediction(component) for component in components]
     
-    def _prepare_universal_features(self, component_data: Dict) -> np.ndarray:
-        """Prepare features for the AI model based on any component data"""
-        
-        # Calculate age in years
-        age_years = self._calculate_age(component_data)
-        
-        # Calculate utilization ratio (works for both pipes and nodes)
-        utilization_ratio = self._calculate_utilization(component_data)
-        
-        # Calculate days since last inspection/maintenance
-        days_since_inspection = self._calculate_days_since_inspection(component_data)
-        
-        # Get component size/capacity metric
-        size_metric = self._get_size_metric(component_data)
-        
-        # Get flow metrics
-        current_flow, flow_capacity = self._get_flow_metrics(component_data)
-        
-        # Get pressure loss (or equivalent stress metric)
-        pressure_loss = self._get_pressure_loss(component_data)
-        
-        # Base features (matching the training data structure - 15 features total)
-        features = [
-            age_years,                    # age_years
-            size_metric,                  # length (or equivalent size)
-            self._get_diameter_equivalent(component_data),  # diameter equivalent
-            current_flow,                 # current_flow
-            flow_capacity,                # flow_capacity  
-            pressure_loss,                # pressure_loss
-            utilization_ratio,            # utilization_ratio
-            days_since_inspection,        # days_since_inspection
-            self._get_maintenance_count(component_data)  # num_past_maintenances
+    def _predict_rows(self, model, batch: Dict) -> List[Dict]:
+        """Run the model over a feature batch and derive the per-component outputs"""
+        # Make prediction (returns days until next maintenance), with reasonable bounds
+        days = np.clip(model.predict(batch["features"]), 7, 730)
+        whole_days = days.astype(np.int64)
+        
+        priority = np.select([days < 30, days < 90], ["high", "medium"], "low")
+        confidence = self._calculate_confidence_batch(days, batch["type_codes"])
+        cost = self._estimate_cost_inr_batch(batch, days)
+        maintenance_type = self._recommend_maintenance_type_batch(batch, days)
+        factors = self._identify_key_factors_batch(batch)
+        
+        return [
+            {
+                "days_until_maintenance": int(whole_days[i]),
+                "priority": str(priority[i]),
+                "confidence": float(confidence[i]),
+                "prediction_source": "ai_model",
+                "maintenance_type": maintenance_type[i],
+                "estimated_cost": float(cost[i]),
+                "factors": factors[i]
+            }
+            for i in range(len(whole_days))
         ]
+    
+    def _prepare_feature_batch(self, components: List[Dict]) -> Dict[str, np.ndarray]:
+        """Build the model's feature matrix plus the columns later steps reuse
         
-        # Material encoding (one-hot encoded features) - 3 features
-        material = self._get_material_equivalent(component_data)
-        material_concrete = 1 if material == 'concrete' else 0
-        material_pvc = 1 if material == 'pvc' else 0
-        material_steel = 1 if material == 'steel' else 0
-        
-        # Status encoding - 2 features
-        status = component_data.get('status', 'operational').lower()
-        status_maintenance = 1 if status in ['maintenance', 'offline'] else 0
-        status_operational = 1 if status in ['operational', 'active'] else 0
-        
-        # Add encoded features (total should be 15)
-        features.extend([
-            material_concrete,      # 10
-            material_pvc,          # 11
-            material_steel,        # 12
-            status_maintenance,    # 13
-            status_operational     # 14
+        Components are mapped to the raw record columns of the shared feature
+        pipeline (the same columns the training data has). A component may
+        carry any of those columns directly; otherwise they are derived from
+        the live pipe/node fields.
+        """
+        now = datetime.now()
+        type_codes = np.array(
+            [TYPE_CODES.get(c.get('type', 'unknown'), UNKNOWN_TYPE) for c in components],
+            dtype=np.intp
+        )
+        
+        def column(key: str) -> np.ndarray:
+            # Missing and None become NaN so "not provided" stays distinguishable from 0
+            return np.array([_number(c.get(key)) for c in components], dtype=np.float64)
+        
+        def truthy(values: np.ndarray) -> np.ndarray:
+            return ~np.isnan(values) & (values != 0)
+        
+        def given_or(key: str, derived: np.ndarray) -> np.ndarray:
+            given = column(key)
+            return np.where(np.isnan(given), derived, given)
+        
+        length = column('length')
+        current_flow = column('current_flow')
+        flow_capacity = column('flow_capacity')
+        flow_rate = column('flow_rate')
+        pressure = column('pressure')
+        max_pressure = column('max_pressure')
+        
+        # Age (type default when the installation date is unknown)
+        installed_days_ago = np.array([_days_since(c.get('installation_date'), now) for c in components])
+        age_days = given_or('age_days', np.where(
+            np.isnan(installed_days_ago),
+            DEFAULT_AGE_YEARS[type_codes] * 365.25,
+            np.maximum(0, installed_days_ago)
+        ))
+        age_years = age_days / 365.25
+        
+        # Utilization ratio: pipe flow, then node pressure, then node flow rate
+        with np.errstate(divide='ignore', invalid='ignore'):
+            utilization = np.select(
+                [
+                    truthy(current_flow) & truthy(flow_capacity),
+                    truthy(pressure) & truthy(max_pressure),
+                    truthy(flow_rate)
+                ],
+                [
+                    np.minimum(1.0, current_flow / flow_capacity),
+                    np.minimum(1.0, pressure / max_pressure),
+                    np.minimum(1.0, flow_rate / ESTIMATED_CAPACITY[type_codes])
+                ],
+                0.5
+            )
+        
+        # Days since last inspection/maintenance
+        inspected_days_ago = np.array([
+            _days_since(c.get('last_maintenance') or c.get('last_inspection') or c.get('last_updated'), now)
+            for c in components
         ])
+        days_since_inspection = given_or('last_maintenance_days', np.where(
+            np.isnan(inspected_days_ago),
+            DEFAULT_INSPECTION_DAYS[type_codes],
+            np.maximum(0, inspected_days_ago)
+        ))
+        
+        # Real history (see maintenance_history.py) when given, else estimated from age and type
+        past_maintenances = given_or('num_past_maintenances', np.floor(age_years * ANNUAL_MAINTENANCE[type_codes]))
+        
+        materials = np.array([self._get_material_equivalent(c) for c in components])
+        statuses = np.array([(c.get('status') or 'operational').lower() for c in components])
+        
+        features = build_features({
+            'pressure': pressure,
+            'max_pressure': max_pressure,
+            # Pipes report their flow as current_flow
+            'flow_rate': np.where(np.isnan(flow_rate), current_flow, flow_rate),
+            'temperature': column('temperature'),
+            'age_days': age_days,
+            'last_maintenance_days': days_since_inspection,
+            'num_past_maintenances': past_maintenances,
+            'pressure_loss': column('pressure_loss'),
+            'material': materials,
+            'status': np.array([MODEL_STATUS_ALIASES.get(status, status) for status in statuses], dtype=object)
+        })
         
-        # Ensure we have exactly 15 features
-        if len(features) != 15:
-            print(f"Warning: Expected 15 features, got {len(features)}")
-            # Pad or trim to 15 features
-            while len(features) < 15:
-                features.append(0.0)
-            features = features[:15]
+        return {
+            "features": features,
+            "type_codes": type_codes,
+            "age_years": age_years,
+            "utilization": utilization,
+            "days_since_inspection": days_since_inspection,
+            "past_maintenances": past_maintenances,
+            "length": length,
+            "types": [c.get('type', 'unknown') for c in components],
+            "materials": materials,
+            "statuses": statuses
+        }
+    
+    def _calculate_confidence_batch(self, days: np.ndarray, type_codes: np.ndarray) -> np.ndarray:
+        """Confidence scores for a batch of predictions"""
+        confidence = BASE_CONFIDENCE + np.select(
+            [(days >= 30) & (days <= 365), (days < 30) | (days > 730)],  # reasonable vs extreme intervals
+            [0.05, -0.2],
+            0.0
+        )
+        # Blend with how predictable the component type is
+        confidence = (confidence + TYPE_CONFIDENCE[type_codes]) / 2
+        return np.clip(confidence, 0.5, 0.95)
+    
+    def _recommend_maintenance_type_batch(self, batch: Dict, days: np.ndarray) -> List[str]:
+        """Maintenance type for each component from status, urgency and age"""
+        statuses = batch["statuses"]
+        recommended = np.select(
+            [
+                np.isin(statuses, ['damaged', 'offline']),
+                statuses == 'maintenance',
+                days < 30,
+                batch["age_years"] > 15
+            ],
+            ["repair", "replacement", "urgent_inspection", "replacement_assessment"],
+            "type_specific"
+        ).astype(object)
+        type_specific = recommended == "type_specific"
+        recommended[type_specific] = TYPE_MAINTENANCE[batch["type_codes"][type_specific]]
+        return recommended.tolist()
+    
+    def _estimate_cost_inr_batch(self, batch: Dict, days: np.ndarray) -> np.ndarray:
+        """Estimated maintenance cost in Indian Rupees for each component"""
+        type_codes = batch["type_codes"]
+        length = batch["length"]
+        base_cost = BASE_COSTS_INR[type_codes]
         
-        return np.array(features, dtype=np.float64)
+        # For pipes, cost is per km of length
+        per_length = (type_codes == TYPE_CODES['pipe']) & ~np.isnan(length) & (length != 0)
+        base_cost = np.where(per_length, base_cost * length / 1000.0, base_cost)
+        
+        # Emergency work costs more
+        urgency_multiplier = np.select([days < 30, days < 90], [1.5, 1.2], 1.0)
+        material_multiplier = np.array([MATERIAL_COST_MULTIPLIERS.get(m, 1.0) for m in batch["materials"]])
+        
+        return np.round(base_cost * urgency_multiplier * material_multiplier, 2)
+    
+    def _identify_key_factors_batch(self, batch: Dict) -> List[list]:
+        """Key factors influencing each prediction"""
+        age_years = batch["age_years"]
+        utilization = batch["utilization"]
+        days_since_inspection = batch["days_since_inspection"]
+        demanding_material = np.isin(batch["materials"], ['cast_iron', 'concrete'])
+        needs_attention = np.isin(batch["statuses"], ['maintenance', 'damaged', 'offline'])
+        
+        all_factors = []
+        for i, component_type in enumerate(batch["types"]):
+            factors = []
+            
+            if age_years[i] > 15:
+                factors.append(f"High {component_type} age ({age_years[i]:.1f} years)")
+            elif age_years[i] > 10:
+                factors.append(f"Moderate {component_type} age ({age_years[i]:.1f} years)")
+            
+            if utilization[i] > 0.8:
+                factors.append("High utilization stress")
+            elif utilization[i] < 0.3:
+                factors.append("Low utilization efficiency")
+            
+            if days_since_inspection[i] > 365:
+                factors.append("Overdue inspection")
+            elif days_since_inspection[i] > 180:
+                factors.append("Inspection due soon")
+            
+            if batch["past_maintenances"][i] >= 3:
+                factors.append(f"Frequent past maintenance ({int(batch['past_maintenances'][i])} completed jobs)")
+            
+            if demanding_material[i]:
+                factors.append("Material requires frequent maintenance")
+            if needs_attention[i]:
+                factors.append("Current status requires attention")
+            
+            # Component-specific factors
+            if component_type == 'pump':
+                factors.append("Critical infrastructure component")
+            elif component_type == 'sensor':
+                factors.append("Precision equipment requiring calibration")
+            elif component_type == 'valve':
+                factors.append("Mechanical component with wear parts")
+            
+            all_factors.append(factors if factors else ["Normal operating conditions"])
+        return all_factors
     
     def _calculate_age(self, component_data: Dict) -> float:
         """Calculate component age in years"""
@@ -159,110 +370,6 @@ class UniversalMaintenancePredictionService:
         }
         return default_ages.get(component_type, 10.0)
     
-    def _calculate_utilization(self, component_data: Dict) -> float:
-        """Calculate utilization ratio for any component"""
-        # For pipes
-        if component_data.get('current_flow') and component_data.get('flow_capacity'):
-            return min(1.0, component_data['current_flow'] / component_data['flow_capacity'])
-        
-        # For nodes with pressure
-        if component_data.get('pressure') and component_data.get('max_pressure'):
-            return min(1.0, component_data['pressure'] / component_data['max_pressure'])
-        
-        # For nodes with flow rate
-        if component_data.get('flow_rate'):
-            # Estimate capacity based on component type
-            component_type = component_data.get('type', 'unknown')
-            estimated_capacity = {
-                'pump': 2000,
-                'junction': 1500,
-                'valve': 1000,
-                'sensor': 800
-            }.get(component_type, 1000)
-            return min(1.0, component_data['flow_rate'] / estimated_capacity)
-        
-        return 0.5  # Default moderate utilization
-    
-    def _calculate_days_since_inspection(self, component_data: Dict) -> float:
-        """Calculate days since last inspection"""
-        last_inspection = component_data.get('last_inspection') or component_data.get('last_updated')
-        if last_inspection:
-            if isinstance(last_inspection, str):
-                last_inspection = datetime.fromisoformat(last_inspection.replace('Z', '+00:00'))
-            days = (datetime.now() - last_inspection.replace(tzinfo=None)).days
-            return max(0, days)
-        
-        # Default based on component type
-        component_type = component_data.get('type', 'unknown')
-        default_days = {
-            'pump': 90,
-            'valve': 180,
-            'sensor': 365,
-            'junction': 270,
-            'pipe': 365
-        }
-        return default_days.get(component_type, 365)
-    
-    def _get_size_metric(self, component_data: Dict) -> float:
-        """Get size metric (length for pipes, equivalent for nodes)"""
-        if component_data.get('length'):
-            return component_data['length']
-        
-        # For nodes, use a size equivalent based on type
-        component_type = component_data.get('type', 'unknown')
-        size_equivalents = {
-            'pump': 5000,      # Large equipment
-            'junction': 2000,   # Medium infrastructure
-            'valve': 1000,      # Smaller equipment
-            'sensor': 500       # Small equipment
-        }
-        return size_equivalents.get(component_type, 1000)
-    
-    def _get_flow_metrics(self, component_data: Dict) -> tuple:
-        """Get current flow and flow capacity"""
-        current_flow = component_data.get('current_flow', 0)
-        flow_capacity = component_data.get('flow_capacity', 0)
-        
-        # For nodes, use flow_rate as current_flow and estimate capacity
-        if not current_flow and component_data.get('flow_rate'):
-            current_flow = component_data['flow_rate']
-            
-        if not flow_capacity and current_flow:
-            # Estimate capacity based on current flow and component type
-            component_type = component_data.get('type', 'unknown')
-            capacity_multipliers = {
-                'pump': 1.5,
-                'junction': 1.3,
-                'valve': 1.2,
-                'sensor': 1.1
-            }
-            multiplier = capacity_multipliers.get(component_type, 1.2)
-            flow_capacity = current_flow * multiplier
-        
-        return current_flow or 500, flow_capacity or 1000
-    
-    def _get_pressure_loss(self, component_data: Dict) -> float:
-        """Get pressure loss or equivalent stress metric"""
-        if component_data.get('pressure_loss'):
-            return component_data['pressure_loss']
-        
-        # For nodes, calculate stress based on pressure utilization
-        if component_data.get('pressure') and component_data.get('max_pressure'):
-            utilization = component_data['pressure'] / component_data['max_pressure']
-            return utilization * 0.3  # Convert to pressure loss equivalent
-        
-        return 0.1  # Default low pressure loss
-    
-    def _get_diameter_equivalent(self, component_data: Dict) -> float:
-        """Get diameter or equivalent size metric"""
-        if component_data.get('diameter'):
-            return component_data['diameter']
-        
-        # For nodes, estimate diameter based on flow capacity
-        flow_capacity = component_data.get('flow_capacity') or component_data.get('flow_rate', 500)
-        # Rough estimation: larger flow = larger diameter
-        return min(500, max(100, flow_capacity / 5))
-    
     def _get_material_equivalent(self, component_data: Dict) -> str:
         """Get material or equivalent for nodes"""
         if component_data.get('material'):
@@ -278,25 +385,6 @@ class UniversalMaintenancePredictionService:
         }
         return type_materials.get(component_type, 'steel')
     
-    def _get_maintenance_count(self, component_data: Dict) -> int:
-        """Get or estimate past maintenance count"""
-        # This would ideally come from maintenance history
-        # For now, estimate based on age and component type
-        age_years = self._calculate_age(component_data)
-        component_type = component_data.get('type', 'unknown')
-        
-        # Estimate maintenance frequency per year by type
-        annual_maintenance = {
-            'pump': 2,      # High maintenance
-            'valve': 1,     # Medium maintenance
-            'sensor': 1.5,  # Medium-high maintenance
-            'junction': 0.5, # Low maintenance
-            'pipe': 0.3     # Very low maintenance
-        }
-        
-        frequency = annual_maintenance.get(component_type, 1)
-        return int(age_years * frequency)
-    
     def _calculate_priority(self, days_until: float) -> str:
         """Calculate maintenance priority based on days until maintenance"""
         if days_until < 30:
@@ -306,35 +394,6 @@ class UniversalMaintenancePredictionService:
         else:
             return "low"
     
-    def _calculate_confidence(self, features: np.ndarray, prediction: float, component_data: Dict) -> float:
-        """Calculate confidence score for the prediction"""
-        confidence = 0.8
-        
-        # Adjust based on data completeness
-        if len(features) == 15:  # All features present
-            confidence += 0.1
-        
-        # Adjust based on prediction reasonableness
-        if 30 <= prediction <= 365:  # Reasonable maintenance interval
-            confidence += 0.05
-        elif prediction < 30 or prediction > 730:  # Extreme values
-            confidence -= 0.2
-        
-        # Adjust based on component type (some are more predictable)
-        component_type = component_data.get('type', 'unknown')
-        type_confidence = {
-            'pump': 0.9,      # Very predictable
-            'valve': 0.85,    # Quite predictable
-            'pipe': 0.9,      # Very predictable (trained on pipes)
-            'sensor': 0.75,   # Less predictable
-            'junction': 0.8   # Moderately predictable
-        }
-        
-        base_confidence = type_confidence.get(component_type, 0.8)
-        confidence = (confidence + base_confidence) / 2
-        
-        return max(0.5, min(0.95, confidence))
-    
     def _recommend_maintenance_type(self, component_data: Dict, days_until: float) -> str:
         """Recommend type of maintenance based on component data and urgency"""
         status = component_data.get('status', 'operational').lower()
@@ -400,55 +459,6 @@ class UniversalMaintenancePredictionService:
         
         return round(total_cost, 2)
     
-    def _identify_key_factors(self, features: np.ndarray, component_data: Dict) -> list:
-        """Identify key factors influencing the maintenance prediction"""
-        factors = []
-        component_type = component_data.get('type', 'unknown')
-        
-        # Age factor
-        if len(features) > 0:
-            age_years = features[0]
-            if age_years > 15:
-                factors.append(f"High {component_type} age ({age_years:.1f} years)")
-            elif age_years > 10:
-                factors.append(f"Moderate {component_type} age ({age_years:.1f} years)")
-        
-        # Utilization factor
-        if len(features) > 6:
-            utilization = features[6]
-            if utilization > 0.8:
-                factors.append("High utilization stress")
-            elif utilization < 0.3:
-                factors.append("Low utilization efficiency")
-        
-        # Inspection factor
-        if len(features) > 7:
-            days_since_inspection = features[7]
-            if days_since_inspection > 365:
-                factors.append("Overdue inspection")
-            elif days_since_inspection > 180:
-                factors.append("Inspection due soon")
-        
-        # Material factor
-        material = self._get_material_equivalent(component_data)
-        if material in ['cast_iron', 'concrete']:
-            factors.append("Material requires frequent maintenance")
-        
-        # Status factor
-        status = component_data.get('status', 'operational').lower()
-        if status in ['maintenance', 'damaged', 'offline']:
-            factors.append("Current status requires attention")
-        
-        # Component-specific factors
-        if component_type == 'pump':
-            factors.append("Critical infrastructure component")
-        elif component_type == 'sensor':
-            factors.append("Precision equipment requiring calibration")
-        elif component_type == 'valve':
-            factors.append("Mechanical component with wear parts")
-        
-        return factors if factors else ["Normal operating conditions"]
-    
     def _fallback_prediction(self, component_data: Dict) -> Dict:
         """Fallback prediction when AI model is not available"""
         component_type = component_data.get('type', 'pipe')
@@ -0,0 +1,114 @@
+"""Serialization benchmark: per-row JSON against MessagePack column tables.
+
+Builds synthetic pipe rows and /graph entries in memory and times the
+JSON the endpoints send by default (Core rows, and the /graph snapshot
+built from a graph index) against the MessagePack column tables sent for
+`Accept: application/x-msgpack`. Reports sizes raw and gzipped. Run from
+the backend directory:
+    python benchmarks/bench_columnar.py --rows 100000
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import msgpack
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from columnar import MSGPACK, packb, table
+from graph_cache import index_body
+from graph_index import GraphIndex, graph_node, graph_edge
+from json_encoder import rows_json
+from schemas import PipeResponse
+
+# Stands in for the Core rows of get_pipe_rows: a tuple with named fields
+PipeRow = namedtuple("PipeRow", list(PipeResponse.model_fields))
+
+def pipe_rows(count: int):
+    rng = np.random.default_rng(0)
+    installed = datetime(2015, 1, 1)
+    return [
+        PipeRow(
+            id=f"PIPE-{i:06d}", source_node_id=f"NODE-{rng.integers(count):06d}", target_node_id=f"NODE-{rng.integers(count):06d}",
+            length=float(rng.uniform(100, 5000)), diameter=float(rng.choice([100, 150, 200, 300])),
+            material=str(rng.choice(["steel", "pvc", "concrete", "cast_iron"])), flow_capacity=float(rng.uniform(500, 3000)),
+            current_flow=float(rng.uniform(0, 3000)), pressure_loss=float(rng.uniform(0, 1)), status="operational",
+            installation_date=installed + timedelta(days=int(rng.integers(3000))), last_inspection=None
+        )
+        for i in range(count)
+    ]
+
+def graph(count: int) -> GraphIndex:
+    rng = np.random.default_rng(1)
+    index = GraphIndex()
+    for i in range(count):
+        node = SimpleNamespace(
+            id=f"NODE-{i:06d}", name=f"Node {i}", type=str(rng.choice(["pump", "valve", "sensor", "junction"])),
+            pressure=float(rng.uniform(1, 4)), status="active", flow_rate=500.0,
+            latitude=float(rng.uniform(8, 35)), longitude=float(rng.uniform(68, 97))
+        )
+        index.apply_node(node, graph_node(node))
+    for i in range(int(count * 1.5)):
+        pipe = SimpleNamespace(
+            id=f"PIPE-{i:06d}", source_node_id=f"NODE-{rng.integers(count):06d}", target_node_id=f"NODE-{rng.integers(count):06d}",
+            length=float(rng.uniform(100, 5000)), current_flow=float(rng.uniform(0, 3000)), flow_capacity=2500.0
+        )
+        index.apply_edge(graph_edge(pipe))
+    return index
+
+def decoded(table: dict) -> list:
+    """Rows of a MessagePack column table, to check it against the JSON entries"""
+    columns = {}
+    for name, dtype in table["dtypes"].items():
+        column = table["columns"][name]
+        if dtype == "dictionary":
+            column = [column["dictionary"][i] for i in np.frombuffer(column["indices"], dtype="<i4")]
+        elif dtype == "float64":
+            column = np.frombuffer(column, dtype="<f8").tolist()
+        columns[name] = column
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    for row in rows:
+        if "position.x" in row:
+            row["position"] = {"x": row.pop("position.x"), "y": row.pop("position.y")}
+    return sorted(rows, key=lambda row: row["id"])
+
+def timed(encode):
+    start = time.perf_counter()
+    body = encode()
+    return time.perf_counter() - start, body
+
+def report(label: str, rows: int, seconds: float, body: bytes):
+    print(f"{label:<22} {seconds * 1000:9.1f} ms  {rows / seconds:>12,.0f} rows/s  "
+          f"{len(body) / 1024:>9,.0f} KiB  ({len(gzip.compress(body, 6)) / 1024:,.0f} KiB gzipped)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    pipes = pipe_rows(args.rows)
+    seconds, body = timed(lambda: rows_json(pipes))
+    report("/pipes JSON", len(pipes), seconds, body)
+    seconds, body = timed(lambda: packb(table(PipeResponse, pipes, ("material", "status"))))
+    report("/pipes MessagePack", len(pipes), seconds, body)
+
+    index = graph(args.rows)
+    rows = len(index.node_ids) + len(index.pipe_ids)
+    seconds, body = timed(lambda: index_body(index))
+    report("/graph JSON", rows, seconds, body)
+    seconds, body = timed(lambda: index_body(index, MSGPACK))
+    report("/graph MessagePack", rows, seconds, body)
+    tables = msgpack.unpackb(body)
+    same = json.loads(index_body(index)) == {"nodes": decoded(tables["nodes"]), "edges": decoded(tables["edges"])}
+    print("/graph bodies hold the same entries" if same else "/graph bodies DIFFER")
+    sys.exit(0 if same else 1)
+
+if __name__ == "__main__":
+    main()
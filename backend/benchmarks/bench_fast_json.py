@@ -0,0 +1,104 @@
+"""List read throughput: ORM objects and Pydantic validation against Core rows and direct JSON encoding.
+
+Seeds a throwaway SQLite database with synthetic pipes and times the
+previous /pipes path (ORM objects validated through PipeResponse) against
+the current one (Core select tuples encoded with orjson, or the standard
+library without it), for the streamed full list and one keyset page,
+checking that the bodies are identical. Run from the backend directory:
+    python benchmarks/bench_fast_json.py --pipes 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+
+from database import Base, SessionLocal
+from models import Pipe
+from schemas import PipeResponse
+from crud import get_pipes, get_pipe_rows, iter_pipes, iter_pipe_rows
+from pagination import stream_query, stream_rows
+from json_encoder import orjson, rows_json
+
+def seed(engine, pipes: int, chunk: int = 50_000):
+    installed = datetime(2015, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, pipes, chunk):
+            conn.execute(insert(Pipe), [
+                {
+                    "id": f"PIPE-{i:06d}",
+                    "source_node_id": f"NODE-{random.randint(1, pipes):06d}",
+                    "target_node_id": f"NODE-{random.randint(1, pipes):06d}",
+                    "length": random.uniform(100, 5000),
+                    "diameter": random.choice([100.0, 150.0, 200.0, 300.0]),
+                    "material": random.choice(["steel", "pvc", "concrete", "cast_iron"]),
+                    "flow_capacity": random.uniform(500, 3000),
+                    "current_flow": random.uniform(0, 3000),
+                    "pressure_loss": random.uniform(0, 1),
+                    "status": "operational",
+                    "installation_date": installed + timedelta(days=random.randint(0, 3000), seconds=random.randint(0, 86400)),
+                    "last_inspection": None if random.random() < 0.2 else installed + timedelta(days=random.randint(3000, 4000))
+                }
+                for i in range(offset, min(offset + chunk, pipes))
+            ])
+
+def timed(label: str, rows: int, run, repeat: int):
+    best, body = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = run()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<34} {best * 1000:9.1f} ms  {rows / best:12,.0f} rows/s  {len(body) / 1e6:6.1f} MB")
+    return best, body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pipes", type=int, default=100_000)
+    parser.add_argument("--page", type=int, default=1000, help="keyset page size")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench_fast_json.db")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        # stream_query and stream_rows open their sessions from SessionLocal
+        SessionLocal.configure(bind=engine)
+        try:
+            measure(engine, path, args)
+        finally:
+            engine.dispose()
+
+def measure(engine, path: str, args):
+    Base.metadata.create_all(bind=engine)
+    seed(engine, args.pipes)
+    print(f"{args.pipes} pipes in {path}; encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+
+    print("\nFull list (streamed)")
+    before, old = timed("ORM + PipeResponse validation", args.pipes, lambda: b"".join(stream_query(iter_pipes, PipeResponse)), args.repeat)
+    after, new = timed("Core rows + direct encoding", args.pipes, lambda: b"".join(stream_rows(iter_pipe_rows)), args.repeat)
+    assert old == new, "streamed bodies differ"
+    print(f"speedup {before / after:.1f}x")
+
+    print(f"\nOne page of {args.page}")
+    adapter = TypeAdapter(list[PipeResponse])
+    db = SessionLocal()
+    after_id = f"PIPE-{args.pipes // 2:06d}"
+    before, old = timed(
+        "ORM + PipeResponse validation", args.page,
+        lambda: adapter.dump_json(adapter.validate_python(get_pipes(db, after=after_id, limit=args.page), from_attributes=True)),
+        args.repeat * 10
+    )
+    after, new = timed("Core rows + direct encoding", args.page, lambda: rows_json(get_pipe_rows(db, after=after_id, limit=args.page)), args.repeat * 10)
+    db.close()
+    assert old == new, "page bodies differ"
+    print(f"speedup {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Feature construction benchmark: the shared pipeline against the original get_dummies encoding.
+
+Times the bundled training CSV, resampled to --rows, through each input
+form the pipeline accepts and through the serving path (component dicts).
+Training/serving parity is checked by tests/test_feature_pipeline.py.
+Run from the backend directory:
+    python benchmarks/bench_features.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import AI_DIR
+from feature_pipeline import RAW_COLUMNS, build_features
+from ai_prediction_service import maintenance_predictor
+from train_model import TARGET
+
+DATA_PATH = os.path.join(AI_DIR, "data", "maintenance_prediction_data.csv")
+
+def legacy_features(df: pd.DataFrame) -> pd.DataFrame:
+    """The encoding train_model.py used before the shared pipeline"""
+    df = df.copy()
+    df["pressure_loss"] = df["pressure_loss"].fillna(0)
+    df["num_past_maintenances"] = df["num_past_maintenances"].fillna(0)
+    df = pd.get_dummies(df, columns=["material", "status"], drop_first=True)
+    return df.drop(columns=[TARGET, "entity_id", "entity_type"])
+
+def timed(label: str, rows: int, fn) -> float:
+    fn()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {rows:>9,} rows  {elapsed * 1000:9.1f} ms  {rows / elapsed:>13,.0f} rows/s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows for the pipeline benchmark")
+    parser.add_argument("--components", type=int, default=10_000, help="component dicts for the serving benchmark")
+    args = parser.parse_args()
+
+    raw = pd.read_csv(DATA_PATH)
+    big = raw.sample(args.rows, replace=True, random_state=0).reset_index(drop=True)
+    categorical = big.astype({
+        "material": pd.CategoricalDtype(sorted(big["material"].unique())),
+        "status": pd.CategoricalDtype(sorted(big["status"].unique()))
+    })
+    records = big[list(RAW_COLUMNS)].to_records(index=False)
+
+    timed("legacy get_dummies", args.rows, lambda: legacy_features(big).to_numpy(dtype=np.float32))
+    timed("pipeline (DataFrame)", args.rows, lambda: build_features(big))
+    timed("pipeline (categorical)", args.rows, lambda: build_features(categorical))
+    timed("pipeline (record array)", args.rows, lambda: build_features(records))
+
+    components = [
+        {"id": row["entity_id"], "type": row["entity_type"], **{c: row[c] for c in RAW_COLUMNS}}
+        for row in big.head(args.components).to_dict("records")
+    ]
+    timed("serving feature batch", len(components), lambda: maintenance_predictor._prepare_feature_batch(components))
+
+if __name__ == "__main__":
+    main()
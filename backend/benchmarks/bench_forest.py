@@ -0,0 +1,74 @@
+"""Latency benchmark: scikit-learn forest vs the compiled NumPy evaluator.
+
+Needs both ai/model/regressor.pkl and its export (python ai/export_model.py).
+Run from the backend directory:
+    python benchmarks/bench_forest.py --rows 1 10 100 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tree_ensemble import CompiledForest
+from model_registry import BATCH_MODEL_ROWS
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "ai", "model")
+
+def load(label: str, loader, path: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = loader(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<9} load {elapsed * 1000:9.1f} ms  peak {peak / 1e6:7.1f} MB  file {os.path.getsize(path) / 1e6:6.1f} MB")
+    return model
+
+def make_rows(count: int, n_features: int) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    X = rng.uniform(0, 1, (count, n_features))
+    # Rough ranges of the continuous features; the rest are 0/1 flags
+    X[:, :9] *= [30, 5000, 500, 2000, 2000, 1, 1.5, 800, 20][:min(9, n_features)]
+    X[:, 9:] = X[:, 9:] > 0.5
+    return X
+
+def time_predict(predict, X: np.ndarray, budget: float = 1.0) -> float:
+    predict(X)
+    runs, start = 0, time.perf_counter()
+    while time.perf_counter() - start < budget:
+        predict(X)
+        runs += 1
+    return (time.perf_counter() - start) / runs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+
+    sklearn_model = load("sklearn", joblib.load, os.path.join(args.model_dir, "regressor.pkl"))
+    compiled = load("compiled", CompiledForest.load, os.path.join(args.model_dir, "regressor.npz"))
+    print(f"compiled arrays {compiled.nbytes / 1e6:.1f} MB, {compiled.n_trees} trees")
+
+    # The pickled model remembers feature names; plain arrays are fine here
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    for count in args.rows:
+        X = make_rows(count, compiled.n_features_in_)
+        mismatch = np.abs(sklearn_model.predict(X) - compiled.predict(X)).max()
+        sklearn_seconds = time_predict(sklearn_model.predict, X)
+        compiled_seconds = time_predict(compiled.predict, X)
+        print(
+            f"{count:>6} rows  sklearn {sklearn_seconds * 1000:9.2f} ms  compiled {compiled_seconds * 1000:9.2f} ms"
+            f"  speedup {sklearn_seconds / compiled_seconds:6.1f}x  max diff {mismatch:.2e}"
+            f"  served by {'sklearn' if BATCH_MODEL_ROWS and count >= BATCH_MODEL_ROWS else 'compiled'}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Graph index benchmark: build, incremental updates and traversal.
+
+Seeds a throwaway SQLite database with a random network. It times a
+breadth-first search over the ORM relationships (`source_pipes`/
+`target_pipes`, one lazy load per node) against the same search over the
+index's CSR arrays, checking that both visit the same nodes. It also times
+the /graph snapshot build from the ORM and from the index. Run from the
+backend directory:
+    python benchmarks/bench_graph_index.py --nodes 100000 --pipes 150000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import PipeNode, Pipe
+from graph_index import GraphIndex, gather, graph_node, graph_edge
+
+def seed(engine, nodes: int, pipes: int):
+    rng = np.random.default_rng(0)
+    # A spanning tree plus random extra pipes between nearby ids
+    sources = np.r_[rng.integers(0, np.arange(1, nodes)), rng.integers(0, nodes, max(pipes - nodes + 1, 0))]
+    targets = np.r_[np.arange(1, nodes), np.clip(sources[nodes - 1:] + rng.integers(-50, 50, len(sources) - nodes + 1), 0, nodes - 1)]
+    with engine.begin() as conn:
+        conn.execute(insert(PipeNode), [
+            {"id": f"NODE-{i:06d}", "name": f"Node {i}", "type": "junction", "pressure": 3.0,
+             "latitude": 20.0 + i * 1e-4, "longitude": 78.0 - i * 1e-4, "status": "active"}
+            for i in range(nodes)
+        ])
+        conn.execute(insert(Pipe), [
+            {"id": f"PIPE-{e:06d}", "source_node_id": f"NODE-{s:06d}", "target_node_id": f"NODE-{t:06d}",
+             "length": 100.0, "diameter": 200, "material": "pvc", "flow_capacity": 2500.0, "current_flow": 1000.0}
+            for e, (s, t) in enumerate(zip(sources, targets))
+        ])
+
+def bfs_orm(db, start: str, hops: int) -> set:
+    seen = {start}
+    frontier = [db.get(PipeNode, start)]
+    for _ in range(hops):
+        found = []
+        for node in frontier:
+            for pipe in node.source_pipes:
+                found.append(pipe.target_node)
+            for pipe in node.target_pipes:
+                found.append(pipe.source_node)
+        frontier = [node for node in found if node.id not in seen]
+        seen.update(node.id for node in frontier)
+    return seen
+
+def bfs_index(index: GraphIndex, start: str, hops: int) -> set:
+    adjacency = index.adjacency()
+    reached = np.zeros(len(index.node_ids), dtype=bool)
+    frontier = np.array([index.node_id(start)])
+    reached[frontier] = True
+    for _ in range(hops):
+        found = np.r_[
+            gather(adjacency.out_indptr, adjacency.out_nodes, frontier),
+            gather(adjacency.in_indptr, adjacency.in_nodes, frontier)
+        ]
+        frontier = np.unique(found[~reached[found]])
+        reached[frontier] = True
+    return {index.node_ids[i] for i in np.flatnonzero(reached)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--pipes", type=int, default=150_000)
+    parser.add_argument("--searches", type=int, default=20)
+    parser.add_argument("--hops", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        seed(engine, args.nodes, args.pipes)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+
+        index = GraphIndex()
+        start = time.perf_counter()
+        index.rebuild(db)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        index.adjacency()
+        csr = time.perf_counter() - start
+
+        starts = random.Random(0).sample(index.node_ids, args.searches)
+        start = time.perf_counter()
+        orm_results = [bfs_orm(db, node_id, args.hops) for node_id in starts]
+        orm = (time.perf_counter() - start) / args.searches
+        start = time.perf_counter()
+        index_results = [bfs_index(index, node_id, args.hops) for node_id in starts]
+        indexed = (time.perf_counter() - start) / args.searches
+        same = orm_results == index_results
+
+        db.close()
+        db = Session()
+        start = time.perf_counter()
+        [graph_node(node) for node in db.query(PipeNode).order_by(PipeNode.id).yield_per(1000)]
+        [graph_edge(pipe) for pipe in db.query(Pipe).order_by(Pipe.id).yield_per(1000)]
+        orm_entries = time.perf_counter() - start
+        start = time.perf_counter()
+        index.entries()
+        index_entries = time.perf_counter() - start
+        db.close()
+
+        # Incremental updates as crud applies them
+        entry = dict(index.edges[0], current_flow=1.0)
+        start = time.perf_counter()
+        for _ in range(1000):
+            index.apply_edge(entry)
+        flow_update = (time.perf_counter() - start) / 1000
+        start = time.perf_counter()
+        index.apply_edge(dict(entry, id="PIPE-NEW", source=index.node_ids[0], target=index.node_ids[-1]))
+        index.adjacency()
+        new_pipe = time.perf_counter() - start
+
+    print(f"network                {len(index.node_ids):,} nodes, {len(index.pipe_ids):,} pipes")
+    print(f"index rebuild          {built * 1000:9.1f} ms   (+ CSR {csr * 1000:.1f} ms)")
+    print(f"BFS {args.hops} hops, ORM        {orm * 1000:9.2f} ms per search")
+    print(f"BFS {args.hops} hops, index      {indexed * 1000:9.2f} ms per search  ({orm / indexed:.0f}x, "
+          f"{'same nodes' if same else 'MISMATCH'})")
+    print(f"graph entries, ORM     {orm_entries * 1000:9.1f} ms")
+    print(f"graph entries, index   {index_entries * 1000:9.1f} ms")
+    print(f"flow update            {flow_update * 1e6:9.2f} us")
+    print(f"new pipe + full CSR   {new_pipe * 1000:9.2f} ms")
+    sys.exit(0 if same else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Level-of-detail benchmark: cluster rebuild, incremental updates and views.
+
+Seeds a throwaway SQLite database with nodes scattered around the cities of
+mock_data.INDIAN_CITIES and pipes between nearby nodes, then times the full
+rebuild of every level, a view of each level, and node and pipe writes as
+crud applies them (graph index first). After the writes, the incrementally maintained views
+must equal a fresh rebuild. Run from the backend directory:
+    python benchmarks/bench_graph_lod.py --nodes 100000 --pipes 150000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import PipeNode, Pipe
+from graph_index import GraphIndex, graph_node, graph_edge
+from graph_lod import GraphLevelOfDetail, city_level, grid_level
+from mock_data import INDIAN_CITIES
+
+STATUSES = ["active", "offline", "unreported", "demand", "leak"]
+TYPES = ["pump", "valve", "sensor", "junction"]
+
+def seed(engine, nodes: int, pipes: int):
+    rng = np.random.default_rng(0)
+    city = np.sort(rng.integers(0, len(INDIAN_CITIES), nodes))
+    latitude = np.array([c["lat"] for c in INDIAN_CITIES])[city] + rng.normal(0, 0.1, nodes)
+    longitude = np.array([c["lng"] for c in INDIAN_CITIES])[city] + rng.normal(0, 0.1, nodes)
+    sources = np.r_[np.arange(nodes - 1), rng.integers(0, nodes, max(pipes - nodes + 1, 0))]
+    targets = np.r_[np.arange(1, nodes), np.clip(sources[nodes - 1:] + rng.integers(-30, 30, len(sources) - nodes + 1), 0, nodes - 1)]
+    with engine.begin() as conn:
+        conn.execute(insert(PipeNode), [
+            {"id": f"NODE-{i:06d}", "name": f"Node {i}", "type": TYPES[i % 4], "pressure": float(rng.uniform(1, 4)),
+             "flow_rate": float(rng.uniform(100, 2000)), "latitude": float(latitude[i]), "longitude": float(longitude[i]),
+             "status": STATUSES[int(rng.choice(5, p=[0.7, 0.1, 0.05, 0.1, 0.05]))]}
+            for i in range(nodes)
+        ])
+        conn.execute(insert(Pipe), [
+            {"id": f"PIPE-{e:06d}", "source_node_id": f"NODE-{s:06d}", "target_node_id": f"NODE-{t:06d}",
+             "length": 100.0, "diameter": 200, "material": "pvc", "flow_capacity": 2500.0, "current_flow": float(rng.uniform(100, 2400))}
+            for e, (s, t) in enumerate(zip(sources, targets))
+        ])
+
+def views(lod: GraphLevelOfDetail) -> str:
+    return json.dumps({name: {**lod.view(name), "version": None} for name in lod.levels}, sort_keys=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--pipes", type=int, default=150_000)
+    parser.add_argument("--writes", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        seed(engine, args.nodes, args.pipes)
+        db = sessionmaker(bind=engine)()
+        index = GraphIndex()
+        index.rebuild(db)
+        lod = GraphLevelOfDetail(index, [city_level(), grid_level(4.0), grid_level(2.0), grid_level(1.0)])
+        start = time.perf_counter()
+        lod.rebuild()
+        built = time.perf_counter() - start
+
+        view_ms = {}
+        for name in lod.levels:
+            start = time.perf_counter()
+            view = lod.view(name)
+            view_ms[name] = ((time.perf_counter() - start) * 1000, len(view["nodes"]), len(view["edges"]),
+                             len(json.dumps(view)))
+
+        # Writes as crud applies them: status/flow changes, moves to another city, flow updates
+        rng = np.random.default_rng(1)
+        nodes = {node.id: node for node in db.query(PipeNode).all()}
+        pipes = {pipe.id: pipe for pipe in db.query(Pipe).all()}
+        node_ms, move_ms, pipe_ms = [], [], []
+        for i in range(args.writes):
+            node = nodes[index.node_ids[rng.integers(len(index.node_ids))]]
+            if i % 10 == 0:
+                city = INDIAN_CITIES[rng.integers(len(INDIAN_CITIES))]
+                node.latitude, node.longitude = city["lat"], city["lng"]
+                timings = move_ms
+            else:
+                node.status, node.flow_rate = STATUSES[rng.integers(5)], float(rng.uniform(100, 2000))
+                timings = node_ms
+            index.apply_node(node, graph_node(node))
+            start = time.perf_counter()
+            lod.apply_node(node)
+            timings.append((time.perf_counter() - start) * 1000)
+
+            pipe = pipes[index.pipe_ids[rng.integers(len(index.pipe_ids))]]
+            pipe.current_flow = float(rng.uniform(100, 2400))
+            entry = graph_edge(pipe)
+            index.apply_edge(entry)
+            start = time.perf_counter()
+            lod.apply_edge(entry)
+            pipe_ms.append((time.perf_counter() - start) * 1000)
+        db.commit()
+        incremental = views(lod)
+        lod.rebuild()
+        same = incremental == views(lod)
+        db.close()
+
+    print(f"network                {len(index.node_ids):,} nodes, {len(index.pipe_ids):,} pipes")
+    print(f"rebuild all levels     {built * 1000:9.1f} ms")
+    for name, (ms, clusters, edges, size) in view_ms.items():
+        print(f"view {name:<17} {ms:9.2f} ms, {clusters} clusters, {edges} edges, {size / 1024:,.1f} KiB")
+    print(f"node write             {np.median(node_ms):9.3f} ms median")
+    print(f"node move              {np.median(move_ms):9.3f} ms median")
+    print(f"pipe write             {np.median(pipe_ms):9.3f} ms median")
+    print(f"incremental vs rebuild {'same' if same else 'MISMATCH'}")
+    sys.exit(0 if same else 1)
+
+if __name__ == "__main__":
+    main()
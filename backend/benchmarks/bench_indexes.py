@@ -0,0 +1,148 @@
+"""Query latency before and after the composite indexes in models.py.
+
+Seeds a throwaway SQLite database, times the crud lookups that filter and
+sort on the indexed columns with the composite indexes dropped, then runs
+`ensure_indexes` (the migration path for existing databases) and times them
+again. Run from the backend directory:
+    python benchmarks/bench_indexes.py --readings 2000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import SensorReading, LeakAlert, MaintenanceLog
+from migrations import ensure_indexes
+from crud import (
+    get_latest_sensor_reading, get_sensor_readings_by_node,
+    get_active_leak_alerts, get_leak_alerts_by_entity, get_maintenance_logs_by_entity
+)
+
+# Indexes declared in __table_args__ (the ones this benchmark is about)
+COMPOSITE_INDEXES = [
+    index.name
+    for model in (SensorReading, LeakAlert, MaintenanceLog)
+    for index in model.__table_args__
+]
+
+def seed(engine, readings: int, nodes: int, alerts: int, logs: int, chunk: int = 50_000):
+    start_time = datetime.now() - timedelta(days=30)
+    with engine.begin() as conn:
+        for offset in range(0, readings, chunk):
+            conn.execute(insert(SensorReading), [
+                {
+                    "node_id": f"NODE-{random.randint(1, nodes):04d}",
+                    "pressure": random.uniform(1.0, 4.5),
+                    "flow_rate": random.uniform(200, 2000),
+                    "temperature": random.uniform(15.0, 35.0),
+                    "timestamp": start_time + timedelta(seconds=random.randint(0, 30 * 86400))
+                }
+                for _ in range(min(chunk, readings - offset))
+            ])
+        conn.execute(insert(LeakAlert), [
+            {
+                "entity_type": random.choice(["pipe", "node"]),
+                "entity_id": f"NODE-{random.randint(1, nodes):04d}",
+                "alert_type": "pressure_drop",
+                "is_resolved": random.random() < 0.9,
+                "detected_at": start_time + timedelta(seconds=random.randint(0, 30 * 86400))
+            }
+            for _ in range(alerts)
+        ])
+        conn.execute(insert(MaintenanceLog), [
+            {
+                "entity_type": random.choice(["pipe", "node"]),
+                "entity_id": f"NODE-{random.randint(1, nodes):04d}",
+                "scheduled_date": start_time + timedelta(days=random.randint(0, 365))
+            }
+            for _ in range(logs)
+        ])
+
+def queries(nodes: int):
+    def node_id():
+        return f"NODE-{random.randint(1, nodes):04d}"
+    return {
+        "latest reading": lambda db: get_latest_sensor_reading(db, node_id()),
+        "readings by node": lambda db: get_sensor_readings_by_node(db, node_id(), 100),
+        "active leak alerts": lambda db: get_active_leak_alerts(db),
+        "alerts by entity": lambda db: get_leak_alerts_by_entity(db, "node", node_id()),
+        "logs by entity": lambda db: get_maintenance_logs_by_entity(db, "node", node_id())
+    }
+
+def time_queries(session_factory, nodes: int, repeat: int):
+    results = {}
+    for name, query in queries(nodes).items():
+        samples = []
+        for _ in range(repeat):
+            db = session_factory()
+            try:
+                start = time.perf_counter()
+                query(db)
+                samples.append(time.perf_counter() - start)
+            finally:
+                db.close()
+        results[name] = statistics.median(samples) * 1000
+    return results
+
+def print_plans(engine):
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM sensor_readings "
+            "WHERE node_id = 'NODE-0001' ORDER BY timestamp DESC LIMIT 1"
+        )).all()
+    print("  plan:", "; ".join(row[-1] for row in plan))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=1_000_000)
+    parser.add_argument("--nodes", type=int, default=600)
+    parser.add_argument("--alerts", type=int, default=50_000)
+    parser.add_argument("--logs", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            for name in COMPOSITE_INDEXES:
+                conn.execute(text(f"DROP INDEX {name}"))
+        session_factory = sessionmaker(bind=engine)
+
+        start = time.perf_counter()
+        seed(engine, args.readings, args.nodes, args.alerts, args.logs)
+        print(f"Seeded {args.readings:,} readings in {time.perf_counter() - start:.1f}s")
+
+        print("Without composite indexes")
+        print_plans(engine)
+        before = time_queries(session_factory, args.nodes, args.repeat)
+
+        start = time.perf_counter()
+        created = ensure_indexes(engine)
+        print(f"Created {len(created)} indexes in {time.perf_counter() - start:.1f}s")
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE"))
+
+        print("With composite indexes")
+        print_plans(engine)
+        after = time_queries(session_factory, args.nodes, args.repeat)
+        engine.dispose()
+
+    print(f"\n{'query':<20} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in before:
+        print(f"{name:<20} {before[name]:>10.2f} {after[name]:>10.2f} {before[name] / after[name]:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Throughput benchmark: per-row vs bulk sensor-reading ingestion.
+
+Run from the backend directory:
+    python benchmarks/bench_ingestion.py --readings 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import SensorReading
+from schemas import SensorReadingCreate
+from crud import create_sensor_reading, create_sensor_readings_bulk
+
+def make_session(db_path: str):
+    """Create a fresh database with the application schema"""
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+def make_readings(count: int, node_count: int = 600):
+    return [
+        SensorReadingCreate(
+            node_id=f"NODE-{random.randint(1, node_count):04d}",
+            pressure=random.uniform(1.0, 4.5),
+            flow_rate=random.uniform(200, 2000),
+            temperature=random.uniform(15.0, 35.0)
+        )
+        for _ in range(count)
+    ]
+
+def run(label: str, readings, write) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db = make_session(os.path.join(tmp, "bench.db"))
+        try:
+            start = time.perf_counter()
+            write(db, readings)
+            elapsed = time.perf_counter() - start
+            stored = db.query(func.count(SensorReading.id)).scalar()
+        finally:
+            db.close()
+            engine.dispose()
+
+    rate = len(readings) / elapsed
+    print(f"{label:<10} {len(readings):>8} readings  {elapsed:8.3f}s  {rate:>12,.0f} readings/s  (stored {stored})")
+    return rate
+
+def per_row(db, readings):
+    for reading in readings:
+        create_sensor_reading(db, reading)
+
+def bulk(db, readings):
+    create_sensor_readings_bulk(db, readings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=50_000, help="readings written by the bulk path")
+    parser.add_argument("--per-row-readings", type=int, default=2_000,
+                        help="readings written by the per-row path (it is slow)")
+    args = parser.parse_args()
+
+    per_row_rate = run("per-row", make_readings(args.per_row_readings), per_row)
+    bulk_rate = run("bulk", make_readings(args.readings), bulk)
+    print(f"bulk speedup: {bulk_rate / per_row_rate:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Supply impact and valve isolation benchmark on a large synthetic network.
+
+Seeds a throwaway SQLite database with a random network of junctions,
+valves and pumps, builds the graph index and times the per-version
+baseline (supplied set and valve segments) and the per-request node impact
+and pipe isolation answers. The isolation plans are checked against a plain
+Python search: once the valves are closed, no pump reaches the segment.
+Run from the backend directory:
+    python benchmarks/bench_isolation.py --nodes 100000 --pipes 150000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import PipeNode, Pipe
+from graph_index import GraphIndex
+from isolation import SupplyAnalyzer
+
+def seed(engine, nodes: int, pipes: int, valves: float, pumps: int):
+    rng = np.random.default_rng(0)
+    # A spanning tree plus random extra pipes between nearby ids
+    sources = np.r_[rng.integers(0, np.arange(1, nodes)), rng.integers(0, nodes, max(pipes - nodes + 1, 0))]
+    targets = np.r_[np.arange(1, nodes), np.clip(sources[nodes - 1:] + rng.integers(-50, 50, len(sources) - nodes + 1), 0, nodes - 1)]
+    types = np.where(rng.random(nodes) < valves, "valve", "junction")
+    types[rng.choice(nodes, pumps, replace=False)] = "pump"
+    types[0] = "pump"
+    with engine.begin() as conn:
+        conn.execute(insert(PipeNode), [
+            {"id": f"NODE-{i:06d}", "name": f"Node {i}", "type": str(types[i]), "pressure": 3.0,
+             "latitude": 20.0, "longitude": 78.0, "status": "active"}
+            for i in range(nodes)
+        ])
+        conn.execute(insert(Pipe), [
+            {"id": f"PIPE-{e:06d}", "source_node_id": f"NODE-{s:06d}", "target_node_id": f"NODE-{t:06d}",
+             "length": 100.0, "diameter": 200, "material": "pvc", "flow_capacity": 2500.0, "current_flow": 1000.0}
+            for e, (s, t) in enumerate(zip(sources, targets))
+        ])
+
+def pump_reaches(index: GraphIndex, plan: dict) -> bool:
+    """Whether any pump outside the segment still reaches it with the plan's valves closed"""
+    closed = set(plan["valves_to_close"])
+    segment = set(plan["segment_nodes"])
+    neighbours = {}
+    for pipe_id in index.pipe_ids:
+        source, target = index.endpoints(index.pipe_id(pipe_id))
+        source, target = index.node_ids[source], index.node_ids[target]
+        neighbours.setdefault(source, []).append(target)
+        neighbours.setdefault(target, []).append(source)
+    pumps = [node_id for node_id, entry in zip(index.node_ids, index.nodes)
+             if entry["type"] == "pump" and node_id not in segment and node_id not in closed]
+    seen = set(pumps)
+    queue = deque(pumps)
+    while queue:
+        node_id = queue.popleft()
+        if node_id in segment:
+            return True
+        for other in neighbours.get(node_id, ()):
+            if other not in seen and other not in closed:
+                seen.add(other)
+                queue.append(other)
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--pipes", type=int, default=150_000)
+    parser.add_argument("--valves", type=float, default=0.6, help="share of nodes that are valves")
+    parser.add_argument("--pumps", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--checks", type=int, default=5, help="isolatable plans to verify in Python")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        seed(engine, args.nodes, args.pipes, args.valves, args.pumps)
+        db = sessionmaker(bind=engine)()
+        index = GraphIndex()
+        index.rebuild(db)
+        db.close()
+
+    analyzer = SupplyAnalyzer(index)
+    start = time.perf_counter()
+    baseline = analyzer.baseline()
+    built = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    impact_ms, isolate_ms, plans = [], [], []
+    for node in rng.choice(len(index.node_ids), args.requests, replace=False):
+        start = time.perf_counter()
+        analyzer.node_impact(index.node_ids[node])
+        impact_ms.append((time.perf_counter() - start) * 1000)
+    for pipe in rng.choice(len(index.pipe_ids), args.requests, replace=False):
+        start = time.perf_counter()
+        analyzer.isolate_pipe(index.pipe_ids[pipe])
+        isolate_ms.append((time.perf_counter() - start) * 1000)
+        plans.append(analyzer.isolate_pipe(index.pipe_ids[pipe], limit=len(index.node_ids)))
+
+    # A flow update keeps the baseline; a new pipe rebuilds it on the next request
+    index.apply_edge(dict(index.edges[0], current_flow=1.0))
+    analyzer.baseline()
+    index.apply_edge(dict(index.edges[0], id="PIPE-NEW", target=index.node_ids[-1]))
+    start = time.perf_counter()
+    analyzer.baseline()
+    rebuilt = time.perf_counter() - start
+
+    isolatable = [plan for plan in plans if plan["isolatable"]]
+    leaks = sum(pump_reaches(index, plan) for plan in isolatable[:args.checks])
+    print(f"network                {len(index.node_ids):,} nodes, {len(index.pipe_ids):,} pipes, "
+          f"{baseline['is_valve'].sum():,} valves, {len(baseline['pumps'])} pumps")
+    print(f"supplied               {baseline['supplied'].sum():,} nodes")
+    print(f"baseline               {built * 1000:9.1f} ms   (after a new pipe {rebuilt * 1000:.1f} ms, "
+          f"{analyzer.baseline_builds} builds)")
+    print(f"node impact            {np.median(impact_ms):9.2f} ms median, {max(impact_ms):.2f} ms max")
+    print(f"pipe isolation         {np.median(isolate_ms):9.2f} ms median, {max(isolate_ms):.2f} ms max")
+    print(f"plans                  {len(isolatable)} of {len(plans)} isolatable by valves, "
+          f"median {np.median([len(plan['valves_to_close']) for plan in plans]):.0f} valves to close")
+    print(f"checked                {min(len(isolatable), args.checks)} plans, {leaks} still reachable from a pump")
+    sys.exit(0 if leaks == 0 and analyzer.baseline_builds == 2 else 1)
+
+if __name__ == "__main__":
+    main()
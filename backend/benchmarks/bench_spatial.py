@@ -0,0 +1,112 @@
+"""Viewport query benchmark on a nationwide synthetic network.
+
+Places nodes in clusters around random points inside India's bounding box,
+links each node to a nearby earlier one, and compares city-sized viewport
+queries on the spatial grid with a full coordinate scan (checking both
+return the same nodes). It also compares the payload of a /graph?bbox
+response with the full /graph body. Runs on the in-memory index only; no
+database is needed. Run from the backend directory:
+    python benchmarks/bench_spatial.py --nodes 100000 --pipes 150000
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_index import GraphIndex, graph_node, graph_edge
+from schemas import GraphData
+from spatial_index import SpatialGrid
+
+INDIA = (68.0, 8.0, 97.0, 35.0)
+
+def build(nodes: int, pipes: int, clusters: int) -> GraphIndex:
+    rng = np.random.default_rng(0)
+    centres = rng.uniform(INDIA[:2], INDIA[2:], (clusters, 2))
+    cluster = np.sort(rng.integers(0, clusters, nodes))
+    points = centres[cluster] + rng.normal(0, 0.15, (nodes, 2))
+    first = np.searchsorted(cluster, cluster)
+    # Each node links to an earlier node of its cluster (or the previous cluster's first node)
+    parents = np.where(np.arange(nodes) > first, first + (rng.random(nodes) * (np.arange(nodes) - first)).astype(np.int64), first - 1)
+    sources = np.r_[parents[1:], rng.integers(0, nodes, max(pipes - nodes + 1, 0))]
+    targets = np.r_[np.arange(1, nodes), np.clip(sources[nodes - 1:] + rng.integers(-20, 20, len(sources) - nodes + 1), 0, nodes - 1)]
+
+    index = GraphIndex()
+    for i, (longitude, latitude) in enumerate(points):
+        node = SimpleNamespace(
+            id=f"NODE-{i:06d}", name=f"Node {i}", type="junction", pressure=3.0, flow_rate=500.0, status="active",
+            latitude=float(latitude), longitude=float(longitude)
+        )
+        index.apply_node(node, graph_node(node))
+    for e, (s, t) in enumerate(zip(sources, targets)):
+        pipe = SimpleNamespace(
+            id=f"PIPE-{e:06d}", source_node_id=f"NODE-{s:06d}", target_node_id=f"NODE-{t:06d}",
+            length=100.0, current_flow=1000.0, flow_capacity=2500.0
+        )
+        index.apply_edge(graph_edge(pipe))
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--pipes", type=int, default=150_000)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--cell", type=float, default=0.5, help="grid cell size in degrees")
+    parser.add_argument("--span", type=float, default=0.5, help="viewport size in degrees")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    index = build(args.nodes, args.pipes, args.clusters)
+    grid = SpatialGrid(index, args.cell)
+    start = time.perf_counter()
+    grid.grid()
+    built = time.perf_counter() - start
+    index.adjacency()
+
+    rng = np.random.default_rng(1)
+    geometry = index.geometry()
+    latitude, longitude = geometry["latitude"], geometry["longitude"]
+    centres = rng.choice(len(index.node_ids), args.queries)
+    boxes = [
+        (longitude[c] - args.span / 2, latitude[c] - args.span / 2, longitude[c] + args.span / 2, latitude[c] + args.span / 2)
+        for c in centres
+    ]
+
+    start = time.perf_counter()
+    found = [grid.query(box) for box in boxes]
+    grid_query = (time.perf_counter() - start) / args.queries
+    start = time.perf_counter()
+    scanned = [
+        np.flatnonzero((longitude >= box[0]) & (longitude <= box[2]) & (latitude >= box[1]) & (latitude <= box[3]))
+        for box in boxes
+    ]
+    scan_query = (time.perf_counter() - start) / args.queries
+    same = all(np.array_equal(a, b) for a, b in zip(found, scanned))
+
+    start = time.perf_counter()
+    payloads = []
+    for box in boxes:
+        nodes, edges = grid.viewport(box)
+        payloads.append(len(GraphData(nodes=nodes, edges=edges).model_dump_json()))
+    viewport = (time.perf_counter() - start) / args.queries
+    nodes, edges = index.entries()
+    start = time.perf_counter()
+    full_payload = len(GraphData(nodes=nodes, edges=edges).model_dump_json())
+    full = time.perf_counter() - start
+
+    print(f"network                {len(index.node_ids):,} nodes, {len(index.pipe_ids):,} pipes, "
+          f"{grid.stats()['cells']:,} cells of {args.cell} deg")
+    print(f"grid build             {built * 1000:9.1f} ms")
+    print(f"bbox query, grid       {grid_query * 1000:9.3f} ms   ({np.mean([len(f) for f in found]):.0f} nodes on average, "
+          f"{'same nodes' if same else 'MISMATCH'})")
+    print(f"bbox query, full scan  {scan_query * 1000:9.3f} ms")
+    print(f"/graph?bbox body       {viewport * 1000:9.2f} ms, {np.mean(payloads) / 1024:,.1f} KiB on average")
+    print(f"/graph body            {full * 1000:9.2f} ms, {full_payload / 1024:,.1f} KiB")
+    sys.exit(0 if same else 1)
+
+if __name__ == "__main__":
+    main()
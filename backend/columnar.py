@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta, timezone
+from operator import attrgetter, itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Type, Union, get_args, get_origin
+
+import msgpack
+import numpy as np
+from pydantic import BaseModel
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+_MSGPACK_TYPES = {MSGPACK, "application/msgpack", "application/vnd.msgpack"}
+_JSON_TYPES = {JSON, "application/*", "*/*"}
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """Media type to answer with for an Accept header (None when nothing offered is acceptable).
+
+    JSON is the default: MessagePack is chosen only when the header ranks
+    it above JSON (by q, then by order).
+    """
+    if not accept:
+        return JSON
+    best, best_q = None, 0.0
+    for part in accept.split(","):
+        media_range, *params = [item.strip() for item in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media_range = media_range.lower()
+        if media_range in _JSON_TYPES:
+            offered = JSON
+        elif media_range in _MSGPACK_TYPES:
+            offered = MSGPACK
+        else:
+            continue
+        if q > best_q:
+            best, best_q = offered, q
+    return best
+
+def table(schema: Type[BaseModel], rows: Sequence[Any], dictionary: Sequence[str] = ()) -> Dict:
+    """Struct-of-arrays form of Core rows, ORM objects or dicts shaped like `schema`.
+
+    Each column is read straight off the rows with a C-level getter (no
+    per-row Python code or intermediate row tuples). Floats become
+    little-endian float64 buffers (NaN for null), ints int64 buffers (float64
+    if nullable) and datetimes float64 milliseconds since the Unix epoch
+    (naive values are UTC). Dict fields of numbers, such as a graph node's
+    position, are split into one float64 column per key ("position.x"). The
+    low-cardinality string columns named in `dictionary` are sent as int32
+    indices into a list of distinct values; other values stay plain lists.
+    Rows are read as trusted: nothing is validated.
+    """
+    getter = itemgetter if rows and isinstance(rows[0], dict) else attrgetter
+    columns: Dict[str, Any] = {}
+    dtypes: Dict[str, str] = {}
+    for name, field in schema.model_fields.items():
+        values = list(map(getter(name), rows))
+        kind = _kind(field.annotation)
+        if name in dictionary:
+            columns[name] = dictionary_column(values)
+            kind = "dictionary"
+        elif kind == "float64":
+            columns[name] = float64_column(values)
+        elif kind == "int64":
+            columns[name] = np.array(values, dtype="<i8").tobytes()
+        elif kind == "timestamp[ms]":
+            columns[name] = _epoch_ms(values)
+        elif kind == "struct":
+            keys = list(values[0]) if values else []
+            for key in keys:
+                columns[f"{name}.{key}"] = float64_column(list(map(itemgetter(key), values)))
+                dtypes[f"{name}.{key}"] = "float64"
+            continue
+        else:
+            columns[name] = values
+        dtypes[name] = kind
+    return {"length": len(rows), "dtypes": dtypes, "columns": columns}
+
+def dictionary_column(values: Sequence[str]) -> Dict:
+    """Dictionary-encoded column: int32 indices into the distinct values, in first-seen order"""
+    distinct = {value: index for index, value in enumerate(dict.fromkeys(values))}
+    indices = np.fromiter(map(distinct.__getitem__, values), dtype="<i4", count=len(values))
+    return {"dictionary": list(distinct), "indices": indices.tobytes()}
+
+def float64_column(values) -> bytes:
+    return np.asarray(values, dtype="<f8").tobytes()  # None becomes NaN
+
+def packb(payload: Union[Dict, List]) -> bytes:
+    return msgpack.packb(payload, use_bin_type=True)
+
+def _kind(annotation) -> str:
+    nullable = get_origin(annotation) is Union and type(None) in get_args(annotation)
+    if get_origin(annotation) is Union:
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    if annotation is int:
+        return "float64" if nullable else "int64"
+    if annotation is float:
+        return "float64"
+    if annotation is datetime:
+        return "timestamp[ms]"
+    if annotation is str:
+        return "string"
+    if get_origin(annotation) is dict and get_args(annotation)[1] in (float, int):
+        return "struct"
+    return "list"
+
+def _epoch_ms(values: Sequence[Optional[datetime]]) -> bytes:
+    return float64_column([
+        None if value is None else (_naive_utc(value) - _EPOCH) / _MILLISECOND
+        for value in values
+    ])
+
+def _naive_utc(value: datetime) -> datetime:
+    return value if value.tzinfo is None else value.astimezone(timezone.utc).replace(tzinfo=None)
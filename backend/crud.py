@@ -1,14 +1,75 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import List, Optional
+from sqlalchemy import and_, or_, insert, select
+from sqlalchemy.engine import Row
+from typing import Iterable, Iterator, List, Optional
 from datetime import datetime
+import os
 
 from models import PipeNode, Pipe, MaintenanceLog, SensorReading, LeakAlert
-from schemas import MaintenanceLogCreate, MaintenanceLogUpdate, SensorReadingCreate, LeakAlertCreate
+from schemas import (
+    MaintenanceLogCreate, MaintenanceLogUpdate, SensorReadingCreate, LeakAlertCreate,
+    PipeNodeResponse, PipeResponse
+)
+from reading_cache import reading_cache
+from graph_cache import graph_cache
+from graph_index import graph_index, graph_node, graph_edge
+from stats_store import system_stats
+from prediction_cache import prediction_cache
+from maintenance_history import maintenance_history, history_entry
+from leak_detector import leak_detector
+from hydraulics import mass_balance
+from graph_lod import graph_lod
+
+# Rows written per INSERT ... executemany during bulk ingestion
+SENSOR_READING_BATCH_SIZE = int(os.getenv("SENSOR_READING_BATCH_SIZE", "5000"))
+
+class UnknownNodeError(ValueError):
+    """Raised when readings name nodes that do not exist"""
+
+    def __init__(self, node_ids: List[str]):
+        super().__init__(f"Unknown node ids: {', '.join(node_ids[:10])}")
+        self.node_ids = node_ids
 
 # Pipe Node CRUD operations
-def get_pipe_nodes(db: Session, skip: int = 0, limit: int = 100) -> List[PipeNode]:
-    return db.query(PipeNode).offset(skip).limit(limit).all()
+# Derived views (graph index, cluster levels, snapshot/deltas, /stats totals) are
+# updated from the before/after graph entries of every node and pipe write; cached
+# maintenance predictions for the entity are dropped and the mass balance is patched.
+def _node_written(before: Optional[dict], db_node: PipeNode):
+    after = graph_node(db_node)
+    graph_index.apply_node(db_node, after)
+    graph_lod.apply_node(db_node)
+    graph_cache.record("node", before, after)
+    system_stats.apply_node(before, after)
+    prediction_cache.invalidate(db_node.id)
+    mass_balance.apply_node(db_node)
+
+def _pipe_written(before: Optional[dict], db_pipe: Pipe):
+    after = graph_edge(db_pipe)
+    graph_index.apply_edge(after, db_pipe.pressure_loss)
+    graph_lod.apply_edge(after)
+    graph_cache.record("edge", before, after)
+    system_stats.apply_edge(before, after)
+    prediction_cache.invalidate(db_pipe.id)
+    mass_balance.apply_pipe(db_pipe)
+
+# List reads use keyset pagination: `after` is the sort key of the last row of
+# the previous page and `limit=None` returns every remaining row.
+def get_pipe_nodes(db: Session, after: Optional[str] = None, limit: Optional[int] = None) -> List[PipeNode]:
+    query = db.query(PipeNode).order_by(PipeNode.id)
+    if after is not None:
+        query = query.filter(PipeNode.id > after)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def iter_pipe_nodes(db: Session, batch_size: int = 1000) -> Iterator[PipeNode]:
+    return db.query(PipeNode).order_by(PipeNode.id).yield_per(batch_size)
+
+def get_pipe_node_rows(db: Session, after: Optional[str] = None, limit: Optional[int] = None) -> List[Row]:
+    return _rows(db, PipeNode, PipeNodeResponse, after, limit).all()
+
+def iter_pipe_node_rows(db: Session, batch_size: int = 1000) -> Iterator[Row]:
+    return _rows(db, PipeNode, PipeNodeResponse, batch_size=batch_size)
 
 def get_pipe_node_by_id(db: Session, node_id: str) -> Optional[PipeNode]:
     return db.query(PipeNode).filter(PipeNode.id == node_id).first()
@@ -18,20 +79,48 @@ def create_pipe_node(db: Session, node_data: dict) -> PipeNode:
     db.add(db_node)
     db.commit()
     db.refresh(db_node)
+    _node_written(None, db_node)
     return db_node
 
 def update_pipe_node(db: Session, node_id: str, node_data: dict) -> Optional[PipeNode]:
     db_node = get_pipe_node_by_id(db, node_id)
     if db_node:
+        before = graph_node(db_node)
         for key, value in node_data.items():
             setattr(db_node, key, value)
         db.commit()
         db.refresh(db_node)
+        _node_written(before, db_node)
     return db_node
 
 # Pipe CRUD operations
-def get_pipes(db: Session, skip: int = 0, limit: int = 100) -> List[Pipe]:
-    return db.query(Pipe).offset(skip).limit(limit).all()
+def get_pipes(db: Session, after: Optional[str] = None, limit: Optional[int] = None) -> List[Pipe]:
+    query = db.query(Pipe).order_by(Pipe.id)
+    if after is not None:
+        query = query.filter(Pipe.id > after)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def iter_pipes(db: Session, batch_size: int = 1000) -> Iterator[Pipe]:
+    return db.query(Pipe).order_by(Pipe.id).yield_per(batch_size)
+
+def get_pipe_rows(db: Session, after: Optional[str] = None, limit: Optional[int] = None) -> List[Row]:
+    return _rows(db, Pipe, PipeResponse, after, limit).all()
+
+def iter_pipe_rows(db: Session, batch_size: int = 1000) -> Iterator[Row]:
+    return _rows(db, Pipe, PipeResponse, batch_size=batch_size)
+
+def _rows(db: Session, model, schema, after: Optional[str] = None, limit: Optional[int] = None, batch_size: Optional[int] = None):
+    """Core rows of the columns of `schema`, by id: the list read path skips ORM objects and validation"""
+    query = select(*[getattr(model, name) for name in schema.model_fields]).order_by(model.id)
+    if after is not None:
+        query = query.where(model.id > after)
+    if limit is not None:
+        query = query.limit(limit)
+    if batch_size is not None:
+        query = query.execution_options(yield_per=batch_size)
+    return db.execute(query)
 
 def get_pipe_by_id(db: Session, pipe_id: str) -> Optional[Pipe]:
     return db.query(Pipe).filter(Pipe.id == pipe_id).first()
@@ -41,20 +130,43 @@ def create_pipe(db: Session, pipe_data: dict) -> Pipe:
     db.add(db_pipe)
     db.commit()
     db.refresh(db_pipe)
+    _pipe_written(None, db_pipe)
     return db_pipe
 
 def update_pipe(db: Session, pipe_id: str, pipe_data: dict) -> Optional[Pipe]:
     db_pipe = get_pipe_by_id(db, pipe_id)
     if db_pipe:
+        before = graph_edge(db_pipe)
         for key, value in pipe_data.items():
             setattr(db_pipe, key, value)
         db.commit()
         db.refresh(db_pipe)
+        _pipe_written(before, db_pipe)
     return db_pipe
 
 # Maintenance Log CRUD operations
-def get_maintenance_logs(db: Session, skip: int = 0, limit: int = 100) -> List[MaintenanceLog]:
-    return db.query(MaintenanceLog).order_by(MaintenanceLog.scheduled_date.desc()).offset(skip).limit(limit).all()
+def _maintenance_logs_newest_first(db: Session):
+    return db.query(MaintenanceLog).order_by(MaintenanceLog.scheduled_date.desc(), MaintenanceLog.id.desc())
+
+def get_maintenance_logs(
+    db: Session,
+    after: Optional[tuple] = None,
+    limit: Optional[int] = None
+) -> List[MaintenanceLog]:
+    """Logs newest first; `after` is the (scheduled_date, id) of the previous page's last row"""
+    query = _maintenance_logs_newest_first(db)
+    if after is not None:
+        scheduled_date, log_id = after
+        query = query.filter(or_(
+            MaintenanceLog.scheduled_date < scheduled_date,
+            and_(MaintenanceLog.scheduled_date == scheduled_date, MaintenanceLog.id < log_id)
+        ))
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def iter_maintenance_logs(db: Session, batch_size: int = 1000) -> Iterator[MaintenanceLog]:
+    return _maintenance_logs_newest_first(db).yield_per(batch_size)
 
 def get_maintenance_log_by_id(db: Session, log_id: int) -> Optional[MaintenanceLog]:
     return db.query(MaintenanceLog).filter(MaintenanceLog.id == log_id).first()
@@ -64,39 +176,125 @@ def get_maintenance_logs_by_entity(db: Session, entity_type: str, entity_id: str
         and_(MaintenanceLog.entity_type == entity_type, MaintenanceLog.entity_id == entity_id)
     ).order_by(MaintenanceLog.scheduled_date.desc()).all()
 
+# Every log write also updates the per-entity maintenance history features
 def create_maintenance_log(db: Session, maintenance: MaintenanceLogCreate) -> MaintenanceLog:
     db_maintenance = MaintenanceLog(**maintenance.dict())
     db.add(db_maintenance)
     db.commit()
     db.refresh(db_maintenance)
+    maintenance_history.apply(db, None, history_entry(db_maintenance))
     return db_maintenance
 
 def update_maintenance_log(db: Session, log_id: int, maintenance: MaintenanceLogUpdate) -> Optional[MaintenanceLog]:
     db_maintenance = get_maintenance_log_by_id(db, log_id)
     if db_maintenance:
+        before = history_entry(db_maintenance)
         update_data = maintenance.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_maintenance, key, value)
         db.commit()
         db.refresh(db_maintenance)
+        maintenance_history.apply(db, before, history_entry(db_maintenance))
     return db_maintenance
 
 def delete_maintenance_log(db: Session, log_id: int) -> bool:
     db_maintenance = get_maintenance_log_by_id(db, log_id)
     if db_maintenance:
+        before = history_entry(db_maintenance)
         db.delete(db_maintenance)
         db.commit()
+        maintenance_history.apply(db, before, None)
         return True
     return False
 
 # Sensor Reading CRUD operations
 def create_sensor_reading(db: Session, reading: SensorReadingCreate) -> SensorReading:
-    db_reading = SensorReading(**reading.dict())
+    db_reading = SensorReading(**reading.dict(exclude_none=True))
     db.add(db_reading)
     db.commit()
     db.refresh(db_reading)
+    row = {
+        "node_id": db_reading.node_id,
+        "pressure": db_reading.pressure,
+        "flow_rate": db_reading.flow_rate,
+        "temperature": db_reading.temperature,
+        "timestamp": db_reading.timestamp
+    }
+    reading_cache.record_many([row])
+    _readings_observed(db, [row])
     return db_reading
 
+def create_sensor_readings_bulk(
+    db: Session,
+    readings: List[SensorReadingCreate],
+    batch_size: int = SENSOR_READING_BATCH_SIZE
+) -> int:
+    """Insert many readings with one executemany per batch and a single commit.
+
+    Skips the ORM unit of work entirely: rows are plain dicts and nothing is
+    refreshed afterwards. Raises UnknownNodeError, before writing anything,
+    if a reading names a node that does not exist; any other failure rolls
+    every batch back. Returns the number of batches written.
+    """
+    unknown = unknown_node_ids(db, (reading.node_id for reading in readings))
+    if unknown:
+        raise UnknownNodeError(unknown)
+
+    received_at = datetime.now()
+    rows = [
+        {
+            "node_id": reading.node_id,
+            "pressure": reading.pressure,
+            "flow_rate": reading.flow_rate,
+            "temperature": reading.temperature,
+            "timestamp": reading.timestamp or received_at
+        }
+        for reading in readings
+    ]
+    
+    batches = 0
+    try:
+        for start in range(0, len(rows), batch_size):
+            db.execute(insert(SensorReading), rows[start:start + batch_size])
+            batches += 1
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    reading_cache.record_many(rows)
+    _readings_observed(db, rows)
+    return batches
+
+def unknown_node_ids(db: Session, node_ids: Iterable[str], chunk_size: int = 500) -> List[str]:
+    """The ids among `node_ids` that name no pipe node, sorted.
+
+    Answered from the graph index once it is built, else from the database.
+    """
+    wanted = set(node_ids)
+    if graph_index.built:
+        return sorted(node_id for node_id in wanted if not graph_index.has_node(node_id))
+    ids = sorted(wanted)
+    known = set()
+    for start in range(0, len(ids), chunk_size):
+        known.update(db.scalars(select(PipeNode.id).where(PipeNode.id.in_(ids[start:start + chunk_size]))))
+    return [node_id for node_id in ids if node_id not in known]
+
+def _readings_observed(db: Session, rows: List[dict]):
+    """Run committed readings through the online leak detector, store its alerts and mark the nodes as leaking.
+
+    The status goes through update_pipe_node like a PATCH, so the graph
+    version moves and /graph/changes and /graph/stream carry the change.
+    """
+    flagged = set()
+    for alert in leak_detector.observe_rows(rows):
+        create_leak_alert(db, alert)
+        flagged.add(alert.entity_id)
+    for node_id in sorted(flagged):
+        node = get_pipe_node_by_id(db, node_id)
+        if node is not None and node.status != "leak":
+            update_pipe_node(db, node_id, {"status": "leak", "last_updated": datetime.now()})
+
 def get_sensor_readings_by_node(db: Session, node_id: str, limit: int = 100) -> List[SensorReading]:
     return db.query(SensorReading).filter(SensorReading.node_id == node_id).order_by(
         SensorReading.timestamp.desc()
@@ -109,12 +307,15 @@ def get_latest_sensor_reading(db: Session, node_id: str) -> Optional[SensorReadi
 
 # Leak Alert CRUD operations
 def create_leak_alert(db: Session, alert: LeakAlertCreate) -> LeakAlert:
-    db_alert = LeakAlert(**alert.dict())
+    db_alert = LeakAlert(**alert.dict(exclude_none=True))
     db.add(db_alert)
     db.commit()
     db.refresh(db_alert)
     return db_alert
 
+def get_leak_alert_by_id(db: Session, alert_id: int) -> Optional[LeakAlert]:
+    return db.query(LeakAlert).filter(LeakAlert.id == alert_id).first()
+
 def get_active_leak_alerts(db: Session) -> List[LeakAlert]:
     return db.query(LeakAlert).filter(LeakAlert.is_resolved == False).order_by(
         LeakAlert.detected_at.desc()
@@ -129,6 +330,13 @@ def resolve_leak_alert(db: Session, alert_id: int) -> Optional[LeakAlert]:
         db.refresh(db_alert)
     return db_alert
 
+def get_active_leak_alerts_for(db: Session, entities: List[tuple]) -> List[LeakAlert]:
+    """Unresolved alerts raised on any of the (entity_type, entity_id) pairs"""
+    return db.query(LeakAlert).filter(
+        LeakAlert.is_resolved == False,
+        or_(*(and_(LeakAlert.entity_type == t, LeakAlert.entity_id == i) for t, i in entities))
+    ).order_by(LeakAlert.detected_at.desc()).all()
+
 def get_leak_alerts_by_entity(db: Session, entity_type: str, entity_id: str) -> List[LeakAlert]:
     return db.query(LeakAlert).filter(
         and_(LeakAlert.entity_type == entity_type, LeakAlert.entity_id == entity_id)
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import PipeNode, Pipe
+from schemas import GraphNode, GraphEdge
+from graph_index import GraphIndex, graph_index, graph_node, graph_edge
+from columnar import JSON, MSGPACK, packb, table
+from json_encoder import dumps
+
+def graph_body(nodes: List[Dict], edges: List[Dict], media_type: str = JSON) -> bytes:
+    """Serialized /graph payload: GraphData JSON, or one MessagePack column table each for nodes and edges.
+
+    Entries come from the graph index or straight from ORM rows, so the
+    JSON is encoded without validating it against GraphData.
+    """
+    if media_type == MSGPACK:
+        return packb({"nodes": table(GraphNode, nodes, ("type", "status")), "edges": table(GraphEdge, edges, ("status",))})
+    return dumps({"nodes": nodes, "edges": edges})
+
+def index_body(index: GraphIndex, media_type: str = JSON) -> bytes:
+    """Serialized full /graph payload from the graph index.
+
+    The MessagePack tables come straight from the index arrays, in index
+    order; the JSON lists the entries sorted by id.
+    """
+    if media_type == MSGPACK:
+        nodes, edges = index.tables()
+        return packb({"nodes": nodes, "edges": edges})
+    return graph_body(*index.entries())
+
+class GraphSnapshotCache:
+    """Serialized /graph payload tagged with a monotonically increasing version.
+
+    Every write to a Pipe or PipeNode bumps the version; the snapshot is
+    rebuilt lazily on the first read after a bump, so repeated polls between
+    writes cost one version comparison (or a 304 when the client sends the
+    ETag). Writes recorded through `record` also land in a
+    bounded change log, from which `changes(since)` answers delta requests
+    and subscribers are woken for live push.
+    """
+
+    def __init__(self, change_log_size: int = 10_000):
+        self._lock = threading.Lock()
+        # Distinguishes versions handed out by different server runs
+        self._epoch = format(int(time.time()), "x")
+        self.version = 0
+        # media type -> (version, body)
+        self._snapshots: Dict[str, Tuple[int, bytes]] = {}
+        self.hits = 0
+        self.rebuilds = 0
+
+        # (version, kind, entry) for every recorded change, oldest first
+        self._changes: deque = deque(maxlen=change_log_size)
+        # Clients whose version is older than this cannot be served a delta
+        self._resync_before = 0
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    def bump(self) -> int:
+        """Invalidate the snapshot after a bulk change that is not in the change log"""
+        with self._lock:
+            self.version += 1
+            self._resync_before = self.version
+            version = self.version
+        self._notify()
+        return version
+
+    def record(self, kind: str, before: Optional[Dict], after: Dict):
+        """Log a "node" or "edge" write given its graph entries before and after"""
+        if before == after:
+            return  # nothing the graph shows has changed
+        with self._lock:
+            self.version += 1
+            if len(self._changes) == self._changes.maxlen:
+                self._resync_before = self._changes[0][0]
+            self._changes.append((self.version, kind, after))
+        self._notify()
+
+    def token(self, version: int) -> str:
+        """Version as handed to clients: "<epoch>-<n>", so a restarted server does not accept old versions"""
+        return f"{self._epoch}-{version}"
+
+    def parse_token(self, token: str) -> Optional[int]:
+        """Version of a token from this server run (None for another run's or a malformed token)"""
+        epoch, _, version = token.rpartition("-")
+        return int(version) if epoch == self._epoch and version.isdigit() else None
+
+    def changes(self, since: str) -> Dict:
+        """Nodes and edges changed after version token `since`, latest state only"""
+        since_version = self.parse_token(since)
+        with self._lock:
+            version = self.version
+            if since_version is None or since_version < self._resync_before or since_version > version:
+                return {"version": self.token(version), "since": since, "full_resync": True, "nodes": [], "edges": []}
+            recent = [change for change in self._changes if change[0] > since_version]
+
+        latest = {}
+        for _, kind, entry in recent:
+            latest[(kind, entry["id"])] = entry
+        return {
+            "version": self.token(version),
+            "since": since,
+            "full_resync": False,
+            "nodes": [entry for (kind, _), entry in latest.items() if kind == "node"],
+            "edges": [entry for (kind, _), entry in latest.items() if kind == "edge"]
+        }
+
+    def subscribe(self) -> asyncio.Event:
+        """Event set (from any thread) whenever the version moves"""
+        event = asyncio.Event()
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), event))
+        return event
+
+    def unsubscribe(self, event: asyncio.Event):
+        with self._lock:
+            self._subscribers = [(loop, e) for loop, e in self._subscribers if e is not event]
+
+    def _notify(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, event in subscribers:
+            # Writes usually happen on worker threads, not on the event loop
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+    def etag_for(self, version: int, media_type: str = JSON) -> str:
+        # Each representation of a version gets its own tag
+        suffix = "-msgpack" if media_type == MSGPACK else ""
+        return f'"graph-{self.token(version)}{suffix}"'
+
+    @property
+    def etag(self) -> str:
+        return self.etag_for(self.version)
+
+    def matches(self, if_none_match: Optional[str], media_type: str = JSON) -> bool:
+        """True when an If-None-Match header names the current version"""
+        if not if_none_match:
+            return False
+        current = self.etag_for(self.version, media_type)
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == current:
+                return True
+        return False
+
+    def snapshot(self, db: Session, media_type: str = JSON) -> Tuple[str, bytes]:
+        """Current (etag, body) in a media type, rebuilding it if a write happened since the last build"""
+        with self._lock:
+            version = self.version
+            cached = self._snapshots.get(media_type)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return self.etag_for(version, media_type), cached[1]
+
+        body = self._build(db, media_type)
+        with self._lock:
+            # A write that landed mid-build leaves the snapshot stale; keep the old one
+            if self.version == version:
+                self._snapshots[media_type] = (version, body)
+            self.rebuilds += 1
+        return self.etag_for(version, media_type), body
+
+    def _build(self, db: Session, media_type: str) -> bytes:
+        if graph_index.built:
+            return index_body(graph_index, media_type)
+        nodes = [graph_node(node) for node in db.query(PipeNode).order_by(PipeNode.id).yield_per(1000)]
+        edges = [graph_edge(pipe) for pipe in db.query(Pipe).order_by(Pipe.id).yield_per(1000)]
+        return graph_body(nodes, edges, media_type)
+
+    def stats(self) -> Dict:
+        return {
+            "version": self.token(self.version),
+            "etag": self.etag,
+            "hits": self.hits,
+            "rebuilds": self.rebuilds,
+            "change_log": len(self._changes),
+            "subscribers": len(self._subscribers)
+        }
+
+# Global instance
+graph_cache = GraphSnapshotCache()
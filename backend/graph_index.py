@@ -0,0 +1,388 @@
+import threading
+from itertools import compress, repeat
+from operator import itemgetter, is_not
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import PipeNode, Pipe
+from columnar import dictionary_column, float64_column
+
+# Node types with a code in GraphIndex.node_type (-1 for anything else)
+NODE_TYPES = ("pump", "valve", "sensor", "junction")
+_NODE_TYPE_CODES = {name: code for code, name in enumerate(NODE_TYPES)}
+
+def graph_node(node: PipeNode) -> Dict:
+    """Frontend graph representation of a node"""
+    return {
+        "id": node.id,
+        "name": node.name,
+        "type": node.type,
+        "pressure": node.pressure,
+        "status": node.status,
+        "position": {"x": node.longitude * 100, "y": node.latitude * 100}
+    }
+
+def graph_edge(pipe: Pipe) -> Dict:
+    """Frontend graph representation of a pipe"""
+    return {
+        "id": pipe.id,
+        "source": pipe.source_node_id,
+        "target": pipe.target_node_id,
+        "length": pipe.length,
+        "current_flow": pipe.current_flow,
+        "flow_capacity": pipe.flow_capacity,
+        "status": "normal" if pipe.current_flow < pipe.flow_capacity * 0.8 else "high"
+    }
+
+class Adjacency:
+    """CSR adjacency of the pipe graph in both directions.
+
+    The pipes leaving node i are `out_pipes[out_indptr[i]:out_indptr[i + 1]]`
+    and lead to `out_nodes[...]` at the same positions; `in_*` is the same
+    for pipes arriving at i. All values are integer ids.
+    """
+
+    __slots__ = ("out_indptr", "out_pipes", "out_nodes", "in_indptr", "in_pipes", "in_nodes")
+
+    def __init__(self, nodes: int, sources: np.ndarray, targets: np.ndarray):
+        self.out_indptr, self.out_pipes = _counting_sort(sources, nodes)
+        self.out_nodes = targets[self.out_pipes]
+        self.in_indptr, self.in_pipes = _counting_sort(targets, nodes)
+        self.in_nodes = sources[self.in_pipes]
+
+    def downstream(self, node: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(pipes, nodes) leaving a node"""
+        start, end = self.out_indptr[node], self.out_indptr[node + 1]
+        return self.out_pipes[start:end], self.out_nodes[start:end]
+
+    def upstream(self, node: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(pipes, nodes) arriving at a node"""
+        start, end = self.in_indptr[node], self.in_indptr[node + 1]
+        return self.in_pipes[start:end], self.in_nodes[start:end]
+
+def _counting_sort(keys: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    indptr = np.zeros(buckets + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=buckets), out=indptr[1:])
+    return indptr, np.argsort(keys, kind="stable")
+
+def gather(indptr: np.ndarray, values: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Concatenated CSR rows `values[indptr[r]:indptr[r + 1]]` for every r in `rows`"""
+    return values[ranges(indptr[rows], indptr[rows + 1])]
+
+def ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenated `arange(start, end)` for every start/end pair"""
+    counts = ends - starts
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+class GraphIndex:
+    """In-memory topology of the pipe network with dense integer ids.
+
+    Every node and pipe gets an integer id in the order it was first seen;
+    `node_ids`/`pipe_ids` map back to the string ids. Pipe endpoints live in
+    growable arrays, together with each node's coordinates, the node flow
+    rates and pipe pressure losses the mass balance needs, and the graph
+    entries the frontend is sent. `rebuild()` loads everything with two
+    column queries; afterwards crud passes every node and pipe write to
+    `apply_node`/`apply_edge`, which patch the arrays in place. The CSR
+    adjacency is not patched: the first traversal after a structural change
+    rebuilds it in full with a counting sort (tens of milliseconds at 150k
+    pipes), while flow and status writes leave it valid.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._reset(capacity)
+        self.built = False
+        self.adjacency_builds = 0
+
+    def _reset(self, capacity: int):
+        self.node_index: Dict[str, int] = {}
+        self.node_ids: List[str] = []
+        self.nodes: List[Optional[Dict]] = []  # graph entry per node (None until the node itself is seen)
+        self.latitude = np.full(capacity, np.nan)
+        self.longitude = np.full(capacity, np.nan)
+        self.node_type = np.full(capacity, -1, dtype=np.int8)
+        self.flow_rate = np.full(capacity, np.nan)
+        self.pressure = np.full(capacity, np.nan)
+
+        self.pipe_index: Dict[str, int] = {}
+        self.pipe_ids: List[str] = []
+        self.edges: List[Dict] = []
+        self.sources = np.zeros(capacity, dtype=np.int64)
+        self.targets = np.zeros(capacity, dtype=np.int64)
+        self.pressure_loss = np.full(capacity, np.nan)
+        self.length = np.full(capacity, np.nan)
+        self.current_flow = np.full(capacity, np.nan)
+        self.flow_capacity = np.full(capacity, np.nan)
+
+        # Bumped on every write, the topology version on structural ones
+        # (new nodes or pipes, re-routed pipes, node type changes) and the
+        # geometry version when a node is added or moves
+        self.version = 0
+        self.topology_version = 0
+        self.geometry_version = 0
+        self._adjacency: Optional[Tuple[int, Adjacency]] = None
+
+    def rebuild(self, db: Session):
+        connection = db.connection()
+        nodes = connection.execute(
+            select(
+                PipeNode.id, PipeNode.name, PipeNode.type, PipeNode.pressure, PipeNode.status,
+                PipeNode.latitude, PipeNode.longitude, PipeNode.flow_rate
+            ).order_by(PipeNode.id)
+        ).fetchall()
+        pipes = connection.execute(
+            select(
+                Pipe.id, Pipe.source_node_id, Pipe.target_node_id, Pipe.length,
+                Pipe.current_flow, Pipe.flow_capacity, Pipe.pressure_loss
+            ).order_by(Pipe.id)
+        ).fetchall()
+
+        with self._lock:
+            self._reset(max(len(nodes), len(pipes), 1024))
+            for node in nodes:
+                self._put_node(node, graph_node(node))
+            for pipe in pipes:
+                self._put_edge(graph_edge(pipe), pipe.pressure_loss)
+            self.version += 1
+            self.topology_version = self.geometry_version = self.version
+            self.built = True
+        print(f"Graph index built: {len(nodes)} nodes, {len(pipes)} pipes")
+
+    def apply_node(self, node: PipeNode, entry: Dict):
+        """Record a written node given the ORM object and its graph entry"""
+        with self._lock:
+            if self._put_node(node, entry):
+                self.topology_version = self.version + 1
+            self.version += 1
+
+    def apply_edge(self, entry: Dict, pressure_loss: Optional[float] = None):
+        """Record a written pipe given its graph entry and rated pressure loss"""
+        with self._lock:
+            if self._put_edge(entry, pressure_loss):
+                self.topology_version = self.version + 1
+            self.version += 1
+
+    def _node_slot(self, node_id: str) -> int:
+        slot = self.node_index.get(node_id)
+        if slot is None:
+            slot = len(self.node_ids)
+            if slot >= len(self.latitude):
+                self.latitude = _grown(self.latitude, np.nan)
+                self.longitude = _grown(self.longitude, np.nan)
+                self.node_type = _grown(self.node_type, -1)
+                self.flow_rate = _grown(self.flow_rate, np.nan)
+                self.pressure = _grown(self.pressure, np.nan)
+            self.node_index[node_id] = slot
+            self.node_ids.append(node_id)
+            self.nodes.append(None)
+        return slot
+
+    def _put_node(self, node, entry: Dict) -> bool:
+        """Store a node entry; returns True when the topology changed"""
+        new = entry["id"] not in self.node_index
+        slot = self._node_slot(entry["id"])
+        self.nodes[slot] = entry
+        latitude = np.nan if node.latitude is None else node.latitude
+        longitude = np.nan if node.longitude is None else node.longitude
+        if not (_same(self.latitude[slot], latitude) and _same(self.longitude[slot], longitude)):
+            self.geometry_version = self.version + 1
+        self.latitude[slot], self.longitude[slot] = latitude, longitude
+        self.flow_rate[slot] = np.nan if node.flow_rate is None else node.flow_rate
+        self.pressure[slot] = np.nan if entry["pressure"] is None else entry["pressure"]
+        node_type = _NODE_TYPE_CODES.get(entry["type"], -1)
+        changed = new or self.node_type[slot] != node_type
+        self.node_type[slot] = node_type
+        return changed
+
+    def _put_edge(self, entry: Dict, pressure_loss: Optional[float] = None) -> bool:
+        """Store a pipe entry; returns True when the topology changed"""
+        source, target = self._node_slot(entry["source"]), self._node_slot(entry["target"])
+        slot = self.pipe_index.get(entry["id"])
+        new = slot is None
+        if new:
+            slot = len(self.pipe_ids)
+            if slot >= len(self.sources):
+                self.sources = _grown(self.sources, 0)
+                self.targets = _grown(self.targets, 0)
+                self.pressure_loss = _grown(self.pressure_loss, np.nan)
+                self.length = _grown(self.length, np.nan)
+                self.current_flow = _grown(self.current_flow, np.nan)
+                self.flow_capacity = _grown(self.flow_capacity, np.nan)
+            self.pipe_index[entry["id"]] = slot
+            self.pipe_ids.append(entry["id"])
+            self.edges.append(entry)
+        else:
+            self.edges[slot] = entry
+        self.pressure_loss[slot] = np.nan if pressure_loss is None else pressure_loss
+        self.length[slot], self.current_flow[slot], self.flow_capacity[slot] = entry["length"], entry["current_flow"], entry["flow_capacity"]
+        if not new and self.sources[slot] == source and self.targets[slot] == target:
+            return False
+        self.sources[slot], self.targets[slot] = source, target
+        return True
+
+    def adjacency(self) -> Adjacency:
+        """CSR adjacency for the current topology"""
+        with self._lock:
+            cached = self._adjacency
+            if cached is not None and cached[0] >= self.topology_version:
+                return cached[1]
+            version = self.version
+            pipes = len(self.pipe_ids)
+            sources, targets = self.sources[:pipes].copy(), self.targets[:pipes].copy()
+            nodes = len(self.node_ids)
+
+        adjacency = Adjacency(nodes, sources, targets)
+        with self._lock:
+            if self._adjacency is None or self._adjacency[0] < version:
+                self._adjacency = (version, adjacency)
+            self.adjacency_builds += 1
+        return adjacency
+
+    def topology(self) -> Dict:
+        """Consistent copies of the topology version, pipe endpoints and node types"""
+        with self._lock:
+            nodes, pipes = len(self.node_ids), len(self.pipe_ids)
+            return {
+                "version": self.topology_version,
+                "nodes": nodes,
+                "sources": self.sources[:pipes].copy(),
+                "targets": self.targets[:pipes].copy(),
+                "node_type": self.node_type[:nodes].copy()
+            }
+
+    def geometry(self) -> Dict:
+        """Consistent copies of the geometry version and node coordinates"""
+        with self._lock:
+            nodes = len(self.node_ids)
+            return {
+                "version": self.geometry_version,
+                "latitude": self.latitude[:nodes].copy(),
+                "longitude": self.longitude[:nodes].copy()
+            }
+
+    def network(self) -> Dict:
+        """Consistent copies of the ids, entries, endpoints, coordinates and flow columns, for the mass balance and the levels of detail"""
+        with self._lock:
+            nodes, pipes = len(self.node_ids), len(self.pipe_ids)
+            return {
+                "node_ids": list(self.node_ids),
+                "nodes": list(self.nodes),
+                "latitude": self.latitude[:nodes].copy(),
+                "longitude": self.longitude[:nodes].copy(),
+                "flow_rate": self.flow_rate[:nodes].copy(),
+                "pipe_ids": list(self.pipe_ids),
+                "edges": list(self.edges),
+                "sources": self.sources[:pipes].copy(),
+                "targets": self.targets[:pipes].copy(),
+                "pressure_loss": self.pressure_loss[:pipes].copy()
+            }
+
+    def node_id(self, node_id: str) -> Optional[int]:
+        return self.node_index.get(node_id)
+
+    def has_node(self, node_id: str) -> bool:
+        """Whether the node itself has been seen (not only as a pipe endpoint)"""
+        slot = self.node_index.get(node_id)
+        return slot is not None and self.nodes[slot] is not None
+
+    def pipe_id(self, pipe_id: str) -> Optional[int]:
+        return self.pipe_index.get(pipe_id)
+
+    def endpoints(self, pipe: int) -> Tuple[int, int]:
+        return int(self.sources[pipe]), int(self.targets[pipe])
+
+    def entries(self, nodes: Optional[np.ndarray] = None, pipes: Optional[np.ndarray] = None) -> Tuple[List[Dict], List[Dict]]:
+        """Graph entries of every node and pipe (or the given integer ids), ordered by id"""
+        with self._lock:
+            if nodes is None:
+                nodes = [entry for entry in self.nodes if entry is not None]
+            else:
+                nodes = [self.nodes[node] for node in nodes if self.nodes[node] is not None]
+            edges = list(self.edges) if pipes is None else [self.edges[pipe] for pipe in pipes]
+        nodes.sort(key=lambda entry: entry["id"])
+        edges.sort(key=lambda entry: entry["id"])
+        return nodes, edges
+
+    def tables(self) -> Tuple[Dict, Dict]:
+        """Column tables (as columnar.table builds them) of every node and pipe, in index order.
+
+        Numbers, positions, node types and pipe endpoints (as int32 indices
+        into all node ids) are sliced from the index arrays; only node names
+        and statuses are read off the entries.
+        """
+        with self._lock:
+            count, pipes = len(self.node_ids), len(self.pipe_ids)
+            present = np.fromiter(map(is_not, self.nodes, repeat(None)), dtype=bool, count=count)
+            node_ids = list(self.node_ids)
+            nodes = list(filter(None, self.nodes))
+            node_type = self.node_type[:count][present]
+            pressure = self.pressure[:count][present]
+            longitude, latitude = self.longitude[:count][present], self.latitude[:count][present]
+            pipe_ids = list(self.pipe_ids)
+            sources, targets = self.sources[:pipes].astype("<i4"), self.targets[:pipes].astype("<i4")
+            length, current_flow, flow_capacity = self.length[:pipes].copy(), self.current_flow[:pipes].copy(), self.flow_capacity[:pipes].copy()
+
+        if (node_type < 0).any():
+            types = dictionary_column(list(map(itemgetter("type"), nodes)))
+        else:
+            types = {"dictionary": list(NODE_TYPES), "indices": node_type.astype("<i4").tobytes()}
+        node_table = {
+            "length": len(nodes),
+            "dtypes": {
+                "id": "string", "name": "string", "type": "dictionary", "pressure": "float64",
+                "status": "dictionary", "position.x": "float64", "position.y": "float64"
+            },
+            "columns": {
+                "id": list(compress(node_ids, present)),
+                "name": list(map(itemgetter("name"), nodes)),
+                "type": types,
+                "pressure": float64_column(pressure),
+                "status": dictionary_column(list(map(itemgetter("status"), nodes))),
+                "position.x": float64_column(longitude * 100),
+                "position.y": float64_column(latitude * 100)
+            }
+        }
+        # Same rule as graph_edge
+        high = ~(current_flow < flow_capacity * 0.8)
+        edge_table = {
+            "length": pipes,
+            "dtypes": {
+                "id": "string", "source": "dictionary", "target": "dictionary", "length": "float64",
+                "current_flow": "float64", "flow_capacity": "float64", "status": "dictionary"
+            },
+            "columns": {
+                "id": pipe_ids,
+                "source": {"dictionary": node_ids, "indices": sources.tobytes()},
+                "target": {"dictionary": node_ids, "indices": targets.tobytes()},
+                "length": float64_column(length),
+                "current_flow": float64_column(current_flow),
+                "flow_capacity": float64_column(flow_capacity),
+                "status": {"dictionary": ["normal", "high"], "indices": high.astype("<i4").tobytes()}
+            }
+        }
+        return node_table, edge_table
+
+    def stats(self) -> Dict:
+        adjacency = self._adjacency
+        return {
+            "version": self.version,
+            "nodes": len(self.node_ids),
+            "pipes": len(self.pipe_ids),
+            "adjacency_current": adjacency is not None and adjacency[0] >= self.topology_version,
+            "adjacency_builds": self.adjacency_builds
+        }
+
+def _same(old: float, new: float) -> bool:
+    return old == new or (np.isnan(old) and np.isnan(new))
+
+def _grown(array: np.ndarray, fill) -> np.ndarray:
+    grown = np.full(2 * len(array), fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+# Global instance
+graph_index = GraphIndex()
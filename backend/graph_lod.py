@@ -0,0 +1,362 @@
+import math
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import PipeNode
+from graph_index import GraphIndex, NODE_TYPES, graph_index
+from mock_data import INDIAN_CITIES
+
+# Node statuses from least to most severe; a cluster shows its worst one
+STATUS_SEVERITY = ("active", "demand", "unreported", "offline", "leak")
+_STATUS_CODES = {name: code for code, name in enumerate(STATUS_SEVERITY)}
+_TYPE_CODES = {name: code for code, name in enumerate(NODE_TYPES)}
+
+# Columns of a cluster's totals; status and type counts follow, with a last
+# "other" column each for values not listed above
+COUNT, FLOW, PRESSURE_SUM, PRESSURE_COUNT, LATITUDE_SUM, LONGITUDE_SUM, INTERNAL_PIPES, INTERNAL_FLOW = range(8)
+STATUS_COLUMNS = 8 + np.arange(len(STATUS_SEVERITY) + 1)
+TYPE_COLUMNS = STATUS_COLUMNS[-1] + 1 + np.arange(len(NODE_TYPES) + 1)
+COLUMNS = TYPE_COLUMNS[-1] + 1
+
+# Pipe totals of a collapsed edge
+PIPES, EDGE_FLOW, EDGE_CAPACITY = range(3)
+
+class ClusterLevel:
+    """Node clusters of one zoom level and the pipes between them.
+
+    `cluster_keys` maps node coordinates to integer cluster keys (-1 for
+    nodes without coordinates) and `describe` turns a key into the
+    cluster's id and name. Each key gets a dense row in `totals` the first
+    time a node lands in it. Pipes inside a cluster only add to its
+    internal totals; pipes between two clusters are summed into one edge
+    per cluster pair, whichever way they point.
+    """
+
+    def __init__(self, name: str, cluster_keys: Callable, describe: Callable):
+        self.name = name
+        self.cluster_keys = cluster_keys
+        self.describe = describe
+        self.reset(0)
+
+    def reset(self, nodes: int):
+        self.cluster_index: Dict[int, int] = {}
+        self.clusters: List[Tuple[str, str]] = []
+        self.totals = np.zeros((0, COLUMNS))
+        self.edges: Dict[Tuple[int, int], np.ndarray] = {}
+        self.node_cluster = np.full(nodes, -1, dtype=np.int64)
+
+    def rows(self, keys: np.ndarray) -> np.ndarray:
+        """Dense cluster rows for cluster keys, adding clusters seen for the first time"""
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        placed = keys >= 0
+        unique, inverse = np.unique(keys[placed], return_inverse=True)
+        for key in unique.tolist():
+            if key not in self.cluster_index:
+                self.cluster_index[key] = len(self.clusters)
+                self.clusters.append(self.describe(key))
+        rows[placed] = np.array([self.cluster_index[key] for key in unique.tolist()], dtype=np.int64)[inverse]
+        if len(self.clusters) > len(self.totals):
+            grown = np.zeros((len(self.clusters), COLUMNS))
+            grown[:len(self.totals)] = self.totals
+            self.totals = grown
+        return rows
+
+class GraphLevelOfDetail:
+    """Precomputed cluster aggregates of the network for zoomed-out views.
+
+    Every level collapses nodes into clusters (the nearest city, or a
+    lon/lat grid cell) with node counts, summed flow, mean pressure and
+    the worst status, and collapses the pipes between two clusters into
+    one weighted edge. `rebuild()` computes every level with array
+    operations; afterwards crud passes each node and pipe write to
+    `apply_node`/`apply_edge`, which subtract the element's old
+    contribution and add the new one. Serving a level then costs one pass
+    over its clusters, not over the network.
+    """
+
+    def __init__(self, index: GraphIndex, levels: List[ClusterLevel]):
+        self.index = index
+        self.levels = {level.name: level for level in levels}
+        self._lock = threading.Lock()
+        self._views: Dict[str, Tuple[int, Dict]] = {}
+        self.version = 0
+        self._reset(0, 0)
+
+    def _reset(self, nodes: int, pipes: int):
+        # What each node and pipe currently contributes, by graph index id
+        self.node_values = np.zeros((nodes, COLUMNS))
+        self.node_coordinates = np.full((nodes, 2), np.nan)
+        self.pipe_ends = np.full((pipes, 2), -1, dtype=np.int64)
+        self.pipe_values = np.zeros((pipes, 2))
+        for level in self.levels.values():
+            level.reset(nodes)
+
+    def rebuild(self):
+        """Recompute every level from one consistent snapshot of the graph index (built first)"""
+        network = self.index.network()
+        entries, edges = network["nodes"], network["edges"]
+
+        with self._lock:
+            self._reset(len(entries), len(edges))
+            # Nodes only seen as a pipe endpoint have no entry yet
+            slots = np.array([slot for slot, entry in enumerate(entries) if entry is not None], dtype=np.int64)
+            known = [entries[slot] for slot in slots]
+            self._store_nodes(
+                slots,
+                [entry["status"] for entry in known],
+                [entry["type"] for entry in known],
+                network["flow_rate"][slots],
+                np.array([entry["pressure"] for entry in known], dtype=float),
+                network["latitude"][slots],
+                network["longitude"][slots]
+            )
+            self.pipe_ends[:] = np.c_[network["sources"], network["targets"]]
+            self.pipe_values[:] = np.nan_to_num(
+                np.array([(edge["current_flow"], edge["flow_capacity"]) for edge in edges], dtype=float).reshape(-1, 2)
+            )
+
+            for level in self.levels.values():
+                latitude, longitude = self.node_coordinates[:, 0], self.node_coordinates[:, 1]
+                level.node_cluster = level.rows(level.cluster_keys(latitude, longitude))
+                placed = level.node_cluster >= 0
+                _add_rows(level.totals, level.node_cluster[placed], self.node_values[placed])
+                self._fold_pipes(level, np.arange(len(self.pipe_ends)), 1)
+            self.version += 1
+        print(f"Graph levels of detail built: " + ", ".join(
+            f"{name} {len(level.clusters)} clusters/{len(level.edges)} edges" for name, level in self.levels.items()
+        ))
+
+    def apply_node(self, node: PipeNode):
+        """Record a written node (after graph_index has seen it)"""
+        slot = self.index.node_id(node.id)
+        if slot is None:
+            return
+        latitude = np.array([np.nan if node.latitude is None else node.latitude])
+        longitude = np.array([np.nan if node.longitude is None else node.longitude])
+        with self._lock:
+            self._grow(nodes=slot + 1)
+            clusters = {name: level.rows(level.cluster_keys(latitude, longitude))[0] for name, level in self.levels.items()}
+            # Only a node entering or leaving a cluster moves its pipes
+            moved = any(level.node_cluster[slot] != clusters[name] for name, level in self.levels.items())
+            touching = np.flatnonzero((self.pipe_ends == slot).any(axis=1)) if moved else np.zeros(0, dtype=np.int64)
+            for level in self.levels.values():
+                self._fold_pipes(level, touching, -1)
+                self._fold_node(level, slot, -1)
+            self._store_nodes(
+                np.array([slot]), [node.status], [node.type],
+                np.array([node.flow_rate], dtype=float), np.array([node.pressure], dtype=float), latitude, longitude
+            )
+            for name, level in self.levels.items():
+                level.node_cluster[slot] = clusters[name]
+                self._fold_node(level, slot, 1)
+                self._fold_pipes(level, touching, 1)
+            self.version += 1
+
+    def apply_edge(self, entry: Dict):
+        """Record a written pipe given its graph entry (after graph_index has seen it)"""
+        slot = self.index.pipe_id(entry["id"])
+        if slot is None:
+            return
+        pipe = np.array([slot])
+        with self._lock:
+            ends = self.index.endpoints(slot)
+            self._grow(nodes=max(ends) + 1, pipes=slot + 1)
+            for level in self.levels.values():
+                self._fold_pipes(level, pipe, -1)
+            self.pipe_ends[slot] = ends
+            self.pipe_values[slot] = (entry["current_flow"] or 0.0, entry["flow_capacity"] or 0.0)
+            for level in self.levels.values():
+                self._fold_pipes(level, pipe, 1)
+            self.version += 1
+
+    def _store_nodes(
+        self,
+        slots: np.ndarray,
+        statuses: List[str],
+        types: List[str],
+        flow_rate: np.ndarray,
+        pressure: np.ndarray,
+        latitude: np.ndarray,
+        longitude: np.ndarray
+    ):
+        """Set the contributions of nodes at their graph index ids (NaN for missing numbers)"""
+        placed = ~(np.isnan(latitude) | np.isnan(longitude))
+        rows = np.arange(len(slots))
+        values = np.zeros((len(slots), COLUMNS))
+        values[:, COUNT] = 1
+        values[:, FLOW] = np.nan_to_num(flow_rate)
+        values[:, PRESSURE_SUM] = np.nan_to_num(pressure)
+        values[:, PRESSURE_COUNT] = ~np.isnan(pressure)
+        values[placed, LATITUDE_SUM], values[placed, LONGITUDE_SUM] = latitude[placed], longitude[placed]
+        values[rows, STATUS_COLUMNS[[_STATUS_CODES.get(status, -1) for status in statuses]]] = 1
+        values[rows, TYPE_COLUMNS[[_TYPE_CODES.get(kind, -1) for kind in types]]] = 1
+        self.node_values[slots] = values
+        self.node_coordinates[slots] = np.where(placed[:, None], np.c_[latitude, longitude], np.nan)
+
+    def _fold_node(self, level: ClusterLevel, slot: int, sign: int):
+        cluster = level.node_cluster[slot]
+        if cluster >= 0:
+            level.totals[cluster] += sign * self.node_values[slot]
+
+    def _fold_pipes(self, level: ClusterLevel, pipes: np.ndarray, sign: int):
+        """Add (sign 1) or remove (sign -1) pipes from a level's internal and edge totals"""
+        if len(pipes) == 0:
+            return
+        ends = self.pipe_ends[pipes]
+        known = (ends >= 0).all(axis=1)
+        pipes, ends = pipes[known], ends[known]
+        clusters = level.node_cluster[ends]
+        placed = (clusters >= 0).all(axis=1)
+        pipes, clusters = pipes[placed], clusters[placed]
+        flows = self.pipe_values[pipes]
+
+        internal = clusters[:, 0] == clusters[:, 1]
+        level.totals[:, INTERNAL_PIPES] += sign * np.bincount(clusters[internal, 0], minlength=len(level.totals))
+        level.totals[:, INTERNAL_FLOW] += sign * np.bincount(clusters[internal, 0], flows[internal, 0], len(level.totals))
+
+        pairs = np.sort(clusters[~internal], axis=1)
+        if len(pairs) == 0:
+            return
+        pairs, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        sums = np.zeros((len(pairs), 3))
+        sums[:, PIPES] = np.bincount(inverse, minlength=len(pairs))
+        sums[:, EDGE_FLOW] = np.bincount(inverse, flows[~internal, 0], len(pairs))
+        sums[:, EDGE_CAPACITY] = np.bincount(inverse, flows[~internal, 1], len(pairs))
+        for (a, b), values in zip(pairs.tolist(), sums):
+            edge = level.edges.get((a, b))
+            if edge is None:
+                edge = level.edges[(a, b)] = np.zeros(3)
+            edge += sign * values
+            if edge[PIPES] <= 0:
+                del level.edges[(a, b)]
+
+    def _grow(self, nodes: int = 0, pipes: int = 0):
+        if nodes > len(self.node_values):
+            size = max(nodes, 2 * len(self.node_values))
+            self.node_values = np.r_[self.node_values, np.zeros((size - len(self.node_values), COLUMNS))]
+            self.node_coordinates = np.r_[self.node_coordinates, np.full((size - len(self.node_coordinates), 2), np.nan)]
+            for level in self.levels.values():
+                level.node_cluster = np.r_[level.node_cluster, np.full(size - len(level.node_cluster), -1)]
+        if pipes > len(self.pipe_ends):
+            size = max(pipes, 2 * len(self.pipe_ends))
+            self.pipe_ends = np.r_[self.pipe_ends, np.full((size - len(self.pipe_ends), 2), -1)]
+            self.pipe_values = np.r_[self.pipe_values, np.zeros((size - len(self.pipe_values), 2))]
+
+    def view(self, name: str) -> Optional[Dict]:
+        """Clusters and collapsed edges of a level (None for an unknown level)"""
+        level = self.levels.get(name)
+        if level is None:
+            return None
+        with self._lock:
+            cached = self._views.get(name)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            version = self.version
+            totals = level.totals.copy()
+            clusters = list(level.clusters)
+            edges = [(pair, values.copy()) for pair, values in level.edges.items()]
+
+        statuses = STATUS_SEVERITY + ("other",)
+        types = NODE_TYPES + ("other",)
+        nodes = []
+        for (cluster_id, cluster_name), row in zip(clusters, totals):
+            count = int(round(row[COUNT]))
+            if count <= 0:
+                continue
+            status_counts = {status: int(round(n)) for status, n in zip(statuses, row[STATUS_COLUMNS]) if round(n) > 0}
+            worst = next((status for status in reversed(STATUS_SEVERITY) if status in status_counts), "other")
+            nodes.append({
+                "id": cluster_id,
+                "name": cluster_name,
+                "type": "cluster",
+                "status": worst,
+                "node_count": count,
+                "flow_rate": round(row[FLOW], 3),
+                "pressure": round(row[PRESSURE_SUM] / row[PRESSURE_COUNT], 3) if row[PRESSURE_COUNT] >= 1 else None,
+                "position": {"x": round(row[LONGITUDE_SUM] / count * 100, 6), "y": round(row[LATITUDE_SUM] / count * 100, 6)},
+                "internal_pipes": int(round(row[INTERNAL_PIPES])),
+                "internal_flow": round(row[INTERNAL_FLOW], 3),
+                "status_counts": status_counts,
+                "type_counts": {kind: int(round(n)) for kind, n in zip(types, row[TYPE_COLUMNS]) if round(n) > 0}
+            })
+        view = {
+            "level": name,
+            "version": version,
+            "nodes": nodes,
+            "edges": [
+                {
+                    "id": f"{clusters[a][0]}~{clusters[b][0]}",
+                    "source": clusters[a][0],
+                    "target": clusters[b][0],
+                    "pipe_count": int(round(values[PIPES])),
+                    "current_flow": round(values[EDGE_FLOW], 3),
+                    "flow_capacity": round(values[EDGE_CAPACITY], 3),
+                    "status": "normal" if values[EDGE_FLOW] < values[EDGE_CAPACITY] * 0.8 else "high"
+                }
+                for (a, b), values in sorted(edges, key=lambda edge: edge[0])
+            ]
+        }
+        with self._lock:
+            self._views[name] = (version, view)
+        return view
+
+    def stats(self) -> Dict:
+        return {
+            "version": self.version,
+            "levels": {
+                name: {"clusters": len(level.clusters), "edges": len(level.edges)}
+                for name, level in self.levels.items()
+            }
+        }
+
+def _add_rows(totals: np.ndarray, rows: np.ndarray, values: np.ndarray):
+    """totals[rows[i]] += values[i], summing repeated rows"""
+    for column in range(totals.shape[1]):
+        totals[:, column] += np.bincount(rows, values[:, column], len(totals))
+
+def city_level() -> ClusterLevel:
+    """Clusters of the nodes nearest to each city in mock_data.INDIAN_CITIES"""
+    latitude = np.array([city["lat"] for city in INDIAN_CITIES])
+    longitude = np.array([city["lng"] for city in INDIAN_CITIES])
+    scale = np.cos(np.radians(latitude.mean()))
+
+    def cluster_keys(node_latitude: np.ndarray, node_longitude: np.ndarray) -> np.ndarray:
+        keys = np.full(len(node_latitude), -1, dtype=np.int64)
+        placed = np.flatnonzero(~(np.isnan(node_latitude) | np.isnan(node_longitude)))
+        for chunk in np.array_split(placed, max(len(placed) // 10_000, 1)):
+            distance = (node_latitude[chunk, None] - latitude) ** 2 + ((node_longitude[chunk, None] - longitude) * scale) ** 2
+            keys[chunk] = distance.argmin(axis=1)
+        return keys
+
+    def describe(key: int) -> Tuple[str, str]:
+        return f"city:{INDIAN_CITIES[key]['name']}", INDIAN_CITIES[key]["name"]
+
+    return ClusterLevel("city", cluster_keys, describe)
+
+def grid_level(degrees: float) -> ClusterLevel:
+    """Clusters of the nodes in each `degrees`-sized lon/lat cell"""
+    # Cell coordinates are offset to stay non-negative and packed into one key
+    span = int(math.ceil(360 / degrees)) + 1
+
+    def cluster_keys(node_latitude: np.ndarray, node_longitude: np.ndarray) -> np.ndarray:
+        keys = np.full(len(node_latitude), -1, dtype=np.int64)
+        placed = ~(np.isnan(node_latitude) | np.isnan(node_longitude))
+        column = np.floor((node_longitude[placed] + 180) / degrees).astype(np.int64)
+        row = np.floor((node_latitude[placed] + 90) / degrees).astype(np.int64)
+        keys[placed] = column * span + row
+        return keys
+
+    def describe(key: int) -> Tuple[str, str]:
+        west, south = (key // span) * degrees - 180, (key % span) * degrees - 90
+        return f"cell:{degrees:g}:{west:g}:{south:g}", f"{south:g}..{south + degrees:g}N {west:g}..{west + degrees:g}E"
+
+    return ClusterLevel(f"grid-{degrees:g}", cluster_keys, describe)
+
+# Global instance
+graph_lod = GraphLevelOfDetail(graph_index, [city_level()] + [
+    grid_level(float(degrees)) for degrees in os.getenv("LOD_GRID_DEGREES", "4,2,1").split(",")
+])
@@ -0,0 +1,391 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from models import PipeNode, Pipe
+from reading_cache import reading_cache
+from graph_index import GraphIndex, gather, graph_index
+
+# Pumps inject their flow_rate into the network, nodes in "demand" status draw theirs
+SUPPLY_TYPES = ("pump",)
+DEMAND_STATUSES = ("demand",)
+# Pressure reported by these nodes is not a measurement
+UNMEASURED_STATUSES = ("offline",)
+
+class FlowNetwork:
+    """Node-edge incidence matrix of the pipe network with the flows on it.
+
+    `incidence[i, e]` is +1 when pipe e delivers into node i (its target) and
+    -1 when it draws from it (its source), so `incidence @ flows` is every
+    node's inflow minus outflow in one sparse product. Districts are the
+    connected components of the network: no pipe crosses between them, so
+    a district's residual is the sum of its nodes' residuals. Node pressures
+    (NaN when unmeasured) and each pipe's rated pressure loss and length
+    feed leak localisation.
+    """
+
+    def __init__(
+        self,
+        node_ids: List[str],
+        supply: np.ndarray,
+        demand: np.ndarray,
+        pipe_ids: List[str],
+        sources: np.ndarray,
+        targets: np.ndarray,
+        flows: np.ndarray,
+        pressure: Optional[np.ndarray] = None,
+        pressure_loss: Optional[np.ndarray] = None,
+        length: Optional[np.ndarray] = None
+    ):
+        self.node_ids = node_ids
+        self.pipe_ids = pipe_ids
+        self.supply = np.asarray(supply, dtype=np.float64)
+        self.demand = np.asarray(demand, dtype=np.float64)
+        self.flows = np.asarray(flows, dtype=np.float64)
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+
+        nodes, pipes = len(node_ids), len(pipe_ids)
+        self.pressure = np.full(nodes, np.nan) if pressure is None else np.asarray(pressure, dtype=np.float64)
+        self.pressure_loss = np.zeros(pipes) if pressure_loss is None else np.asarray(pressure_loss, dtype=np.float64)
+        self.length = np.zeros(pipes) if length is None else np.asarray(length, dtype=np.float64)
+        columns = np.arange(pipes)
+        self.incidence = sparse.csr_matrix(
+            (np.r_[np.ones(pipes), -np.ones(pipes)], (np.r_[self.targets, self.sources], np.r_[columns, columns])),
+            shape=(nodes, pipes)
+        )
+        self.magnitude = abs(self.incidence)
+
+        adjacency = sparse.csr_matrix((np.ones(pipes), (self.sources, self.targets)), shape=(nodes, nodes))
+        self.district_count, self.districts = connected_components(adjacency, directed=False)
+        # A district is named after its first node
+        first = np.full(self.district_count, nodes, dtype=np.int64)
+        np.minimum.at(first, self.districts, np.arange(nodes))
+        self.district_names = [node_ids[i] for i in first]
+
+    def solve(self, abs_tolerance: float, rel_tolerance: float) -> Dict[str, np.ndarray]:
+        """Per-node and per-district residuals (water in minus water out) and the flagged nodes"""
+        net = self.incidence @ self.flows
+        # Pipe flow through a node counts once, not on the way in and again on the way out
+        through = 0.5 * (self.magnitude @ np.abs(self.flows)) + self.supply + self.demand
+        residual = net + self.supply - self.demand
+        tolerance = np.maximum(abs_tolerance, rel_tolerance * through)
+        return {
+            "residual": residual,
+            "throughput": through,
+            "tolerance": tolerance,
+            "flagged": np.flatnonzero(residual > tolerance),
+            "district_residual": np.bincount(self.districts, residual, self.district_count),
+            "district_supply": np.bincount(self.districts, self.supply, self.district_count),
+            "district_demand": np.bincount(self.districts, self.demand, self.district_count),
+            "district_nodes": np.bincount(self.districts, minlength=self.district_count)
+        }
+
+    def neighbourhood(self, seeds: np.ndarray, hops: int):
+        """Pipes within `hops` pipes of the seed nodes, with the hop at which each was reached.
+
+        Breadth-first over the incidence rows, touching only the frontier, so
+        the cost follows the size of the neighbourhood, not of the network.
+        """
+        indptr, indices = self.incidence.indptr, self.incidence.indices
+        reached = np.zeros(len(self.node_ids), dtype=bool)
+        seen = np.zeros(len(self.pipe_ids), dtype=bool)
+        frontier = np.unique(seeds)
+        reached[frontier] = True
+        pipes, depth = [], []
+        for hop in range(1, hops + 1):
+            found = np.unique(gather(indptr, indices, frontier))
+            if not len(found):
+                break
+            found = found[~seen[found]]
+            seen[found] = True
+            pipes.append(found)
+            depth.append(np.full(len(found), hop))
+
+            ends = np.r_[self.sources[found], self.targets[found]]
+            frontier = np.unique(ends[~reached[ends]])
+            reached[frontier] = True
+        if not pipes:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(pipes), np.concatenate(depth)
+
+    def excess_loss(self, pipes: np.ndarray, pressure: np.ndarray) -> Dict[str, np.ndarray]:
+        """Observed pressure drop along each pipe minus its rated `pressure_loss`.
+
+        A leak draws extra flow through the pipe feeding it, so the pressure
+        downstream falls below what the rated loss predicts. Pipes carrying
+        flow against their nominal direction are read target to source.
+        """
+        forward = self.flows[pipes] >= 0
+        upstream = np.where(forward, self.sources[pipes], self.targets[pipes])
+        downstream = np.where(forward, self.targets[pipes], self.sources[pipes])
+        observed = pressure[upstream] - pressure[downstream]
+        excess = observed - self.pressure_loss[pipes]
+        return {
+            "upstream": upstream,
+            "downstream": downstream,
+            "observed": observed,
+            "excess": excess,
+            "excess_per_km": excess / np.maximum(self.length[pipes] / 1000, 0.01)
+        }
+
+def node_supply_demand(node_type: Optional[str], status: Optional[str], flow_rate: Optional[float]):
+    """(supply, demand) a node contributes to the balance"""
+    rate = flow_rate or 0.0
+    if node_type in SUPPLY_TYPES:
+        return rate, 0.0
+    return 0.0, rate if status in DEMAND_STATUSES else 0.0
+
+class MassBalanceEngine:
+    """Network-wide mass balance, kept in step with pipe and node writes.
+
+    The network is built from the in-memory graph index on first use, with
+    no database query. Afterwards crud passes every written pipe and node to
+    `apply_pipe`/`apply_node`: flow, supply and demand changes are patched
+    into the arrays in place and only the sparse solve reruns, while a new
+    pipe, a moved pipe or a new node invalidates the network and the next
+    request rebuilds it from the index.
+    """
+
+    def __init__(self, index: GraphIndex, abs_tolerance: float = 50.0, rel_tolerance: float = 0.05):
+        self.index = index
+        self.abs_tolerance = abs_tolerance
+        self.rel_tolerance = rel_tolerance
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._loading = 0
+        # generation, network, node/pipe indexes, and the solution (None once patched)
+        self._state: Optional[Dict] = None
+        self.rebuilds = 0
+        self.patches = 0
+        self.solves = 0
+
+    def invalidate(self):
+        """Force a reload on the next request (bulk or structural changes)"""
+        with self._lock:
+            self._generation += 1
+
+    def apply_pipe(self, pipe: Pipe):
+        with self._lock:
+            state = self._patchable()
+            e = None if state is None else state["pipe_index"].get(pipe.id)
+            network = None if state is None else state["network"]
+            if e is None or (
+                network.node_ids[network.sources[e]] != pipe.source_node_id
+                or network.node_ids[network.targets[e]] != pipe.target_node_id
+            ):
+                self._generation += 1
+                return
+            network.flows[e] = pipe.current_flow or 0.0
+            network.pressure_loss[e] = pipe.pressure_loss or 0.0
+            network.length[e] = pipe.length or 0.0
+            self._patched(state)
+
+    def apply_node(self, node: PipeNode):
+        with self._lock:
+            state = self._patchable()
+            i = None if state is None else state["index"].get(node.id)
+            if i is None:
+                self._generation += 1
+                return
+            network = state["network"]
+            network.supply[i], network.demand[i] = node_supply_demand(node.type, node.status, node.flow_rate)
+            measured = node.pressure is not None and node.status not in UNMEASURED_STATUSES
+            network.pressure[i] = node.pressure if measured else np.nan
+            self._patched(state)
+
+    def _patchable(self) -> Optional[Dict]:
+        """The loaded state if it can take a patch (caller holds the lock)"""
+        state = self._state
+        if self._loading or state is None or state["generation"] != self._generation:
+            return None
+        return state
+
+    def _patched(self, state: Dict):
+        # Readers keep the solution they were handed; the next one re-solves
+        self._state = {**state, "solution": None}
+        self.patches += 1
+
+    def _solve(self, state: Dict) -> Dict:
+        start = time.perf_counter()
+        solution = state["network"].solve(self.abs_tolerance, self.rel_tolerance)
+        self.solves += 1
+        return {**state, "solution": solution, "solve_ms": (time.perf_counter() - start) * 1000}
+
+    def _load(self) -> FlowNetwork:
+        snapshot = self.index.network()
+        # Index slots seen only as pipe endpoints are not nodes; their pipes cannot be balanced
+        known = np.array([entry is not None for entry in snapshot["nodes"]], dtype=bool)
+        position = np.cumsum(known) - 1
+        nodes = [entry for entry in snapshot["nodes"] if entry is not None]
+        sources, targets = snapshot["sources"], snapshot["targets"]
+        pipes = np.flatnonzero(known[sources] & known[targets]) if len(known) else np.zeros(0, dtype=np.int64)
+        edges = [snapshot["edges"][e] for e in pipes]
+
+        rates = np.nan_to_num(snapshot["flow_rate"][known])
+        statuses = np.array([entry["status"] for entry in nodes], dtype=str)
+        is_supply = np.isin(np.array([entry["type"] for entry in nodes], dtype=str), SUPPLY_TYPES)
+        is_demand = np.isin(statuses, DEMAND_STATUSES) & ~is_supply
+        pressure = np.array([entry["pressure"] for entry in nodes], dtype=np.float64)  # None reads as NaN
+        pressure[np.isin(statuses, UNMEASURED_STATUSES)] = np.nan
+        return FlowNetwork(
+            [entry["id"] for entry in nodes],
+            np.where(is_supply, rates, 0.0),
+            np.where(is_demand, rates, 0.0),
+            [entry["id"] for entry in edges],
+            position[sources[pipes]],
+            position[targets[pipes]],
+            np.nan_to_num(np.array([entry["current_flow"] for entry in edges], dtype=np.float64)),
+            pressure,
+            np.nan_to_num(snapshot["pressure_loss"][pipes]),
+            np.nan_to_num(np.array([entry["length"] for entry in edges], dtype=np.float64))
+        )
+
+    def state(self) -> Dict:
+        """The current network and its solution, reloaded or re-solved as needed"""
+        with self._lock:
+            state = self._state
+            if state is not None and state["generation"] == self._generation:
+                if state["solution"] is None:
+                    state = self._state = self._solve(state)
+                return state
+            generation = self._generation
+            self._loading += 1
+
+        try:
+            network = self._load()
+        finally:
+            with self._lock:
+                self._loading -= 1
+        state = self._solve({
+            "generation": generation,
+            "network": network,
+            "index": {node_id: i for i, node_id in enumerate(network.node_ids)},
+            "pipe_index": {pipe_id: e for e, pipe_id in enumerate(network.pipe_ids)}
+        })
+        with self._lock:
+            if self._generation == generation:
+                self._state = state
+            self.rebuilds += 1
+        return state
+
+    def report(self, limit: int = 100) -> Dict:
+        """Flagged nodes (largest residual first) and every district's balance"""
+        state = self.state()
+        network, solution = state["network"], state["solution"]
+        flagged = solution["flagged"][np.argsort(-solution["residual"][solution["flagged"]])]
+        districts = np.argsort(-solution["district_residual"])
+        return {
+            "nodes": len(network.node_ids),
+            "pipes": len(network.pipe_ids),
+            "solve_ms": round(state["solve_ms"], 3),
+            "abs_tolerance": self.abs_tolerance,
+            "rel_tolerance": self.rel_tolerance,
+            "total_residual": round(float(solution["residual"].sum()), 1),
+            "flagged_count": len(flagged),
+            "flagged_nodes": [self._node_balance(state, i) for i in flagged[:limit]],
+            "districts": [
+                {
+                    "district": network.district_names[d],
+                    "nodes": int(solution["district_nodes"][d]),
+                    "supply": round(float(solution["district_supply"][d]), 1),
+                    "demand": round(float(solution["district_demand"][d]), 1),
+                    "residual": round(float(solution["district_residual"][d]), 1)
+                }
+                for d in districts[:limit]
+            ]
+        }
+
+    def node(self, node_id: str) -> Optional[Dict]:
+        """Balance of one node, or None if it is not in the network"""
+        state = self.state()
+        i = state["index"].get(node_id)
+        return None if i is None else self._node_balance(state, i)
+
+    def _node_balance(self, state: Dict, i: int) -> Dict:
+        network, solution = state["network"], state["solution"]
+        return {
+            "node_id": network.node_ids[i],
+            "district": network.district_names[network.districts[i]],
+            "residual": round(float(solution["residual"][i]), 1),
+            "throughput": round(float(solution["throughput"][i]), 1),
+            "tolerance": round(float(solution["tolerance"][i]), 1),
+            "flagged": bool(solution["residual"][i] > solution["tolerance"][i])
+        }
+
+    def localize(self, node_ids: List[str], hops: int = 3, limit: int = 20) -> Optional[Dict]:
+        """Pipes near the given nodes ranked by pressure loss beyond their rating.
+
+        Node pressures are the latest sensor readings where the reading cache
+        has one, else the stored `PipeNode.pressure`. Returns None when none
+        of the nodes is in the network.
+        """
+        state = self.state()
+        network = state["network"]
+        seeds = np.array([state["index"][node_id] for node_id in node_ids if node_id in state["index"]], dtype=np.int64)
+        if not len(seeds):
+            return None
+
+        start = time.perf_counter()
+        pipes, depth = network.neighbourhood(seeds, hops)
+        nodes = np.unique(np.r_[network.sources[pipes], network.targets[pipes], seeds])
+        pressure = network.pressure.copy()
+        measured = 0
+        for i in nodes:
+            latest = reading_cache.latest(network.node_ids[i])
+            if latest is not None and latest["pressure"] is not None:
+                pressure[i] = latest["pressure"]
+                measured += 1
+
+        losses = network.excess_loss(pipes, pressure)
+        scored = np.flatnonzero(~np.isnan(losses["excess"]))
+        ranked = scored[np.argsort(-losses["excess"][scored], kind="stable")][:limit]
+        total_excess = losses["excess"][scored].clip(min=0).sum()
+        candidates = [
+            {
+                "pipe_id": network.pipe_ids[pipes[k]],
+                "upstream_node_id": network.node_ids[losses["upstream"][k]],
+                "downstream_node_id": network.node_ids[losses["downstream"][k]],
+                "hops": int(depth[k]),
+                "length": round(float(network.length[pipes[k]]), 1),
+                "upstream_pressure": round(float(pressure[losses["upstream"][k]]), 3),
+                "downstream_pressure": round(float(pressure[losses["downstream"][k]]), 3),
+                "expected_loss": round(float(network.pressure_loss[pipes[k]]), 3),
+                "observed_loss": round(float(losses["observed"][k]), 3),
+                "excess_loss": round(float(losses["excess"][k]), 3),
+                "excess_loss_per_km": round(float(losses["excess_per_km"][k]), 3),
+                # Share of all the unexplained loss in the neighbourhood
+                "share": round(float(max(losses["excess"][k], 0) / total_excess), 3) if total_excess > 0 else 0.0
+            }
+            for k in ranked
+        ]
+        return {
+            "hops": hops,
+            "pipes_searched": len(pipes),
+            "pipes_scored": len(scored),
+            "nodes_with_readings": measured,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+            "candidates": candidates
+        }
+
+    def stats(self) -> Dict:
+        state = self._state
+        return {
+            "generation": self._generation,
+            "loaded": state is not None and state["generation"] == self._generation,
+            "rebuilds": self.rebuilds,
+            "patches": self.patches,
+            "solves": self.solves,
+            "last_solve_ms": None if state is None else round(state["solve_ms"], 3)
+        }
+
+# Global instance
+mass_balance = MassBalanceEngine(
+    graph_index,
+    abs_tolerance=float(os.getenv("MASS_BALANCE_ABS_TOLERANCE", "50")),
+    rel_tolerance=float(os.getenv("MASS_BALANCE_REL_TOLERANCE", "0.05"))
+)
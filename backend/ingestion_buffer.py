@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from database import SessionLocal
+from schemas import SensorReadingCreate
+from crud import create_sensor_readings_bulk
+
+logger = logging.getLogger(__name__)
+
+class SensorIngestionBuffer:
+    """Write-behind buffer that acknowledges sensor readings before they reach the database.
+
+    Readings accumulate in memory and a background asyncio task flushes them
+    with one bulk insert whenever `flush_size` readings are pending or
+    `flush_interval` seconds have passed. Producers wait (up to `put_timeout`)
+    while the buffer is full, and `stop()` drains everything still pending.
+    A batch whose insert fails goes back to the front of the queue, still
+    counting against `max_size`, and is retried after `retry_delay` seconds,
+    doubling up to `max_retry_delay`; it is dropped only after
+    `max_retries` failed attempts in a row.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 50_000,
+        flush_size: int = 5_000,
+        flush_interval: float = 1.0,
+        put_timeout: float = 0.5,
+        max_retries: int = 5,
+        retry_delay: float = 0.5,
+        max_retry_delay: float = 30.0
+    ):
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._pending: List[SensorReadingCreate] = []
+        self._in_flight = 0  # readings taken for the current insert, still holding their room
+        self._failures = 0  # failed inserts in a row
+        self._retry_at = 0.0  # loop time before which no flush is attempted
+        self._space: Optional[asyncio.Condition] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+
+    async def start(self):
+        """Start the background flush task on the running event loop"""
+        self._space = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write out every pending reading"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        while self._pending:
+            await asyncio.sleep(max(self._retry_at - asyncio.get_running_loop().time(), 0))
+            await self._flush()
+
+    async def offer(self, readings: List[SensorReadingCreate]) -> bool:
+        """Enqueue readings all-or-nothing; False if no room frees up within put_timeout"""
+        if self._task is None or len(readings) > self.max_size:
+            self.rejected += len(readings)
+            return False
+
+        async with self._space:
+            try:
+                await asyncio.wait_for(
+                    self._space.wait_for(lambda: self.pending + len(readings) <= self.max_size),
+                    self.put_timeout
+                )
+            except asyncio.TimeoutError:
+                self.rejected += len(readings)
+                return False
+            self._pending.extend(readings)
+            self.accepted += len(readings)
+            if len(self._pending) >= self.flush_size:
+                self._wakeup.set()
+        return True
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending) + self._in_flight
+
+    def stats(self) -> Dict:
+        return {
+            "running": self._task is not None,
+            "pending": self.pending,
+            "capacity": self.max_size,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "failing": self._failures > 0,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2)
+        }
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if asyncio.get_running_loop().time() >= self._retry_at:
+                await self._flush()
+
+    async def _flush(self):
+        async with self._space:
+            batch, self._pending = self._pending, []
+            self._in_flight = len(batch)
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        try:
+            # The synchronous session must not run on the event loop thread
+            await asyncio.get_running_loop().run_in_executor(None, self._write, batch)
+            self.flushed += len(batch)
+            self._failures = 0
+        except Exception:
+            self._failures += 1
+            if self._failures > self.max_retries:
+                logger.exception("Dropping %d buffered sensor readings after %d failed inserts", len(batch), self._failures)
+                self.dropped += len(batch)
+                self._failures = 0
+            else:
+                delay = min(self.retry_delay * 2 ** (self._failures - 1), self.max_retry_delay)
+                logger.warning("Insert of %d buffered sensor readings failed, retrying in %gs", len(batch), delay, exc_info=True)
+                self.retries += 1
+                self._retry_at = asyncio.get_running_loop().time() + delay
+                # Back to the front: the readings kept their room, so this never exceeds max_size
+                async with self._space:
+                    self._pending[:0] = batch
+                    self._in_flight = 0
+        async with self._space:
+            self._in_flight = 0
+            self._space.notify_all()
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - start
+
+    def _write(self, batch: List[SensorReadingCreate]):
+        db = SessionLocal()
+        try:
+            create_sensor_readings_bulk(db, batch)
+        finally:
+            db.close()
+
+# Global instance
+sensor_buffer = SensorIngestionBuffer(
+    max_size=int(os.getenv("INGEST_BUFFER_MAX_SIZE", "50000")),
+    flush_size=int(os.getenv("INGEST_BUFFER_FLUSH_SIZE", "5000")),
+    flush_interval=float(os.getenv("INGEST_BUFFER_FLUSH_INTERVAL", "1.0")),
+    put_timeout=float(os.getenv("INGEST_BUFFER_PUT_TIMEOUT", "0.5")),
+    max_retries=int(os.getenv("INGEST_BUFFER_MAX_RETRIES", "5")),
+    retry_delay=float(os.getenv("INGEST_BUFFER_RETRY_DELAY", "0.5")),
+    max_retry_delay=float(os.getenv("INGEST_BUFFER_MAX_RETRY_DELAY", "30"))
+)
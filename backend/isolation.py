@@ -0,0 +1,168 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+
+from graph_index import GraphIndex, NODE_TYPES, graph_index
+
+PUMP = NODE_TYPES.index("pump")
+VALVE = NODE_TYPES.index("valve")
+
+class SupplyGraph:
+    """Pipe graph in CSR form with an extra root node feeding every pump.
+
+    Node `nodes` is the root and node `nodes + 1` a sink nothing leaves.
+    `reachable()` cuts failed elements by pointing the CSR entries that
+    enter them at the sink. This copies one index array instead of
+    building a new matrix per request.
+    """
+
+    def __init__(self, nodes: int, sources: np.ndarray, targets: np.ndarray, pumps: np.ndarray, directed: bool = True):
+        pipes = np.arange(len(sources))
+        if not directed:
+            sources, targets, pipes = np.r_[sources, targets], np.r_[targets, sources], np.r_[pipes, pipes]
+        self.nodes = nodes
+        self.root, self.sink = nodes, nodes + 1
+        rows = np.r_[sources, np.full(len(pumps), self.root)]
+        order = np.argsort(rows, kind="stable")
+        self.indptr = np.zeros(nodes + 3, dtype=np.int32)
+        np.cumsum(np.bincount(rows, minlength=nodes + 2), out=self.indptr[1:])
+        self.indices = np.r_[targets, pumps][order].astype(np.int32)
+        self.pipes = np.r_[pipes, np.full(len(pumps), -1)][order]
+        self.data = np.ones(len(self.indices), dtype=np.int8)
+
+    def reachable(self, blocked: Optional[np.ndarray] = None, closed_pipes: Optional[List[int]] = None) -> np.ndarray:
+        """Boolean mask of the nodes a pump reaches without entering a blocked node or closed pipe"""
+        indices = self.indices
+        if blocked is not None or closed_pipes is not None:
+            indices = indices.copy()
+            if blocked is not None:
+                indices[np.r_[blocked, False, False][indices]] = self.sink
+            if closed_pipes is not None:
+                indices[np.isin(self.pipes, closed_pipes)] = self.sink
+        size = self.nodes + 2
+        graph = sparse.csr_matrix((self.data, indices, self.indptr), shape=(size, size))
+        order = breadth_first_order(graph, self.root, directed=True, return_predecessors=False)
+        mask = np.zeros(size, dtype=bool)
+        mask[order] = True
+        return mask[:self.nodes]
+
+class SupplyAnalyzer:
+    """Supply-loss and valve-isolation answers over the in-memory graph index.
+
+    Water enters at pumps and follows pipes from source to target. A node is
+    supplied when a pump reaches it. The supplied set and the valve-bounded
+    segments of the intact network are computed once per topology
+    version. Each request then removes the failed element and runs one
+    compiled breadth-first search from the pumps.
+    """
+
+    def __init__(self, index: GraphIndex):
+        self.index = index
+        self._lock = threading.Lock()
+        self._baseline: Optional[Dict] = None
+        self.baseline_builds = 0
+
+    def baseline(self) -> Dict:
+        """Topology, supplied nodes and valve segments of the current topology version"""
+        with self._lock:
+            if self._baseline is not None and self._baseline["version"] == self.index.topology_version:
+                return self._baseline
+        topology = self.index.topology()
+        nodes, sources, targets = topology["nodes"], topology["sources"], topology["targets"]
+        pumps = np.flatnonzero(topology["node_type"] == PUMP)
+        is_valve = topology["node_type"] == VALVE
+
+        # Segments: components of the network with every valve cut out
+        inner = ~(is_valve[sources] | is_valve[targets])
+        graph = sparse.csr_matrix(
+            (np.ones(inner.sum(), dtype=np.int8), (sources[inner], targets[inner])), shape=(nodes, nodes)
+        )
+        _, segment = connected_components(graph, directed=False)
+        segment[is_valve] = -1
+
+        baseline = {
+            **topology,
+            "pumps": pumps,
+            "is_valve": is_valve,
+            "segment": segment,
+        }
+        baseline["flow"] = SupplyGraph(nodes, sources, targets, pumps)
+        baseline["network"] = SupplyGraph(nodes, sources, targets, pumps, directed=False)
+        baseline["supplied"] = baseline["flow"].reachable()
+        with self._lock:
+            self._baseline = baseline
+            self.baseline_builds += 1
+        return baseline
+
+    def _lost(self, baseline: Dict, blocked: np.ndarray, closed_pipes: Optional[List[int]] = None) -> np.ndarray:
+        """Nodes supplied in the intact network but not once `blocked` nodes are cut off"""
+        after = baseline["flow"].reachable(blocked, closed_pipes)
+        return np.flatnonzero(baseline["supplied"] & ~after & ~blocked)
+
+    def node_impact(self, node_id: str, limit: int = 1000) -> Optional[Dict]:
+        """Nodes that lose supply when a node fails (None if the node is unknown)"""
+        node = self.index.node_id(node_id)
+        if node is None:
+            return None
+        start = time.perf_counter()
+        baseline = self.baseline()
+        blocked = np.zeros(baseline["nodes"], dtype=bool)
+        blocked[node] = True
+        lost = self._lost(baseline, blocked)
+        return {
+            "node_id": node_id,
+            "supplied": bool(baseline["supplied"][node]),
+            "lost_supply_count": len(lost),
+            "lost_supply": self._names(lost, limit),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+
+    def isolate_pipe(self, pipe_id: str, limit: int = 1000) -> Optional[Dict]:
+        """Valves to close to isolate a failed pipe and what loses supply (None if unknown)"""
+        pipe = self.index.pipe_id(pipe_id)
+        if pipe is None:
+            return None
+        start = time.perf_counter()
+        baseline = self.baseline()
+        sources, targets, is_valve = baseline["sources"], baseline["targets"], baseline["is_valve"]
+        ends = np.array([sources[pipe], targets[pipe]])
+
+        # The segment is every non-valve node sharing a valve-free stretch with the pipe
+        segments = baseline["segment"][ends]
+        in_segment = np.isin(baseline["segment"], segments[segments >= 0])
+        touching = in_segment[sources] | in_segment[targets]
+        touching[pipe] = True
+        boundary = np.unique(np.r_[sources[touching], targets[touching]])
+        boundary = boundary[is_valve[boundary]]
+
+        # A boundary valve needs closing only if water can still reach it from a pump
+        outside = baseline["network"].reachable(in_segment, [pipe])
+        to_close = boundary[outside[boundary]]
+        pumps_inside = baseline["pumps"][in_segment[baseline["pumps"]]]
+
+        blocked = in_segment.copy()
+        blocked[to_close] = True
+        lost = self._lost(baseline, blocked, closed_pipes=[pipe])
+        return {
+            "pipe_id": pipe_id,
+            "valves_to_close": self._names(to_close, limit),
+            "boundary_valves": self._names(boundary, limit),
+            # Pumps inside the segment cannot be shut off by a valve
+            "pumps_to_stop": self._names(pumps_inside, limit),
+            "isolatable": len(pumps_inside) == 0,
+            "segment_nodes": self._names(np.flatnonzero(in_segment), limit),
+            "segment_pipes": [self.index.pipe_ids[e] for e in np.flatnonzero(touching)[:limit]],
+            "lost_supply_count": len(lost),
+            "lost_supply": self._names(lost, limit),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+
+    def _names(self, nodes: np.ndarray, limit: int) -> List[str]:
+        return [self.index.node_ids[i] for i in nodes[:limit]]
+
+# Global instance
+supply_analyzer = SupplyAnalyzer(graph_index)
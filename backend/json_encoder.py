@@ -0,0 +1,30 @@
+import json
+from datetime import date, datetime
+from typing import Any, Sequence
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library encoder is used instead
+    orjson = None
+
+def dumps(payload: Any) -> bytes:
+    """Compact JSON bytes of plain data, with datetimes in ISO 8601 as Pydantic writes them.
+
+    Nothing is validated: this is for values read straight from the
+    database or the graph index.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), default=_default).encode()
+
+def rows_json(rows: Sequence) -> bytes:
+    """JSON array of objects from Core result rows, keyed by column label"""
+    if not rows:
+        return b"[]"
+    fields = rows[0]._fields
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+def _default(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
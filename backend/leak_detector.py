@@ -0,0 +1,275 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from schemas import LeakAlertCreate
+
+class LeakDetector:
+    """Online leak detection over the pressure and flow readings of every node.
+
+    Each node owns one slot in a set of NumPy state arrays: an exponentially
+    smoothed level, trend and variance per signal, a lower CUSUM on
+    standardised pressure (sustained drops) and a two-sided CUSUM on flow.
+    `observe()` orders a batch of readings per node and advances all nodes
+    together in rounds (the k-th reading of every node in round k), so each
+    reading costs O(1) array work and the Python overhead is per round
+    rather than per reading.
+
+    A node alarms once it has seen `warmup` readings, when a CUSUM passes
+    `threshold` or a single reading deviates by more than `spike` standard
+    deviations. The CUSUM is then reset and the node stays quiet for
+    `cooldown` seconds of reading time.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.05,
+        beta: float = 0.1,
+        drift: float = 1.0,
+        threshold: float = 5.0,
+        spike: float = 6.0,
+        warmup: int = 12,
+        cooldown: float = 3600.0,
+        capacity: int = 1024
+    ):
+        self.alpha = alpha
+        self.beta = beta
+        self.drift = drift
+        self.threshold = threshold
+        self.spike = spike
+        self.warmup = warmup
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._slots: Dict[str, int] = {}
+        self._node_ids: List[str] = []
+        self._allocate(capacity)
+
+        self.readings = 0
+        self.late_readings = 0
+        self.alerts = 0
+
+    # Per-node state, one array element per slot
+    _FLOAT_STATE = {
+        "pressure_mean": np.nan, "pressure_trend": 0.0, "pressure_var": np.nan, "pressure_cusum": 0.0, "pressure_z": 0.0,
+        "flow_mean": np.nan, "flow_trend": 0.0, "flow_var": np.nan, "flow_cusum_up": 0.0, "flow_cusum_down": 0.0,
+        "flow_z": 0.0,
+        "last_timestamp": -np.inf, "pressure_alerted_at": -np.inf, "flow_alerted_at": -np.inf
+    }
+
+    def _allocate(self, capacity: int):
+        used = len(self._node_ids)
+        for name, fill in self._FLOAT_STATE.items():
+            array = np.full(capacity, fill, dtype=np.float64)
+            if used:
+                array[:used] = getattr(self, name)[:used]
+            setattr(self, name, array)
+        seen = np.zeros(capacity, dtype=np.int64)
+        if used:
+            seen[:used] = self.seen[:used]
+        self.seen = seen
+
+    def _slot(self, node_id: str) -> int:
+        slot = self._slots.get(node_id)
+        if slot is None:
+            slot = len(self._node_ids)
+            if slot >= len(self.seen):
+                self._allocate(2 * len(self.seen))
+            self._slots[node_id] = slot
+            self._node_ids.append(node_id)
+        return slot
+
+    def observe_rows(self, rows: Iterable[Dict]) -> List[LeakAlertCreate]:
+        """Feed reading dicts shaped like SensorReading columns"""
+        rows = list(rows)
+        return self.observe(
+            [row["node_id"] for row in rows],
+            np.array([row["timestamp"].timestamp() for row in rows], dtype=np.float64),
+            np.array([row.get("pressure") for row in rows], dtype=np.float64),
+            np.array([row.get("flow_rate") for row in rows], dtype=np.float64)
+        )
+
+    def observe(
+        self,
+        node_ids: List[str],
+        timestamps: np.ndarray,
+        pressure: np.ndarray,
+        flow_rate: np.ndarray,
+        emit: bool = True
+    ) -> List[LeakAlertCreate]:
+        """Advance the detector over a batch (None/NaN for unreported values).
+
+        Returns the alerts raised, or none at all when `emit` is False (used
+        to warm the state from history).
+        """
+        if not node_ids:
+            return []
+        with self._lock:
+            slots_all = np.fromiter((self._slot(node_id) for node_id in node_ids), dtype=np.intp, count=len(node_ids))
+
+            # Per node in time order, then regroup so round k holds every node's k-th reading
+            order = np.lexsort((timestamps, slots_all))
+            sorted_slots = slots_all[order]
+            first = np.flatnonzero(np.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+            rank = np.arange(len(sorted_slots)) - np.repeat(first, np.diff(np.r_[first, len(sorted_slots)]))
+            by_round = order[np.argsort(rank, kind="stable")]
+            bounds = np.r_[0, np.cumsum(np.bincount(rank))]
+
+            slots = slots_all[by_round]
+            timestamps, pressure, flow_rate = timestamps[by_round], pressure[by_round], flow_rate[by_round]
+
+            alerts = []
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                alerts.extend(self._step(
+                    slots[start:end], timestamps[start:end], pressure[start:end], flow_rate[start:end], emit
+                ))
+            self.readings += len(slots)
+            self.alerts += len(alerts)
+        return alerts
+
+    def _update(self, prefix: str, slots: np.ndarray, values: np.ndarray):
+        """Smoothing step for one signal; returns the forecast and the standardised residuals"""
+        mean = getattr(self, f"{prefix}_mean")
+        trend = getattr(self, f"{prefix}_trend")
+        var = getattr(self, f"{prefix}_var")
+        current_mean, current_trend, current_var = mean[slots], trend[slots], var[slots]
+
+        # First value seeds the baseline, with a prior variance of (5% of it)^2
+        new = np.isnan(current_mean)
+        current_mean = np.where(new, values, current_mean)
+        current_var = np.where(new, np.maximum((0.05 * values) ** 2, 1e-6), current_var)
+
+        # Level plus trend, so slow daily demand swings don't read as a drift
+        forecast = current_mean + current_trend
+        error = values - forecast
+        z = error / np.sqrt(current_var)
+        mean[slots] = forecast + self.alpha * error
+        trend[slots] = current_trend + self.alpha * self.beta * error
+        var[slots] = np.maximum((1 - self.alpha) * (current_var + self.alpha * error ** 2), 1e-6)
+        getattr(self, f"{prefix}_z")[slots] = z
+        return forecast, z
+
+    def _step(self, slots, timestamps, pressure, flow_rate, emit: bool) -> List[LeakAlertCreate]:
+        """One round: at most one reading per slot"""
+        fresh = timestamps >= self.last_timestamp[slots]
+        if not fresh.all():
+            self.late_readings += int((~fresh).sum())
+            slots, timestamps, pressure, flow_rate = slots[fresh], timestamps[fresh], pressure[fresh], flow_rate[fresh]
+        self.last_timestamp[slots] = timestamps
+        self.seen[slots] += 1
+        alerts = []
+
+        reported = ~np.isnan(pressure)
+        if reported.any():
+            s, t, x = slots[reported], timestamps[reported], pressure[reported]
+            baseline, z = self._update("pressure", s, x)
+            cusum = np.maximum(0.0, self.pressure_cusum[s] - z - self.drift)
+            self.pressure_cusum[s] = cusum
+            alarm = (
+                (self.seen[s] > self.warmup)
+                & (t - self.pressure_alerted_at[s] >= self.cooldown)
+                & ((cusum > self.threshold) | (z < -self.spike))
+            )
+            for i in np.flatnonzero(alarm):
+                self.pressure_cusum[s[i]] = 0.0
+                self.pressure_alerted_at[s[i]] = t[i]
+                if emit:
+                    alerts.append(self._pressure_alert(s[i], t[i], x[i], baseline[i], z[i], cusum[i]))
+
+        reported = ~np.isnan(flow_rate)
+        if reported.any():
+            s, t, y = slots[reported], timestamps[reported], flow_rate[reported]
+            baseline, z = self._update("flow", s, y)
+            up = np.maximum(0.0, self.flow_cusum_up[s] + z - self.drift)
+            down = np.maximum(0.0, self.flow_cusum_down[s] - z - self.drift)
+            self.flow_cusum_up[s], self.flow_cusum_down[s] = up, down
+            alarm = (
+                (self.seen[s] > self.warmup)
+                & (t - self.flow_alerted_at[s] >= self.cooldown)
+                & ((up > self.threshold) | (down > self.threshold) | (np.abs(z) > self.spike))
+            )
+            for i in np.flatnonzero(alarm):
+                self.flow_cusum_up[s[i]] = self.flow_cusum_down[s[i]] = 0.0
+                self.flow_alerted_at[s[i]] = t[i]
+                if emit:
+                    alerts.append(self._flow_alert(s[i], t[i], y[i], baseline[i], z[i]))
+        return alerts
+
+    def _pressure_alert(self, slot, timestamp, value, baseline, z, cusum) -> LeakAlertCreate:
+        drop = (baseline - value) / baseline if baseline else 0.0
+        severity = "critical" if drop > 0.3 else "high" if drop > 0.15 else "medium" if drop > 0.05 else "low"
+        return LeakAlertCreate(
+            entity_type="node",
+            entity_id=self._node_ids[slot],
+            alert_type="pressure_drop",
+            severity=severity,
+            description=(
+                f"Pressure {value:.2f} is {drop:.0%} below the expected {baseline:.2f} "
+                f"(z={z:.1f}, CUSUM={cusum:.1f})"
+            ),
+            detected_at=datetime.fromtimestamp(timestamp)
+        )
+
+    def _flow_alert(self, slot, timestamp, value, baseline, z) -> LeakAlertCreate:
+        change = (value - baseline) / baseline if baseline else 0.0
+        return LeakAlertCreate(
+            entity_type="node",
+            entity_id=self._node_ids[slot],
+            alert_type="flow_anomaly",
+            severity="high" if abs(change) > 0.3 else "medium",
+            description=(
+                f"Flow {value:.1f} is {change:+.0%} off the expected {baseline:.1f} "
+                f"(z={z:.1f})"
+            ),
+            detected_at=datetime.fromtimestamp(timestamp)
+        )
+
+    def risk(self, node_id: str) -> Optional[Dict]:
+        """Current anomaly level of a node in [0, 1], or None before it has any readings"""
+        with self._lock:
+            slot = self._slots.get(node_id)
+            if slot is None or self.seen[slot] == 0:
+                return None
+            cusum = max(self.pressure_cusum[slot], self.flow_cusum_up[slot], self.flow_cusum_down[slot])
+            spike = max(-self.pressure_z[slot], abs(self.flow_z[slot]), 0.0)
+            return {
+                "score": float(min(1.0, max(cusum / self.threshold, spike / self.spike))),
+                "pressure_z": float(self.pressure_z[slot]),
+                "flow_z": float(self.flow_z[slot]),
+                "readings": int(self.seen[slot]),
+                "warmed_up": bool(self.seen[slot] > self.warmup)
+            }
+
+    def warm(self, history: Dict[str, Dict[str, np.ndarray]]):
+        """Seed the state from per-node column arrays (oldest first) without raising alerts"""
+        node_ids, timestamps, pressure, flow_rate = [], [], [], []
+        for node_id, window in history.items():
+            node_ids.extend([node_id] * len(window["timestamp"]))
+            timestamps.append(window["timestamp"])
+            pressure.append(window["pressure"])
+            flow_rate.append(window["flow_rate"])
+        if node_ids:
+            self.observe(node_ids, np.concatenate(timestamps), np.concatenate(pressure), np.concatenate(flow_rate), emit=False)
+        print(f"Leak detector warmed for {len(history)} nodes")
+
+    def stats(self) -> Dict:
+        return {
+            "nodes": len(self._node_ids),
+            "readings": self.readings,
+            "late_readings": self.late_readings,
+            "alerts": self.alerts
+        }
+
+# Global instance
+leak_detector = LeakDetector(
+    alpha=float(os.getenv("LEAK_EWMA_ALPHA", "0.05")),
+    beta=float(os.getenv("LEAK_TREND_BETA", "0.1")),
+    drift=float(os.getenv("LEAK_CUSUM_DRIFT", "1.0")),
+    threshold=float(os.getenv("LEAK_CUSUM_THRESHOLD", "5.0")),
+    spike=float(os.getenv("LEAK_SPIKE_SIGMA", "6.0")),
+    warmup=int(os.getenv("LEAK_WARMUP_READINGS", "12")),
+    cooldown=float(os.getenv("LEAK_ALERT_COOLDOWN", "3600"))
+)
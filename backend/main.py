@@ -1,26 +1,59 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Sequence, Union
+from datetime import datetime
+import asyncio
+import json
+import math
 import uvicorn
 
 from database import SessionLocal, engine, Base
 from models import PipeNode, Pipe, MaintenanceLog
 from schemas import (
-    PipeNodeResponse, PipeResponse, MaintenanceLogResponse,
+    PipeNodeResponse, PipeResponse, PipeNodeUpdate, PipeUpdate, MaintenanceLogResponse,
     MaintenanceLogCreate, MaintenanceLogUpdate,
-    GraphData, SystemStats
+    GraphData, GraphDelta, ClusteredGraph, SystemStats,
+    SensorReadingCreate, SensorReadingBatchResult, SensorReadingAck,
+    SensorReadingSample, MaintenancePredictionBatchRequest
 )
 from crud import (
     get_pipe_nodes, get_pipes, get_maintenance_logs,
+    iter_pipe_nodes, iter_pipes, iter_maintenance_logs,
+    get_pipe_node_rows, get_pipe_rows, iter_pipe_node_rows, iter_pipe_rows,
     create_maintenance_log, update_maintenance_log, delete_maintenance_log,
-    get_maintenance_log_by_id, get_pipe_by_id, get_pipe_node_by_id
+    get_maintenance_log_by_id, get_pipe_by_id, get_pipe_node_by_id, update_pipe_node, update_pipe,
+    create_sensor_readings_bulk, unknown_node_ids, UnknownNodeError, get_sensor_readings_by_node, get_latest_sensor_reading,
+    get_active_leak_alerts_for, get_leak_alert_by_id
 )
 from mock_data import populate_mock_data
+from migrations import ensure_indexes
+from pagination import encode_cursor, decode_cursor, stream_query, stream_rows
+from graph_cache import graph_cache
+from graph_index import graph_index
+from stats_store import system_stats
+from maintenance_history import maintenance_history
 from ai_prediction_service import maintenance_predictor
+from model_registry import model_registry
+from prediction_cache import prediction_cache
+from ingestion_buffer import sensor_buffer
+from worker_pool import inference_pool, WorkerPoolBusy
+from reading_cache import reading_cache
+from leak_detector import leak_detector
+from hydraulics import mass_balance
+from isolation import supply_analyzer
+from spatial_index import spatial_grid
+from graph_lod import graph_lod
+from graph_cache import graph_body
+from columnar import JSON, MSGPACK, negotiate, packb, table
+from json_encoder import rows_json
 
-# Create database tables
+# Create database tables, then add indexes missing from pre-existing tables
 Base.metadata.create_all(bind=engine)
+ensure_indexes(engine)
 
 app = FastAPI(
     title="Flow-Sentinel API",
@@ -35,8 +68,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+# Seconds between SSE keep-alive comments on an idle /graph/stream
+GRAPH_STREAM_KEEPALIVE = 15
+
+# Largest number of components a batch prediction request may name
+MAX_PREDICTION_BATCH = 10_000
+
+# Largest page a paginated list request may ask for
+MAX_PAGE_SIZE = 1000
+
+# Upper bound on readings accepted by a single batch ingestion request
+MAX_READINGS_PER_REQUEST = 100_000
+
+# Upper bound on an ingestion request body, checked before it is parsed
+MAX_READINGS_BODY_BYTES = MAX_READINGS_PER_REQUEST * 256
+
+sensor_reading_body_adapter = TypeAdapter(Union[List[SensorReadingCreate], SensorReadingCreate])
+
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
@@ -54,126 +105,338 @@ async def startup_event():
         print("Repopulating database with fresh mock data...")
         populate_mock_data(db)
         print("Mock data populated successfully!")
+        graph_index.rebuild(db)
+        graph_lod.rebuild()
+        graph_cache.bump()
+        mass_balance.invalidate()
+        system_stats.rebuild(db)
+        maintenance_history.rebuild(db)
+        reading_cache.warm(db)
+        leak_detector.warm(reading_cache.windows())
     finally:
         db.close()
+    
+    await sensor_buffer.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain buffered sensor readings before the process exits"""
+    await sensor_buffer.stop()
+    inference_pool.shutdown()
 
 @app.get("/")
 async def root():
     return {"message": "Flow-Sentinel API is running"}
 
 @app.get("/graph", response_model=GraphData)
-async def get_graph_data(db: Session = Depends(get_db)):
-    """Get pipeline graph data for visualization"""
-    nodes = get_pipe_nodes(db)
-    pipes = get_pipes(db)
-    
-    print(f"API: Found {len(nodes)} nodes and {len(pipes)} pipes")
-    
-    # Transform data for frontend graph visualization
-    graph_nodes = []
-    graph_edges = []
+def get_graph_data(
+    request: Request,
+    bbox: Optional[str] = Query(None, description="minLon,minLat,maxLon,maxLat: only the nodes inside and the pipes touching them"),
+    db: Session = Depends(get_db)
+):
+    """Get pipeline graph data for visualization (conditional GET via ETag)"""
+    viewport = parse_bbox(bbox)
+    media_type = response_format(request)
+    if graph_cache.matches(request.headers.get("if-none-match"), media_type):
+        return Response(status_code=304, headers={"ETag": graph_cache.etag_for(graph_cache.version, media_type), "Vary": "Accept"})
     
-    for node in nodes:
-        graph_nodes.append({
-            "id": node.id,
-            "name": node.name,
-            "type": node.type,
-            "pressure": node.pressure,
-            "status": node.status,
-            "position": {"x": node.longitude * 100, "y": node.latitude * 100}
-        })
+    if viewport is not None:
+        etag = graph_cache.etag_for(graph_cache.version, media_type)
+        nodes, edges = spatial_grid.viewport(viewport)
+        body = graph_body(nodes, edges, media_type)
+    else:
+        etag, body = graph_cache.snapshot(db, media_type)
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    )
+
+def response_format(request: Request) -> str:
+    """JSON, or MessagePack column tables when the Accept header prefers them"""
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported media types: {JSON}, {MSGPACK}")
+    return media_type
+
+def columnar_response(response: Response, schema, rows: list, dictionary: Sequence[str] = ()) -> Response:
+    """MessagePack column table of rows, keeping headers (such as X-Next-Cursor) already set"""
+    return _encoded_response(response, packb(table(schema, rows, dictionary)), MSGPACK)
+
+def rows_response(response: Response, media_type: str, schema, rows: list, dictionary: Sequence[str] = ()) -> Response:
+    """Core result rows as a JSON array or MessagePack column table, without validating them"""
+    if media_type == MSGPACK:
+        return columnar_response(response, schema, rows, dictionary)
+    return _encoded_response(response, rows_json(rows), JSON)
+
+def _encoded_response(response: Response, body: bytes, media_type: str) -> Response:
+    headers = {name: value for name, value in response.headers.items() if name not in ("content-length", "content-type")}
+    return Response(content=body, media_type=media_type, headers={**headers, "Vary": "Accept"})
+
+def parse_bbox(bbox: Optional[str]) -> Optional[tuple]:
+    if bbox is None:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid bbox: {bbox}")
+    values = (min_lon, min_lat, max_lon, max_lat)
+    in_range = (
+        all(math.isfinite(value) for value in values)
+        and -180 <= min_lon <= max_lon <= 180
+        and -90 <= min_lat <= max_lat <= 90
+    )
+    if not in_range:
+        raise HTTPException(status_code=400, detail=f"Invalid bbox: {bbox} (minLon,minLat,maxLon,maxLat within -180..180, -90..90)")
+    return values
+
+@app.get("/graph/index")
+async def get_graph_index_stats():
+    """Get in-memory graph index, spatial grid and cluster level counters"""
+    return {**graph_index.stats(), "spatial": spatial_grid.stats(), "clusters": graph_lod.stats()}
+
+@app.get("/graph/clusters", response_model=ClusteredGraph)
+def get_graph_clusters(level: str = Query("city", description="city, or grid-<degrees> for each LOD_GRID_DEGREES size")):
+    """Get the network collapsed into clusters for a zoomed-out view"""
+    view = graph_lod.view(level)
+    if view is None:
+        raise HTTPException(status_code=404, detail=f"Unknown level {level}; available: {', '.join(graph_lod.levels)}")
+    return view
+
+@app.get("/graph/changes", response_model=GraphDelta)
+async def get_graph_changes(since: str):
+    """Get nodes and edges that changed after graph version `since` (the ETag/stream version)"""
+    return graph_cache.changes(since)
+
+@app.get("/graph/stream")
+async def stream_graph_changes(request: Request, since: Optional[str] = None):
+    """Server-sent events: one `delta` event per batch of graph changes"""
+    if since is None:
+        since = request.headers.get("last-event-id") or graph_cache.token(graph_cache.version)
     
-    for pipe in pipes:
-        graph_edges.append({
-            "id": pipe.id,
-            "source": pipe.source_node_id,
-            "target": pipe.target_node_id,
-            "length": pipe.length,
-            "current_flow": pipe.current_flow,
-            "flow_capacity": pipe.flow_capacity,
-            "status": "normal" if pipe.current_flow < pipe.flow_capacity * 0.8 else "high"
-        })
+    async def events():
+        version = since
+        changed = graph_cache.subscribe()
+        try:
+            # Catch up first in case the client reconnected after missing changes
+            changed.set()
+            while not await request.is_disconnected():
+                try:
+                    await asyncio.wait_for(changed.wait(), GRAPH_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                changed.clear()
+                delta = graph_cache.changes(version)
+                if delta["version"] == version:
+                    continue
+                version = delta["version"]
+                yield f"id: {version}\nevent: delta\ndata: {json.dumps(delta)}\n\n"
+        finally:
+            graph_cache.unsubscribe(changed)
     
-    print(f"API: Returning {len(graph_nodes)} graph nodes and {len(graph_edges)} graph edges")
-    return GraphData(nodes=graph_nodes, edges=graph_edges)
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/stats", response_model=SystemStats)
-async def get_system_stats(db: Session = Depends(get_db)):
+async def get_system_stats():
     """Get system-wide statistics"""
-    nodes = get_pipe_nodes(db)
-    pipes = get_pipes(db)
-    maintenance_logs = get_maintenance_logs(db)
-    
-    total_nodes = len(nodes)
-    active_nodes = len([n for n in nodes if n.status == "active"])
-    down_nodes = len([n for n in nodes if n.status == "offline"])
-    unreported_nodes = len([n for n in nodes if n.status == "unreported"])
-    
-    total_flow = sum(pipe.current_flow for pipe in pipes)
-    ideal_flow = sum(pipe.flow_capacity for pipe in pipes)
-    flow_difference = ideal_flow - total_flow
-    
-    pressures = [node.pressure for node in nodes if node.pressure is not None]
-    avg_pressure = sum(pressures) / len(pressures) if pressures else 0
-    
-    current_leaks = len([n for n in nodes if n.status == "leak"])
-    vulnerable_pipes = [p for p in pipes if p.current_flow > p.flow_capacity * 0.9]
-    most_vulnerable = vulnerable_pipes[0].id if vulnerable_pipes else "None"
-    
-    reporting_sensors = len([n for n in nodes if n.status in ["active", "demand"]])
-    sensor_percentage = (reporting_sensors / total_nodes * 100) if total_nodes > 0 else 0
-    
-    return SystemStats(
-        total_nodes=total_nodes,
-        active_nodes=active_nodes,
-        down_nodes=down_nodes,
-        unreported_nodes=unreported_nodes,
-        total_flow=total_flow,
-        ideal_flow=ideal_flow,
-        flow_difference=flow_difference,
-        avg_pressure=avg_pressure,
-        current_leaks=current_leaks,
-        most_vulnerable_pipe=most_vulnerable,
-        sensor_reporting_percentage=sensor_percentage
-    )
+    return system_stats.snapshot()
+
+def page_limit(limit: Optional[int]) -> Optional[int]:
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+def cursor_values(cursor: Optional[str], arity: int) -> Optional[list]:
+    if cursor is None:
+        return None
+    try:
+        values = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(values) != arity:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+    return values
+
+def set_next_cursor(response: Response, rows: list, limit: Optional[int], *sort_key):
+    """Advertise the next page in X-Next-Cursor when this page came back full"""
+    if limit is not None and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(*sort_key)
 
 @app.get("/pipes", response_model=List[PipeResponse])
-async def get_all_pipes(db: Session = Depends(get_db)):
+def get_all_pipes(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, description="Page size; omit to stream every pipe"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    db: Session = Depends(get_db)
+):
     """Get all pipes with their details"""
-    pipes = get_pipes(db)
-    print(f"API: Returning {len(pipes)} pipes")
-    return pipes
+    media_type = response_format(request)
+    if limit is None and cursor is None and media_type == JSON:
+        return StreamingResponse(stream_rows(iter_pipe_rows), media_type=JSON, headers={"Vary": "Accept"})
+    
+    after = cursor_values(cursor, 1)
+    pipes = get_pipe_rows(db, after=after[0] if after else None, limit=page_limit(limit))
+    if pipes:
+        set_next_cursor(response, pipes, limit, pipes[-1].id)
+    return rows_response(response, media_type, PipeResponse, pipes, ("material", "status"))
 
 @app.get("/pipes/{pipe_id}", response_model=PipeResponse)
-async def get_pipe_details(pipe_id: str, db: Session = Depends(get_db)):
+def get_pipe_details(pipe_id: str, db: Session = Depends(get_db)):
     """Get detailed information about a specific pipe"""
     pipe = db.query(Pipe).filter(Pipe.id == pipe_id).first()
     if not pipe:
         raise HTTPException(status_code=404, detail="Pipe not found")
     return pipe
 
+@app.patch("/pipes/{pipe_id}", response_model=PipeResponse)
+def patch_pipe(pipe_id: str, pipe: PipeUpdate, db: Session = Depends(get_db)):
+    """Update a pipe's fields (status, flow, inspection, re-routing); the change reaches /graph/changes and /graph/stream"""
+    data = pipe.model_dump(exclude_none=True)
+    unknown = unknown_node_ids(db, [data[key] for key in ("source_node_id", "target_node_id") if key in data])
+    if unknown:
+        raise unknown_nodes(unknown)
+    updated = update_pipe(db, pipe_id, data)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Pipe not found")
+    return updated
+
+@app.get("/pipes/{pipe_id}/isolate")
+def isolate_pipe(pipe_id: str, limit: int = Query(1000, ge=1, le=100_000)):
+    """Get the valves to close to isolate a failed pipe and the nodes that lose supply"""
+    plan = supply_analyzer.isolate_pipe(pipe_id, limit)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Pipe not found")
+    return plan
+
 @app.get("/nodes", response_model=List[PipeNodeResponse])
-async def get_all_nodes(db: Session = Depends(get_db)):
+def get_all_nodes(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, description="Page size; omit to stream every node"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    db: Session = Depends(get_db)
+):
     """Get all pipe nodes"""
-    nodes = get_pipe_nodes(db)
-    print(f"API: Returning {len(nodes)} nodes")
-    return nodes
+    media_type = response_format(request)
+    if limit is None and cursor is None and media_type == JSON:
+        return StreamingResponse(stream_rows(iter_pipe_node_rows), media_type=JSON, headers={"Vary": "Accept"})
+    
+    after = cursor_values(cursor, 1)
+    nodes = get_pipe_node_rows(db, after=after[0] if after else None, limit=page_limit(limit))
+    if nodes:
+        set_next_cursor(response, nodes, limit, nodes[-1].id)
+    return rows_response(response, media_type, PipeNodeResponse, nodes, ("type", "status"))
 
 @app.get("/nodes/{node_id}", response_model=PipeNodeResponse)
-async def get_node_details(node_id: str, db: Session = Depends(get_db)):
+def get_node_details(node_id: str, db: Session = Depends(get_db)):
     """Get detailed information about a specific node"""
     node = db.query(PipeNode).filter(PipeNode.id == node_id).first()
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
     return node
 
+@app.get("/nodes/{node_id}/neighbors")
+def get_node_neighbors(node_id: str):
+    """Get the pipes and nodes directly upstream and downstream of a node"""
+    node = graph_index.node_id(node_id)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    adjacency = graph_index.adjacency()
+    neighbors = {}
+    for direction, (pipes, nodes) in (("upstream", adjacency.upstream(node)), ("downstream", adjacency.downstream(node))):
+        neighbors[direction] = [
+            {"pipe_id": graph_index.pipe_ids[pipe], "node_id": graph_index.node_ids[other]}
+            for pipe, other in zip(pipes, nodes)
+        ]
+    return {"node_id": node_id, **neighbors}
+
+@app.get("/nodes/{node_id}/impact")
+def get_node_impact(node_id: str, limit: int = Query(1000, ge=1, le=100_000)):
+    """Get the nodes that lose pump supply if a node fails"""
+    impact = supply_analyzer.node_impact(node_id, limit)
+    if impact is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return impact
+
+@app.patch("/nodes/{node_id}", response_model=PipeNodeResponse)
+def patch_node(node_id: str, node: PipeNodeUpdate, db: Session = Depends(get_db)):
+    """Update a node's fields (status, pressure, flow, position); the change reaches /graph/changes and /graph/stream"""
+    updated = update_pipe_node(db, node_id, {**node.model_dump(exclude_none=True), "last_updated": datetime.now()})
+    if not updated:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return updated
+
+@app.get("/nodes/{node_id}/balance")
+def get_node_balance(node_id: str):
+    """Get a node's mass balance: pipe inflow plus supply minus outflow and demand"""
+    balance = mass_balance.node(node_id)
+    if balance is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return balance
+
+@app.get("/nodes/{node_id}/readings", response_model=List[SensorReadingSample])
+def get_node_readings(
+    request: Request,
+    response: Response,
+    node_id: str,
+    limit: int = Query(100, ge=1, le=reading_cache.window, description="Readings to return, at most READING_CACHE_WINDOW"),
+    db: Session = Depends(get_db)
+):
+    """Get a node's most recent sensor readings, newest first"""
+    media_type = response_format(request)
+    if reading_cache.can_serve(node_id, limit):
+        readings = reading_cache.recent(node_id, limit)
+    else:
+        readings = get_sensor_readings_by_node(db, node_id, limit)
+    if media_type == MSGPACK:
+        return columnar_response(response, SensorReadingSample, readings, ("node_id",))
+    response.headers["Vary"] = "Accept"
+    return readings
+
+@app.get("/nodes/{node_id}/readings/latest", response_model=SensorReadingSample)
+def get_node_latest_reading(node_id: str, db: Session = Depends(get_db)):
+    """Get a node's latest sensor reading"""
+    if reading_cache.can_serve(node_id):
+        reading = reading_cache.latest(node_id)
+    else:
+        reading = get_latest_sensor_reading(db, node_id)
+    if not reading:
+        raise HTTPException(status_code=404, detail="No readings for node")
+    return reading
+
 @app.get("/maintenance", response_model=List[MaintenanceLogResponse])
-async def get_maintenance_tasks(db: Session = Depends(get_db)):
-    """Get all maintenance tasks"""
-    return get_maintenance_logs(db)
+def get_maintenance_tasks(
+    response: Response,
+    limit: Optional[int] = Query(None, description="Page size; omit to stream every task"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    db: Session = Depends(get_db)
+):
+    """Get all maintenance tasks, most recently scheduled first"""
+    if limit is None and cursor is None:
+        return StreamingResponse(
+            stream_query(iter_maintenance_logs, MaintenanceLogResponse),
+            media_type="application/json"
+        )
+    
+    after = cursor_values(cursor, 2)
+    if after:
+        try:
+            after = (datetime.fromisoformat(after[0]), int(after[1]))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+    logs = get_maintenance_logs(db, after=after, limit=page_limit(limit))
+    if logs:
+        set_next_cursor(response, logs, limit, logs[-1].scheduled_date, logs[-1].id)
+    return logs
 
 @app.post("/maintenance", response_model=MaintenanceLogResponse)
-async def create_maintenance_task(
+def create_maintenance_task(
     maintenance: MaintenanceLogCreate,
     db: Session = Depends(get_db)
 ):
@@ -181,7 +444,7 @@ async def create_maintenance_task(
     return create_maintenance_log(db, maintenance)
 
 @app.put("/maintenance/{task_id}", response_model=MaintenanceLogResponse)
-async def update_maintenance_task(
+def update_maintenance_task(
     task_id: int,
     maintenance: MaintenanceLogUpdate,
     db: Session = Depends(get_db)
@@ -193,7 +456,7 @@ async def update_maintenance_task(
     return update_maintenance_log(db, task_id, maintenance)
 
 @app.delete("/maintenance/{task_id}")
-async def delete_maintenance_task(task_id: int, db: Session = Depends(get_db)):
+def delete_maintenance_task(task_id: int, db: Session = Depends(get_db)):
     """Delete a maintenance task"""
     existing_task = get_maintenance_log_by_id(db, task_id)
     if not existing_task:
@@ -201,16 +464,82 @@ async def delete_maintenance_task(task_id: int, db: Session = Depends(get_db)):
     delete_maintenance_log(db, task_id)
     return {"message": "Maintenance task deleted successfully"}
 
-# Universal AI-powered maintenance prediction endpoint
-@app.get("/pipes/{pipe_id}/maintenance-prediction")
-async def predict_pipe_maintenance(pipe_id: str, db: Session = Depends(get_db)):
-    """Get AI-powered maintenance prediction for a specific pipe"""
-    pipe = get_pipe_by_id(db, pipe_id)
-    if not pipe:
-        raise HTTPException(status_code=404, detail="Pipe not found")
+def parse_sensor_readings(body: bytes, content_type: str) -> List[SensorReadingCreate]:
+    """Parse a JSON array, a single JSON object or NDJSON (one reading per line)"""
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return [
+            SensorReadingCreate.model_validate_json(line)
+            for line in body.splitlines()
+            if line.strip()
+        ]
+    readings = sensor_reading_body_adapter.validate_json(body)
+    return readings if isinstance(readings, list) else [readings]
+
+async def read_limited_body(request: Request, limit: int = MAX_READINGS_BODY_BYTES) -> bytes:
+    """Request body, refused with 413 as soon as Content-Length or the bytes received exceed `limit`"""
+    too_large = HTTPException(status_code=413, detail=f"At most {limit} bytes per request")
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+def read_sensor_readings(body: bytes, content_type: str) -> List[SensorReadingCreate]:
+    try:
+        readings = parse_sensor_readings(body, content_type)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
     
-    # Convert pipe data to dictionary for the AI model
-    pipe_data = {
+    if len(readings) > MAX_READINGS_PER_REQUEST:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_READINGS_PER_REQUEST} readings per request"
+        )
+    return readings
+
+def unknown_nodes(node_ids: List[str]) -> HTTPException:
+    return HTTPException(status_code=422, detail={"message": "Unknown node ids", "node_ids": node_ids[:100]})
+
+def check_node_ids(db: Session, readings: List[SensorReadingCreate]):
+    unknown = unknown_node_ids(db, (reading.node_id for reading in readings))
+    if unknown:
+        raise unknown_nodes(unknown)
+
+@app.post("/sensor-readings", response_model=SensorReadingAck, status_code=202)
+async def enqueue_sensor_readings(request: Request, db: Session = Depends(get_db)):
+    """Accept readings into the write-behind buffer and acknowledge immediately"""
+    readings = read_sensor_readings(await read_limited_body(request), request.headers.get("content-type", ""))
+    await run_in_threadpool(check_node_ids, db, readings)
+    if not await sensor_buffer.offer(readings):
+        raise HTTPException(
+            status_code=503,
+            detail="Sensor ingestion buffer is full",
+            headers={"Retry-After": "1"}
+        )
+    return SensorReadingAck(accepted=len(readings), pending=sensor_buffer.pending)
+
+@app.get("/sensor-readings/buffer")
+async def get_sensor_buffer_stats():
+    """Get write-behind buffer depth and flush counters"""
+    return sensor_buffer.stats()
+
+@app.post("/sensor-readings/batch", response_model=SensorReadingBatchResult)
+async def ingest_sensor_readings(request: Request, db: Session = Depends(get_db)):
+    """Bulk-ingest sensor readings synchronously (JSON array or NDJSON)"""
+    readings = read_sensor_readings(await read_limited_body(request), request.headers.get("content-type", ""))
+    try:
+        batches = await run_in_threadpool(create_sensor_readings_bulk, db, readings)
+    except UnknownNodeError as e:
+        raise unknown_nodes(e.node_ids)
+    return SensorReadingBatchResult(inserted=len(readings), batches=batches)
+
+def pipe_component(pipe: Pipe) -> dict:
+    """Pipe fields the maintenance model consumes"""
+    return {
         "id": pipe.id,
         "type": "pipe",
         "length": pipe.length,
@@ -221,8 +550,49 @@ async def predict_pipe_maintenance(pipe_id: str, db: Session = Depends(get_db)):
         "pressure_loss": pipe.pressure_loss,
         "installation_date": pipe.installation_date,
         "last_inspection": pipe.last_inspection,
-        "status": pipe.status
+        "status": pipe.status,
+        **maintenance_history.get("pipe", pipe.id)
     }
+
+def node_component(node: PipeNode) -> dict:
+    """Node fields the maintenance model consumes"""
+    latest = reading_cache.latest(node.id)
+    return {
+        "id": node.id,
+        "type": node.type,
+        "pressure": node.pressure,
+        "max_pressure": node.max_pressure,
+        "flow_rate": node.flow_rate,
+        "temperature": latest["temperature"] if latest else None,
+        "status": node.status,
+        "last_updated": node.last_updated,
+        "latitude": node.latitude,
+        "longitude": node.longitude,
+        **maintenance_history.get("node", node.id)
+    }
+
+def predict_components(components: List[dict], entity_types: List[str]) -> List[dict]:
+    """Batch-predict and tag each result with the entity it belongs to"""
+    predictions = maintenance_predictor.predict_maintenance_batch(components)
+    for component, entity_type, prediction in zip(components, entity_types, predictions):
+        prediction["entity_id"] = component["id"]
+        prediction["component_type"] = entity_type
+    return predictions
+
+async def run_inference(fn, *args):
+    """Run a prediction job (queries + model) on the inference pool instead of the event loop"""
+    try:
+        return await inference_pool.run(fn, *args)
+    except WorkerPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def pipe_maintenance_prediction(db: Session, pipe_id: str) -> dict:
+    pipe = get_pipe_by_id(db, pipe_id)
+    if not pipe:
+        raise HTTPException(status_code=404, detail="Pipe not found")
+    
+    # Convert pipe data to dictionary for the AI model
+    pipe_data = pipe_component(pipe)
     
     # Get AI prediction
     prediction = maintenance_predictor.predict_maintenance_date(pipe_data)
@@ -236,30 +606,20 @@ async def predict_pipe_maintenance(pipe_id: str, db: Session = Depends(get_db)):
         "material": pipe.material,
         "status": pipe.status,
         "installation_date": pipe.installation_date.isoformat() if pipe.installation_date else None,
-        "last_inspection": pipe.last_inspection.isoformat() if pipe.last_inspection else None
+        "last_inspection": pipe.last_inspection.isoformat() if pipe.last_inspection else None,
+        "completed_maintenances": pipe_data["num_past_maintenances"],
+        "maintenance_cost_to_date": pipe_data["maintenance_cost_to_date"]
     }
     
     return prediction
 
-@app.get("/nodes/{node_id}/maintenance-prediction")
-async def predict_node_maintenance(node_id: str, db: Session = Depends(get_db)):
-    """Get AI-powered maintenance prediction for a specific node"""
+def node_maintenance_prediction(db: Session, node_id: str) -> dict:
     node = get_pipe_node_by_id(db, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
     
     # Convert node data to dictionary for the AI model
-    node_data = {
-        "id": node.id,
-        "type": node.type,
-        "pressure": node.pressure,
-        "max_pressure": node.max_pressure,
-        "flow_rate": node.flow_rate,
-        "status": node.status,
-        "last_updated": node.last_updated,
-        "latitude": node.latitude,
-        "longitude": node.longitude
-    }
+    node_data = node_component(node)
     
     # Get AI prediction
     prediction = maintenance_predictor.predict_maintenance_date(node_data)
@@ -274,58 +634,195 @@ async def predict_node_maintenance(node_id: str, db: Session = Depends(get_db)):
         "max_pressure": node.max_pressure,
         "flow_rate": node.flow_rate,
         "status": node.status,
-        "last_updated": node.last_updated.isoformat() if node.last_updated else None
+        "last_updated": node.last_updated.isoformat() if node.last_updated else None,
+        "completed_maintenances": node_data["num_past_maintenances"],
+        "maintenance_cost_to_date": node_data["maintenance_cost_to_date"]
     }
     
     return prediction
 
+# Universal AI-powered maintenance prediction endpoint
+@app.get("/pipes/{pipe_id}/maintenance-prediction")
+async def predict_pipe_maintenance(pipe_id: str, db: Session = Depends(get_db)):
+    """Get AI-powered maintenance prediction for a specific pipe"""
+    return await run_inference(pipe_maintenance_prediction, db, pipe_id)
+
+@app.get("/nodes/{node_id}/maintenance-prediction")
+async def predict_node_maintenance(node_id: str, db: Session = Depends(get_db)):
+    """Get AI-powered maintenance prediction for a specific node"""
+    return await run_inference(node_maintenance_prediction, db, node_id)
+
 # Legacy endpoints for backward compatibility
 @app.post("/predict/leak")
-async def predict_leak_probability(pipe_id: str, db: Session = Depends(get_db)):
-    """Predict leak probability for a specific pipe (placeholder for ML model)"""
+def predict_leak_probability(pipe_id: str, db: Session = Depends(get_db)):
+    """Leak probability of a pipe from the online detector state of its end nodes"""
     pipe = db.query(Pipe).filter(Pipe.id == pipe_id).first()
     if not pipe:
         raise HTTPException(status_code=404, detail="Pipe not found")
-    
-    # Placeholder for ML model integration
-    import random
-    probability = random.uniform(0.1, 0.9)
+
+    probability = 0.0
+    factors = []
+    for node_id in (pipe.source_node_id, pipe.target_node_id):
+        risk = leak_detector.risk(node_id)
+        if risk is None:
+            factors.append(f"No sensor readings from node {node_id}")
+            continue
+        probability = max(probability, risk["score"])
+        if risk["pressure_z"] < -2:
+            factors.append(f"Pressure at node {node_id} {-risk['pressure_z']:.1f} sigma below normal")
+        if abs(risk["flow_z"]) > 2:
+            factors.append(f"Flow at node {node_id} {abs(risk['flow_z']):.1f} sigma off normal")
+
+    # Water unaccounted for at either end points at a loss along the network
+    for node_id in (pipe.source_node_id, pipe.target_node_id):
+        balance = mass_balance.node(node_id)
+        if balance is not None and balance["flagged"]:
+            probability = max(probability, 0.7)
+            factors.append(f"Node {node_id} loses {balance['residual']:.0f} L/min more than it passes on")
+
+    # An open alert on the pipe or either end outweighs the live score
+    alerts = get_active_leak_alerts_for(
+        db, [("pipe", pipe_id), ("node", pipe.source_node_id), ("node", pipe.target_node_id)]
+    )
+    if alerts:
+        probability = max(probability, 0.9)
+        factors.extend(f"Open {alert.severity} {alert.alert_type} alert on {alert.entity_type} {alert.entity_id}" for alert in alerts)
+
     risk_level = "low" if probability < 0.3 else "medium" if probability < 0.7 else "high"
-    
     return {
         "pipe_id": pipe_id,
-        "leak_probability": probability,
+        "leak_probability": round(probability, 3),
         "risk_level": risk_level,
-        "factors": [
-            "Age of pipe",
-            "Pressure variations",
-            "Material degradation",
-            "Historical maintenance"
-        ]
+        "factors": factors
+    }
+
+@app.get("/hydraulics/balance")
+def get_mass_balance(limit: int = Query(100, ge=1, le=10_000)):
+    """Get nodes whose inflow exceeds their outflow beyond tolerance, and per-district balances"""
+    return mass_balance.report(limit)
+
+@app.get("/leaks/{alert_id}/localize")
+def localize_leak(
+    alert_id: int,
+    hops: int = Query(3, ge=1, le=50, description="Search pipes up to this many pipes from the alert"),
+    limit: int = Query(20, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Rank the pipes around a leak alert by pressure loss beyond their rated loss"""
+    alert = get_leak_alert_by_id(db, alert_id)
+    if not alert:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    if alert.entity_type == "pipe":
+        pipe = get_pipe_by_id(db, alert.entity_id)
+        node_ids = [pipe.source_node_id, pipe.target_node_id] if pipe else []
+    else:
+        node_ids = [alert.entity_id]
+
+    result = mass_balance.localize(node_ids, hops, limit)
+    if result is None:
+        raise HTTPException(status_code=422, detail=f"{alert.entity_type} {alert.entity_id} is not in the network")
+    return {
+        "alert_id": alert.id,
+        "entity_type": alert.entity_type,
+        "entity_id": alert.entity_id,
+        "alert_type": alert.alert_type,
+        **result
     }
 
+@app.get("/predict/leak/detector")
+def get_leak_detector_stats():
+    """Get online leak detector counters"""
+    return leak_detector.stats()
+
 @app.post("/predict/maintenance")
 async def predict_maintenance_needs(entity_type: str, entity_id: str, db: Session = Depends(get_db)):
     """Predict maintenance needs for pipes or nodes using AI model"""
-    # Validate entity exists and get data
+    # Each prediction validates that the entity exists (404 otherwise)
     if entity_type == "pipe":
-        entity = get_pipe_by_id(db, entity_id)
-        if not entity:
-            raise HTTPException(status_code=404, detail="Pipe not found")
-        
-        # Use the pipe-specific endpoint
-        return await predict_pipe_maintenance(entity_id, db)
-        
+        return await run_inference(pipe_maintenance_prediction, db, entity_id)
     elif entity_type == "node":
-        entity = get_pipe_node_by_id(db, entity_id)
-        if not entity:
-            raise HTTPException(status_code=404, detail="Node not found")
-        
-        # Use the node-specific endpoint
-        return await predict_node_maintenance(entity_id, db)
-        
+        return await run_inference(node_maintenance_prediction, db, entity_id)
     else:
         raise HTTPException(status_code=400, detail="Invalid entity type")
 
+@app.get("/predict/maintenance/cache")
+async def get_prediction_cache_stats():
+    """Get maintenance prediction cache hit/miss counters"""
+    return prediction_cache.stats()
+
+@app.get("/predict/maintenance/pool")
+async def get_inference_pool_stats():
+    """Get inference worker pool occupancy, queue depth and wait times"""
+    return inference_pool.stats()
+
+@app.get("/admin/models")
+async def get_model_registry():
+    """List model versions and the one currently serving predictions"""
+    return model_registry.stats()
+
+# Components scored by a candidate model before it may replace the active one
+MODEL_WARM_UP_COMPONENTS = 128
+
+def activate_model_version(db: Session, version: str) -> dict:
+    components = (
+        [pipe_component(pipe) for pipe in get_pipes(db, limit=MODEL_WARM_UP_COMPONENTS)]
+        + [node_component(node) for node in get_pipe_nodes(db, limit=MODEL_WARM_UP_COMPONENTS)]
+    )
+    try:
+        return model_registry.swap(version, maintenance_predictor.feature_rows(components))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Model {version} cannot be activated: {e}")
+
+@app.post("/admin/models/{version}/activate")
+async def activate_model(version: str, db: Session = Depends(get_db)):
+    """Hot-swap the maintenance model to `version` after warming it up on live components"""
+    return await run_inference(activate_model_version, db, version)
+
+def batch_maintenance_prediction(db: Session, request: MaintenancePredictionBatchRequest) -> dict:
+    pipes = db.query(Pipe).filter(Pipe.id.in_(request.pipe_ids)).all() if request.pipe_ids else []
+    nodes = db.query(PipeNode).filter(PipeNode.id.in_(request.node_ids)).all() if request.node_ids else []
+    
+    found = {pipe.id for pipe in pipes} | {node.id for node in nodes}
+    not_found = [entity_id for entity_id in request.pipe_ids + request.node_ids if entity_id not in found]
+    
+    predictions = predict_components(
+        [pipe_component(pipe) for pipe in pipes] + [node_component(node) for node in nodes],
+        ["pipe"] * len(pipes) + ["node"] * len(nodes)
+    )
+    return {"predictions": predictions, "not_found": not_found}
+
+@app.post("/predict/maintenance/batch")
+async def predict_maintenance_batch(request: MaintenancePredictionBatchRequest, db: Session = Depends(get_db)):
+    """Predict maintenance for many pipes and nodes with a single model call"""
+    if len(request.pipe_ids) + len(request.node_ids) > MAX_PREDICTION_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_PREDICTION_BATCH} components per request")
+    return await run_inference(batch_maintenance_prediction, db, request)
+
+def fleet_maintenance_prediction(db: Session, component_type: str, limit: int) -> dict:
+    components, entity_types = [], []
+    if component_type in ("all", "pipe"):
+        for pipe in iter_pipes(db):
+            components.append(pipe_component(pipe))
+            entity_types.append("pipe")
+    if component_type in ("all", "node"):
+        for node in iter_pipe_nodes(db):
+            components.append(node_component(node))
+            entity_types.append("node")
+    
+    predictions = predict_components(components, entity_types)
+    predictions.sort(key=lambda p: (p["days_until_maintenance"], -p["estimated_cost"]))
+    return {"total_components": len(predictions), "predictions": predictions[:limit]}
+
+@app.get("/predict/maintenance/fleet")
+async def predict_fleet_maintenance(
+    component_type: str = Query("all", pattern="^(all|pipe|node)$"),
+    limit: int = Query(50, ge=1, le=MAX_PREDICTION_BATCH),
+    db: Session = Depends(get_db)
+):
+    """Rank the whole fleet by maintenance urgency (soonest first)"""
+    return await run_inference(fleet_maintenance_prediction, db, component_type, limit)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
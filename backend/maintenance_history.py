@@ -0,0 +1,101 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import MaintenanceLog
+
+# Only finished jobs count as past maintenance
+COMPLETED = "completed"
+
+def history_entry(log: MaintenanceLog) -> Dict:
+    """The fields of a log that the history table aggregates"""
+    return {
+        "entity_type": log.entity_type,
+        "entity_id": log.entity_id,
+        "completed": log.status == COMPLETED,
+        # A completed job without a performed date is taken to have run as scheduled
+        "performed": log.performed_date or log.scheduled_date,
+        "cost": log.cost or 0.0
+    }
+
+class MaintenanceHistoryTable:
+    """Per-entity maintenance history features, kept current as logs change.
+
+    `rebuild()` computes the count, last completion and total cost of
+    completed jobs for every entity with one grouped query; afterwards crud
+    passes the before/after entries of every log write to `apply`, so the
+    prediction endpoints look history up in memory instead of querying
+    per component.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (entity_type, entity_id) -> [count, last_performed, total_cost]
+        self._entities: Dict[Tuple[str, str], list] = {}
+
+    def rebuild(self, db: Session):
+        rows = db.execute(
+            select(
+                MaintenanceLog.entity_type,
+                MaintenanceLog.entity_id,
+                func.count(),
+                func.max(func.coalesce(MaintenanceLog.performed_date, MaintenanceLog.scheduled_date)),
+                func.coalesce(func.sum(MaintenanceLog.cost), 0.0)
+            )
+            .where(MaintenanceLog.status == COMPLETED)
+            .group_by(MaintenanceLog.entity_type, MaintenanceLog.entity_id)
+        ).all()
+        entities = {(entity_type, entity_id): [count, last, cost] for entity_type, entity_id, count, last, cost in rows}
+        with self._lock:
+            self._entities = entities
+        print(f"Maintenance history loaded for {len(entities)} components")
+
+    def apply(self, db: Session, before: Optional[Dict], after: Optional[Dict]):
+        """Fold a log change into the table (None for a created/deleted log)"""
+        stale = set()
+        with self._lock:
+            if before is not None and before["completed"]:
+                key = (before["entity_type"], before["entity_id"])
+                entry = self._entities.get(key)
+                if entry is not None:
+                    entry[0] -= 1
+                    entry[2] -= before["cost"]
+                    # The latest completion cannot be un-maxed; re-read this entity
+                    if entry[0] <= 0:
+                        del self._entities[key]
+                    elif entry[1] == before["performed"]:
+                        stale.add(key)
+            if after is not None and after["completed"]:
+                key = (after["entity_type"], after["entity_id"])
+                entry = self._entities.setdefault(key, [0, after["performed"], 0.0])
+                entry[0] += 1
+                entry[2] += after["cost"]
+                if entry[1] is None or (after["performed"] and after["performed"] > entry[1]):
+                    entry[1] = after["performed"]
+        for entity_type, entity_id in stale:
+            self._refresh(db, entity_type, entity_id)
+
+    def _refresh(self, db: Session, entity_type: str, entity_id: str):
+        last = db.execute(
+            select(func.max(func.coalesce(MaintenanceLog.performed_date, MaintenanceLog.scheduled_date)))
+            .where(
+                MaintenanceLog.status == COMPLETED,
+                MaintenanceLog.entity_type == entity_type,
+                MaintenanceLog.entity_id == entity_id
+            )
+        ).scalar()
+        with self._lock:
+            entry = self._entities.get((entity_type, entity_id))
+            if entry is not None:
+                entry[1] = last
+
+    def get(self, entity_type: str, entity_id: str) -> Dict:
+        """History features of one component (zeros when it has none)"""
+        with self._lock:
+            count, last, cost = self._entities.get((entity_type, entity_id), (0, None, 0.0))
+        return {"num_past_maintenances": count, "last_maintenance": last, "maintenance_cost_to_date": round(cost, 2)}
+
+# Global instance
+maintenance_history = MaintenanceHistoryTable()
@@ -0,0 +1,38 @@
+"""Lightweight schema migrations for existing databases.
+
+`Base.metadata.create_all` only creates missing tables, so indexes added to
+models after a database was first created never reach it. `ensure_indexes`
+creates any index declared in `models.py` that the database is missing.
+
+Run standalone against DATABASE_URL:
+    python migrations.py
+"""
+from typing import List
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from database import Base, engine
+import models  # noqa: F401  (registers the tables on Base.metadata)
+
+def ensure_indexes(bind: Engine = engine) -> List[str]:
+    """Create declared indexes missing from existing tables; returns their names"""
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue  # create_all will build the table together with its indexes
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                print(f"Creating index {index.name} on {table.name}...")
+                index.create(bind=bind)
+                created.append(index.name)
+
+    return created
+
+if __name__ == "__main__":
+    created = ensure_indexes()
+    print(f"Created {len(created)} missing indexes" if created else "All indexes present")
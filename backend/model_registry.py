@@ -0,0 +1,211 @@
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from prediction_cache import prediction_cache
+from tree_ensemble import CompiledForest
+
+# ai/ relative to this file, so the backend can start from any directory
+AI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ai")
+DEFAULT_MODEL_DIR = os.path.join(AI_DIR, "model")
+
+# The feature pipeline is imported from ai/ so training and serving share one copy
+if AI_DIR not in sys.path:
+    sys.path.append(AI_DIR)
+from feature_pipeline import FEATURE_COLUMNS
+
+# Version name of the unversioned regressor.* files directly in the model directory
+LEGACY_VERSION = "default"
+
+# Opt-in: batches at least this large go to the version's scikit-learn forest,
+# when it has one. 0 (the default) keeps scikit-learn out of the process
+BATCH_MODEL_ROWS = int(os.getenv("MODEL_BATCH_ROWS", "0"))
+
+class LoadedModel(NamedTuple):
+    version: str
+    # Incremented on every swap; part of the prediction cache key
+    generation: int
+    model: object
+    loaded_at: float
+
+def check_feature_schema(model, version: str):
+    """Refuse models trained on columns other than the shared pipeline's"""
+    columns = getattr(model, "feature_columns", None)
+    if columns is None and getattr(model, "feature_names_in_", None) is not None:
+        columns = tuple(model.feature_names_in_)
+    if columns is not None and tuple(columns) != FEATURE_COLUMNS:
+        raise ValueError(f"Model {version!r} was trained on columns {list(columns)}, expected {list(FEATURE_COLUMNS)}")
+    if getattr(model, "n_features_in_", len(FEATURE_COLUMNS)) != len(FEATURE_COLUMNS):
+        raise ValueError(f"Model {version!r} expects {model.n_features_in_} features, expected {len(FEATURE_COLUMNS)}")
+
+class BatchRoutedModel:
+    """Compiled forest for small batches, the same version's scikit-learn forest for large ones.
+
+    The pickle takes seconds to load, so it is loaded on a background thread;
+    until it is ready (or if it cannot be loaded) the compiled evaluator
+    scores every batch.
+    """
+
+    def __init__(self, compiled: CompiledForest, pickle_path: str, version: str, min_rows: int):
+        self.compiled = compiled
+        self.pickle_path = pickle_path
+        self.version = version
+        self.min_rows = min_rows
+        self.batch_model = None
+        self.n_features_in_ = compiled.n_features_in_
+        self.feature_columns = compiled.feature_columns
+
+    def start_loading(self):
+        threading.Thread(target=self._load_batch_model, name=f"batch-model-{self.version}", daemon=True).start()
+
+    def _load_batch_model(self):
+        try:
+            import joblib
+            model = joblib.load(self.pickle_path)
+            check_feature_schema(model, self.version)
+            self.batch_model = model
+        except Exception as e:
+            print(f"Batch model {self.version} not loaded, the compiled forest scores all batches: {e}")
+
+    def predict(self, X) -> np.ndarray:
+        batch_model = self.batch_model
+        if batch_model is not None and len(X) >= self.min_rows:
+            return batch_model.predict(X)
+        return self.compiled.predict(X)
+
+class ModelRegistry:
+    """Versioned maintenance-model artifacts with lazy loading and hot swap.
+
+    Each version is a subdirectory of `model_dir` holding `regressor.npz`
+    (preferred, evaluated without scikit-learn) and/or `regressor.pkl`. With
+    both and `MODEL_BATCH_ROWS` set, batches that large use the pickle. The
+    flat files of older checkouts count as version "default". Nothing is
+    loaded until the first prediction asks for the model. `swap()` loads and
+    warms the new version on the calling thread while the old one keeps
+    serving, then replaces the reference under a lock.
+    """
+
+    def __init__(self, model_dir: str, version: Optional[str] = None):
+        self.model_dir = model_dir
+        self.requested_version = version
+        self._lock = threading.Lock()
+        self._active: Optional[LoadedModel] = None
+        self._generation = 0
+        self._load_failed = False
+        self.swaps = 0
+
+    def versions(self) -> List[str]:
+        """Available versions, oldest first (version names sort chronologically)"""
+        if not os.path.isdir(self.model_dir):
+            return []
+        versions = sorted(
+            name for name in os.listdir(self.model_dir)
+            if self._artifact_path(name) and name != LEGACY_VERSION
+        )
+        if self._artifact_path(LEGACY_VERSION):
+            versions.insert(0, LEGACY_VERSION)
+        return versions
+
+    def _artifact_path(self, version: str) -> Optional[str]:
+        directory = self.model_dir if version == LEGACY_VERSION else os.path.join(self.model_dir, version)
+        if not os.path.isdir(directory):
+            return None
+        for filename in ("regressor.npz", "regressor.pkl"):
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def _load(self, version: str):
+        path = self._artifact_path(version) if version in self.versions() else None
+        if path is None:
+            raise FileNotFoundError(f"No model artifact for version {version!r} in {self.model_dir}")
+        if path.endswith(".npz"):
+            model = CompiledForest.load(path)
+        else:
+            # Only versions without an export need scikit-learn
+            import joblib
+            model = joblib.load(path)
+        check_feature_schema(model, version)
+        pickle_path = path[:-len(".npz")] + ".pkl"
+        if isinstance(model, CompiledForest) and BATCH_MODEL_ROWS > 0 and os.path.isfile(pickle_path):
+            model = BatchRoutedModel(model, pickle_path, version, BATCH_MODEL_ROWS)
+            model.start_loading()
+        return model
+
+    def active(self) -> Optional[LoadedModel]:
+        """The serving model, loading the configured (or newest) version on first use"""
+        active = self._active
+        if active is not None or self._load_failed:
+            return active
+        with self._lock:
+            if self._active is None and not self._load_failed:
+                versions = self.versions()
+                version = self.requested_version or (versions[-1] if versions else None)
+                try:
+                    if version is None:
+                        raise FileNotFoundError(f"No model artifacts in {self.model_dir}")
+                    start = time.perf_counter()
+                    self._generation += 1
+                    self._active = LoadedModel(version, self._generation, self._load(version), time.time())
+                    print(f"AI maintenance prediction model {version} loaded in {time.perf_counter() - start:.2f}s")
+                except Exception as e:
+                    print(f"Error loading model: {e}")
+                    self._load_failed = True
+            return self._active
+
+    def swap(self, version: str, warm_up_rows: Optional[np.ndarray] = None) -> Dict:
+        """Load, warm up and atomically activate `version`; raises if it cannot serve"""
+        start = time.perf_counter()
+        model = self._load(version)
+        load_seconds = time.perf_counter() - start
+
+        # A model that cannot score real rows must never become active
+        if warm_up_rows is None or len(warm_up_rows) == 0:
+            warm_up_rows = np.zeros((1, len(FEATURE_COLUMNS)))
+        start = time.perf_counter()
+        predictions = np.asarray(model.predict(warm_up_rows))
+        warm_up_seconds = time.perf_counter() - start
+        if predictions.shape != (len(warm_up_rows),) or not np.isfinite(predictions).all():
+            raise ValueError(f"Model {version!r} produced invalid warm-up predictions")
+
+        with self._lock:
+            previous = self._active
+            self._generation += 1
+            self._active = LoadedModel(version, self._generation, model, time.time())
+            self._load_failed = False
+            self.swaps += 1
+        # Entries keyed by the old generation could never hit again
+        prediction_cache.clear()
+        print(f"AI maintenance prediction model swapped to {version}")
+        return {
+            "version": version,
+            "previous_version": previous.version if previous else None,
+            "generation": self._generation,
+            "load_ms": round(load_seconds * 1000, 2),
+            "warm_up_rows": len(warm_up_rows),
+            "warm_up_ms": round(warm_up_seconds * 1000, 2)
+        }
+
+    def stats(self) -> Dict:
+        active = self._active
+        return {
+            "model_dir": self.model_dir,
+            "versions": self.versions(),
+            "active_version": active.version if active else None,
+            "generation": active.generation if active else None,
+            "model_type": type(active.model).__name__ if active else None,
+            "batch_model_loaded": getattr(active.model, "batch_model", None) is not None if active else False,
+            "loaded_at": active.loaded_at if active else None,
+            "swaps": self.swaps
+        }
+
+# Global instance
+model_registry = ModelRegistry(
+    model_dir=os.getenv("MODEL_DIR", DEFAULT_MODEL_DIR),
+    version=os.getenv("MODEL_VERSION") or None
+)
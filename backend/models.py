@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -56,6 +56,11 @@ class MaintenanceLog(Base):
     cost = Column(Float, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_maintenance_logs_entity_scheduled", "entity_type", "entity_id", "scheduled_date"),
+        Index("ix_maintenance_logs_scheduled_date", "scheduled_date"),
+    )
 
 class SensorReading(Base):
     __tablename__ = "sensor_readings"
@@ -69,6 +74,10 @@ class SensorReading(Base):
     
     # Relationship
     node = relationship("PipeNode")
+    
+    __table_args__ = (
+        Index("ix_sensor_readings_node_timestamp", "node_id", "timestamp"),
+    )
 
 class LeakAlert(Base):
     __tablename__ = "leak_alerts"
@@ -81,4 +90,9 @@ class LeakAlert(Base):
     description = Column(Text, nullable=True)
     is_resolved = Column(Boolean, default=False)
     detected_at = Column(DateTime, default=func.now())
-    resolved_at = Column(DateTime, nullable=True)
\ No newline at end of file
+    resolved_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_leak_alerts_entity_detected", "entity_type", "entity_id", "detected_at"),
+        Index("ix_leak_alerts_resolved_detected", "is_resolved", "detected_at"),
+    )
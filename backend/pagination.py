@@ -0,0 +1,75 @@
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Type
+
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from json_encoder import rows_json
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor for the sort key of the last row on a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> List:
+    """Inverse of encode_cursor; raises ValueError for anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
+
+def stream_json_array(rows: Iterable, schema: Type[BaseModel], chunk_size: int = 500) -> Iterator[bytes]:
+    """Serialize ORM rows into a JSON array, yielding one chunk per `chunk_size` rows"""
+    yield b"["
+    separator = b""
+    chunk = []
+    for row in rows:
+        chunk.append(schema.model_validate(row).model_dump_json().encode())
+        if len(chunk) >= chunk_size:
+            yield separator + b",".join(chunk)
+            separator = b","
+            chunk = []
+    if chunk:
+        yield separator + b",".join(chunk)
+    yield b"]"
+
+def stream_query(iter_rows: Callable[[Session], Iterable], schema: Type[BaseModel]) -> Iterator[bytes]:
+    """Stream a query as a JSON array from a session owned by the generator.
+
+    The request-scoped session from `get_db` may be closed before a streaming
+    body finishes, so the generator opens (and closes) its own.
+    """
+    db = SessionLocal()
+    try:
+        yield from stream_json_array(iter_rows(db), schema)
+    finally:
+        db.close()
+
+def stream_rows(iter_rows: Callable[[Session], Iterable], chunk_size: int = 1000) -> Iterator[bytes]:
+    """Stream Core result rows as a JSON array, encoding `chunk_size` rows at a time without validation.
+
+    Like `stream_query`, the generator owns its session.
+    """
+    db = SessionLocal()
+    try:
+        yield b"["
+        separator = b""
+        chunk = []
+        for row in iter_rows(db):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield separator + rows_json(chunk)[1:-1]
+                separator = b","
+                chunk = []
+        if chunk:
+            yield separator + rows_json(chunk)[1:-1]
+        yield b"]"
+    finally:
+        db.close()
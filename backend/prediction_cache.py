@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class PredictionCache:
+    """LRU + TTL cache of maintenance predictions, one entry per entity.
+
+    An entry is only a hit while the entity's feature-vector hash and the
+    model version both match what produced it, so stale predictions can never
+    be served even if an explicit invalidation is missed. crud still calls
+    `invalidate()` on every Pipe/PipeNode write to free the entry early.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # entity_id -> (feature_hash, model_version, expires_at, prediction)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, entity_id: str, feature_hash: bytes, model_version: int) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(entity_id)
+            if (
+                entry is None
+                or entry[0] != feature_hash
+                or entry[1] != model_version
+                or entry[2] < time.monotonic()
+            ):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entity_id)
+            self.hits += 1
+            return dict(entry[3])
+
+    def put(self, entity_id: str, feature_hash: bytes, model_version: int, prediction: Dict):
+        with self._lock:
+            self._entries[entity_id] = (feature_hash, model_version, time.monotonic() + self.ttl, dict(prediction))
+            self._entries.move_to_end(entity_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, entity_id: str):
+        with self._lock:
+            if self._entries.pop(entity_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+# Global instance
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+)
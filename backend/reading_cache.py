@@ -0,0 +1,179 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import SensorReading
+
+class NodeReadingRing:
+    """Fixed-size, array-backed ring of the most recent readings for one node"""
+
+    __slots__ = ("capacity", "timestamps", "pressure", "flow_rate", "temperature", "head", "count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)  # POSIX seconds
+        self.pressure = np.full(capacity, np.nan, dtype=np.float64)
+        self.flow_rate = np.full(capacity, np.nan, dtype=np.float64)
+        self.temperature = np.full(capacity, np.nan, dtype=np.float64)
+        self.head = 0  # slot the next reading is written to
+        self.count = 0
+
+    def append(self, timestamp: float, pressure, flow_rate, temperature):
+        if self.count and timestamp < self.timestamps[self.head - 1]:
+            self._insert_out_of_order(timestamp, pressure, flow_rate, temperature)
+            return
+
+        slot = self.head
+        self.timestamps[slot] = timestamp
+        self.pressure[slot] = np.nan if pressure is None else pressure
+        self.flow_rate[slot] = np.nan if flow_rate is None else flow_rate
+        self.temperature[slot] = np.nan if temperature is None else temperature
+        self.head = (slot + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _insert_out_of_order(self, timestamp: float, pressure, flow_rate, temperature):
+        """Late readings are rare: re-linearise the window and insert in time order"""
+        order = self._chronological_slots()
+        if self.count == self.capacity and timestamp < self.timestamps[order[0]]:
+            return  # older than anything kept in the window
+
+        timestamps = self.timestamps[order]
+        position = int(np.searchsorted(timestamps, timestamp, side="right"))
+        columns = [
+            (self.timestamps, timestamp),
+            (self.pressure, np.nan if pressure is None else pressure),
+            (self.flow_rate, np.nan if flow_rate is None else flow_rate),
+            (self.temperature, np.nan if temperature is None else temperature)
+        ]
+        for array, value in columns:
+            merged = np.insert(array[order], position, value)[-self.capacity:]
+            array[:len(merged)] = merged
+        self.count = min(self.count + 1, self.capacity)
+        self.head = self.count % self.capacity
+
+    def _chronological_slots(self) -> np.ndarray:
+        start = (self.head - self.count) % self.capacity
+        return (start + np.arange(self.count)) % self.capacity
+
+    def window(self, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Readings oldest-first as column arrays (copies, safe to keep)"""
+        slots = self._chronological_slots()
+        if limit is not None:
+            slots = slots[-limit:]
+        return {
+            "timestamp": self.timestamps[slots],
+            "pressure": self.pressure[slots],
+            "flow_rate": self.flow_rate[slots],
+            "temperature": self.temperature[slots]
+        }
+
+    def reading_at(self, slot: int, node_id: str) -> Dict:
+        return {
+            "node_id": node_id,
+            "pressure": _optional(self.pressure[slot]),
+            "flow_rate": _optional(self.flow_rate[slot]),
+            "temperature": _optional(self.temperature[slot]),
+            "timestamp": datetime.fromtimestamp(self.timestamps[slot])
+        }
+
+def _optional(value) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+class LatestReadingCache:
+    """Process-local cache of the last `window` readings of every node.
+
+    Ingestion keeps it current, so latest-value and recent-trend lookups are
+    answered from memory without an ORDER BY timestamp query.
+    """
+
+    def __init__(self, window: int = 288):
+        self.window = window
+        self._rings: Dict[str, NodeReadingRing] = {}
+        self._lock = threading.Lock()  # ingestion flushes run on executor threads
+        self.warmed = False
+
+    def record(self, node_id: str, timestamp: datetime, pressure=None, flow_rate=None, temperature=None):
+        with self._lock:
+            self._ring(node_id).append(timestamp.timestamp(), pressure, flow_rate, temperature)
+
+    def record_many(self, rows: Iterable[Dict]):
+        """Record reading dicts shaped like SensorReading columns"""
+        with self._lock:
+            for row in rows:
+                self._ring(row["node_id"]).append(
+                    row["timestamp"].timestamp(), row.get("pressure"), row.get("flow_rate"), row.get("temperature")
+                )
+
+    def _ring(self, node_id: str) -> NodeReadingRing:
+        ring = self._rings.get(node_id)
+        if ring is None:
+            ring = self._rings[node_id] = NodeReadingRing(self.window)
+        return ring
+
+    def can_serve(self, node_id: str, limit: int = 1) -> bool:
+        """True when the cache holds the answer for the newest `limit` readings"""
+        if not self.warmed:
+            return False
+        ring = self._rings.get(node_id)
+        # A ring that has never wrapped holds every reading the node has
+        return ring is None or limit <= ring.count or ring.count < ring.capacity
+
+    def latest(self, node_id: str) -> Optional[Dict]:
+        with self._lock:
+            ring = self._rings.get(node_id)
+            if ring is None or ring.count == 0:
+                return None
+            return ring.reading_at((ring.head - 1) % ring.capacity, node_id)
+
+    def recent(self, node_id: str, limit: int = 100) -> List[Dict]:
+        """Up to `limit` readings, newest first"""
+        with self._lock:
+            ring = self._rings.get(node_id)
+            if ring is None:
+                return []
+            slots = ring._chronological_slots()[::-1][:limit]
+            return [ring.reading_at(slot, node_id) for slot in slots]
+
+    def trend(self, node_id: str, limit: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """Column arrays for trend analysis, oldest first"""
+        with self._lock:
+            ring = self._rings.get(node_id)
+            return ring.window(limit) if ring is not None else None
+
+    def windows(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """Column arrays of every node, oldest first"""
+        with self._lock:
+            return {node_id: ring.window() for node_id, ring in self._rings.items()}
+
+    def warm(self, db: Session):
+        """Load the newest `window` readings of every node in a single query"""
+        ranked = select(
+            SensorReading.node_id,
+            SensorReading.pressure,
+            SensorReading.flow_rate,
+            SensorReading.temperature,
+            SensorReading.timestamp,
+            func.row_number().over(
+                partition_by=SensorReading.node_id,
+                order_by=SensorReading.timestamp.desc()
+            ).label("recency")
+        ).subquery()
+        rows = db.execute(
+            select(ranked.c.node_id, ranked.c.pressure, ranked.c.flow_rate, ranked.c.temperature, ranked.c.timestamp)
+            .where(ranked.c.recency <= self.window)
+            .order_by(ranked.c.node_id, ranked.c.timestamp)
+        ).mappings()
+
+        with self._lock:
+            self._rings = {}
+        self.record_many(rows)
+        self.warmed = True
+        print(f"Reading cache warmed for {len(self._rings)} nodes")
+
+# Global instance
+reading_cache = LatestReadingCache(window=int(os.getenv("READING_CACHE_WINDOW", "288")))
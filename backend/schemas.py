@@ -1,6 +1,11 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
+
+# Values the graph, stats, hydraulics and prediction code recognise
+NodeType = Literal["pump", "valve", "sensor", "junction"]
+NodeStatus = Literal["active", "offline", "unreported", "demand", "leak"]
+PipeStatus = Literal["operational", "maintenance", "damaged"]
 
 # Pipe Node Schemas
 class PipeNodeBase(BaseModel):
@@ -20,6 +25,16 @@ class PipeNodeResponse(PipeNodeBase):
     class Config:
         from_attributes = True
 
+class PipeNodeUpdate(BaseModel):
+    name: Optional[str] = None
+    type: Optional[NodeType] = None
+    pressure: Optional[float] = None
+    max_pressure: Optional[float] = None
+    flow_rate: Optional[float] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    status: Optional[NodeStatus] = None
+
 # Pipe Schemas
 class PipeBase(BaseModel):
     id: str
@@ -33,6 +48,18 @@ class PipeBase(BaseModel):
     pressure_loss: float = 0.0
     status: str = "operational"
 
+class PipeUpdate(BaseModel):
+    source_node_id: Optional[str] = None
+    target_node_id: Optional[str] = None
+    length: Optional[float] = None
+    diameter: Optional[float] = None
+    material: Optional[str] = None
+    flow_capacity: Optional[float] = None
+    current_flow: Optional[float] = None
+    pressure_loss: Optional[float] = None
+    status: Optional[PipeStatus] = None
+    last_inspection: Optional[datetime] = None
+
 class PipeResponse(PipeBase):
     installation_date: Optional[datetime] = None
     last_inspection: Optional[datetime] = None
@@ -94,6 +121,42 @@ class GraphData(BaseModel):
     nodes: List[GraphNode]
     edges: List[GraphEdge]
 
+class GraphDelta(BaseModel):
+    version: str  # "<epoch>-<n>", as in the /graph ETag
+    since: str
+    full_resync: bool  # client must refetch /graph; the change log no longer covers `since`
+    nodes: List[GraphNode]
+    edges: List[GraphEdge]
+
+class ClusterNode(BaseModel):
+    id: str
+    name: str
+    type: str
+    status: str  # worst status of the cluster's nodes
+    node_count: int
+    flow_rate: float
+    pressure: Optional[float]
+    position: Dict[str, float]
+    internal_pipes: int
+    internal_flow: float
+    status_counts: Dict[str, int]
+    type_counts: Dict[str, int]
+
+class ClusterEdge(BaseModel):
+    id: str
+    source: str
+    target: str
+    pipe_count: int
+    current_flow: float
+    flow_capacity: float
+    status: str
+
+class ClusteredGraph(BaseModel):
+    level: str
+    version: int
+    nodes: List[ClusterNode]
+    edges: List[ClusterEdge]
+
 # System Statistics Schema
 class SystemStats(BaseModel):
     total_nodes: int
@@ -114,6 +177,7 @@ class SensorReadingCreate(BaseModel):
     pressure: Optional[float] = None
     flow_rate: Optional[float] = None
     temperature: Optional[float] = None
+    timestamp: Optional[datetime] = None  # defaults to time of receipt
 
 class SensorReadingResponse(SensorReadingCreate):
     id: int
@@ -122,6 +186,29 @@ class SensorReadingResponse(SensorReadingCreate):
     class Config:
         from_attributes = True
 
+class SensorReadingSample(BaseModel):
+    node_id: str
+    pressure: Optional[float] = None
+    flow_rate: Optional[float] = None
+    temperature: Optional[float] = None
+    timestamp: datetime
+    
+    class Config:
+        from_attributes = True
+
+class SensorReadingBatchResult(BaseModel):
+    inserted: int
+    batches: int
+
+class SensorReadingAck(BaseModel):
+    accepted: int
+    pending: int
+
+# Maintenance Prediction Schemas
+class MaintenancePredictionBatchRequest(BaseModel):
+    pipe_ids: List[str] = []
+    node_ids: List[str] = []
+
 # Leak Alert Schema
 class LeakAlertCreate(BaseModel):
     entity_type: str
@@ -129,6 +216,7 @@ class LeakAlertCreate(BaseModel):
     alert_type: str
     severity: str = "medium"
     description: Optional[str] = None
+    detected_at: Optional[datetime] = None  # defaults to insert time
 
 class LeakAlertResponse(LeakAlertCreate):
     id: int
@@ -0,0 +1,107 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from graph_index import GraphIndex, gather, graph_index, ranges
+
+BBox = Tuple[float, float, float, float]
+
+class SpatialGrid:
+    """Uniform lon/lat grid over the node coordinates of the graph index.
+
+    Nodes are sorted by cell, column-major, so the cells of one grid
+    column inside a bounding box form a contiguous run of the sorted
+    order. A viewport query is then one binary search per column plus an
+    exact coordinate check on the candidates. The grid is rebuilt with one
+    sort on the first query after a node is added or moves; the other
+    writes (pressure, status, flow) don't touch it.
+    """
+
+    def __init__(self, index: GraphIndex, cell_degrees: float = 0.5):
+        self.index = index
+        self.cell_degrees = cell_degrees
+        self._lock = threading.Lock()
+        self._grid: Optional[Dict] = None
+        self.builds = 0
+
+    def grid(self) -> Dict:
+        with self._lock:
+            if self._grid is not None and self._grid["version"] == self.index.geometry_version:
+                return self._grid
+        geometry = self.index.geometry()
+        latitude, longitude = geometry["latitude"], geometry["longitude"]
+        placed = np.flatnonzero(~(np.isnan(latitude) | np.isnan(longitude)))
+        origin = (longitude[placed].min(), latitude[placed].min()) if len(placed) else (0.0, 0.0)
+        columns, rows = self._cells(origin, longitude[placed], latitude[placed])
+        height = int(rows.max()) + 1 if len(placed) else 1
+        keys = columns * height + rows
+        order = np.argsort(keys, kind="stable")
+        grid = {
+            **geometry,
+            "origin": origin,
+            "height": height,
+            "width": int(columns.max()) + 1 if len(placed) else 1,
+            "keys": keys[order],
+            "nodes": placed[order]
+        }
+        with self._lock:
+            self._grid = grid
+            self.builds += 1
+        return grid
+
+    def _cells(self, origin: Tuple[float, float], longitude, latitude) -> Tuple[np.ndarray, np.ndarray]:
+        columns = np.floor((np.asarray(longitude) - origin[0]) / self.cell_degrees).astype(np.int64)
+        rows = np.floor((np.asarray(latitude) - origin[1]) / self.cell_degrees).astype(np.int64)
+        return columns, rows
+
+    def query(self, bbox: BBox) -> np.ndarray:
+        """Integer ids of the nodes inside (min_lon, min_lat, max_lon, max_lat), ascending"""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        grid = self.grid()
+        (first_column, last_column), (first_row, last_row) = self._cells(grid["origin"], [min_lon, max_lon], [min_lat, max_lat])
+        first_column, last_column = max(first_column, 0), min(last_column, grid["width"] - 1)
+        first_row, last_row = max(first_row, 0), min(last_row, grid["height"] - 1)
+        if first_column > last_column or first_row > last_row:
+            return np.zeros(0, dtype=np.int64)
+
+        columns = np.arange(first_column, last_column + 1) * grid["height"]
+        starts = np.searchsorted(grid["keys"], columns + first_row)
+        ends = np.searchsorted(grid["keys"], columns + last_row, side="right")
+        candidates = grid["nodes"][ranges(starts, ends)]
+        latitude, longitude = grid["latitude"][candidates], grid["longitude"][candidates]
+        inside = (longitude >= min_lon) & (longitude <= max_lon) & (latitude >= min_lat) & (latitude <= max_lat)
+        return np.sort(candidates[inside])
+
+    def viewport(self, bbox: BBox) -> Tuple[List[Dict], List[Dict]]:
+        """Graph entries of the nodes inside a bounding box and of the pipes touching them.
+
+        The far end of a pipe crossing the edge of the box is included as
+        well, so every edge sent has both of its nodes.
+        """
+        inside = self.query(bbox)
+        adjacency = self.index.adjacency()
+        pipes = np.unique(np.r_[
+            gather(adjacency.out_indptr, adjacency.out_pipes, inside),
+            gather(adjacency.in_indptr, adjacency.in_pipes, inside)
+        ])
+        nodes = np.unique(np.r_[
+            inside,
+            gather(adjacency.out_indptr, adjacency.out_nodes, inside),
+            gather(adjacency.in_indptr, adjacency.in_nodes, inside)
+        ])
+        return self.index.entries(nodes, pipes)
+
+    def stats(self) -> Dict:
+        grid = self._grid
+        return {
+            "cell_degrees": self.cell_degrees,
+            "version": grid["version"] if grid else None,
+            "cells": grid["width"] * grid["height"] if grid else 0,
+            "nodes": len(grid["nodes"]) if grid else 0,
+            "builds": self.builds
+        }
+
+# Global instance
+spatial_grid = SpatialGrid(graph_index, cell_degrees=float(os.getenv("SPATIAL_CELL_DEGREES", "0.5")))
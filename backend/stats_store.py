@@ -0,0 +1,105 @@
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import PipeNode, Pipe
+
+# A pipe above this share of its capacity counts as vulnerable
+VULNERABLE_UTILIZATION = 0.9
+
+class SystemStatsAggregate:
+    """Running totals behind /stats, kept current as nodes and pipes change.
+
+    `rebuild()` seeds the totals with grouped aggregate queries; afterwards
+    crud passes the before/after graph entries of every node or pipe write to
+    `apply_node`/`apply_edge`, so reading the stats is O(1) regardless of the
+    network size.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.status_counts: Counter = Counter()
+        self.total_nodes = 0
+        self.pressure_sum = 0.0
+        self.pressure_count = 0
+        self.total_flow = 0.0
+        self.ideal_flow = 0.0
+        self.vulnerable_pipes: Dict[str, float] = {}  # id -> utilisation, for pipes above VULNERABLE_UTILIZATION
+
+    def rebuild(self, db: Session):
+        node_rows = db.execute(
+            select(PipeNode.status, func.count(), func.sum(PipeNode.pressure), func.count(PipeNode.pressure))
+            .group_by(PipeNode.status)
+        ).all()
+        total_flow, ideal_flow = db.execute(
+            select(func.sum(Pipe.current_flow), func.sum(Pipe.flow_capacity))
+        ).one()
+        vulnerable = db.execute(
+            select(Pipe.id, Pipe.current_flow, Pipe.flow_capacity)
+            .where(Pipe.current_flow > Pipe.flow_capacity * VULNERABLE_UTILIZATION)
+        ).all()
+
+        with self._lock:
+            self.status_counts = Counter({status: count for status, count, _, _ in node_rows})
+            self.total_nodes = sum(self.status_counts.values())
+            self.pressure_sum = sum(pressure_sum or 0.0 for _, _, pressure_sum, _ in node_rows)
+            self.pressure_count = sum(pressure_count for _, _, _, pressure_count in node_rows)
+            self.total_flow = total_flow or 0.0
+            self.ideal_flow = ideal_flow or 0.0
+            self.vulnerable_pipes = {pipe_id: _utilization(flow, capacity) for pipe_id, flow, capacity in vulnerable}
+
+    def apply_node(self, before: Optional[Dict], after: Optional[Dict]):
+        """Fold a node change into the totals (None for a created/deleted node)"""
+        with self._lock:
+            for entry, sign in ((before, -1), (after, 1)):
+                if entry is None:
+                    continue
+                self.total_nodes += sign
+                self.status_counts[entry["status"]] += sign
+                if entry["pressure"] is not None:
+                    self.pressure_sum += sign * entry["pressure"]
+                    self.pressure_count += sign
+
+    def apply_edge(self, before: Optional[Dict], after: Optional[Dict]):
+        """Fold a pipe change into the totals (None for a created/deleted pipe)"""
+        with self._lock:
+            for entry, sign in ((before, -1), (after, 1)):
+                if entry is None:
+                    continue
+                self.total_flow += sign * (entry["current_flow"] or 0.0)
+                self.ideal_flow += sign * entry["flow_capacity"]
+            if before is not None:
+                self.vulnerable_pipes.pop(before["id"], None)
+            if after is not None and (after["current_flow"] or 0.0) > after["flow_capacity"] * VULNERABLE_UTILIZATION:
+                self.vulnerable_pipes[after["id"]] = _utilization(after["current_flow"], after["flow_capacity"])
+
+    def snapshot(self) -> Dict:
+        """Field values for the SystemStats response"""
+        with self._lock:
+            counts = self.status_counts
+            total_nodes = self.total_nodes
+            # Highest utilisation wins; ties go to the larger id so the answer is stable
+            worst = max(self.vulnerable_pipes.items(), key=lambda item: (item[1], item[0]), default=None)
+            reporting = counts["active"] + counts["demand"]
+            return {
+                "total_nodes": total_nodes,
+                "active_nodes": counts["active"],
+                "down_nodes": counts["offline"],
+                "unreported_nodes": counts["unreported"],
+                "total_flow": self.total_flow,
+                "ideal_flow": self.ideal_flow,
+                "flow_difference": self.ideal_flow - self.total_flow,
+                "avg_pressure": self.pressure_sum / self.pressure_count if self.pressure_count else 0,
+                "current_leaks": counts["leak"],
+                "most_vulnerable_pipe": worst[0] if worst is not None else "None",
+                "sensor_reporting_percentage": (reporting / total_nodes * 100) if total_nodes > 0 else 0
+            }
+
+def _utilization(flow: float, capacity: float) -> float:
+    return flow / capacity if capacity > 0 else float("inf")
+
+# Global instance
+system_stats = SystemStatsAggregate()
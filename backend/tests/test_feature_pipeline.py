@@ -0,0 +1,81 @@
+"""Training and serving must build identical model inputs from the same records."""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_registry import AI_DIR, model_registry
+from feature_pipeline import FEATURE_COLUMNS, MEDIAN_FILLED, NUMERIC_FEATURES, RAW_COLUMNS, build_features
+from ai_prediction_service import maintenance_predictor
+from train_model import TARGET, iter_chunks
+
+DATA_PATH = os.path.join(AI_DIR, "data", "maintenance_prediction_data.csv")
+
+@pytest.fixture(scope="module")
+def raw() -> pd.DataFrame:
+    return pd.read_csv(DATA_PATH)
+
+@pytest.fixture(scope="module")
+def training() -> np.ndarray:
+    return np.concatenate([build_features(chunk) for chunk in iter_chunks(DATA_PATH, 300)])
+
+def legacy_features(df: pd.DataFrame) -> pd.DataFrame:
+    """The encoding train_model.py used before the shared pipeline"""
+    df = df.copy()
+    df["pressure_loss"] = df["pressure_loss"].fillna(0)
+    df["num_past_maintenances"] = df["num_past_maintenances"].fillna(0)
+    df = pd.get_dummies(df, columns=["material", "status"], drop_first=True)
+    return df.drop(columns=[TARGET, "entity_id", "entity_type"])
+
+def test_matches_legacy_get_dummies(raw, training):
+    legacy = legacy_features(raw)
+    assert tuple(legacy.columns) == FEATURE_COLUMNS
+    np.testing.assert_array_equal(legacy.to_numpy(dtype=np.float32), training)
+
+def test_record_array_and_dict_inputs(raw, training):
+    np.testing.assert_array_equal(build_features(raw[list(RAW_COLUMNS)].to_records(index=False)), training)
+    np.testing.assert_array_equal(build_features({c: raw[c].to_numpy() for c in RAW_COLUMNS}), training)
+
+def test_serving_matches_training(raw, training):
+    components = [
+        {"id": row["entity_id"], "type": row["entity_type"], **{c: row[c] for c in RAW_COLUMNS}}
+        for row in raw.to_dict("records")
+    ]
+    for component in components:
+        # CSV gaps arrive as NaN; live components leave unknown fields as None
+        for key, value in component.items():
+            if isinstance(value, float) and np.isnan(value):
+                component[key] = None
+    np.testing.assert_array_equal(maintenance_predictor._prepare_feature_batch(components)["features"], training)
+
+def live_components():
+    """A pipe and a node without readings, shaped like main.pipe_component/node_component"""
+    now = datetime.now()
+    pipe = {
+        "id": "PIPE-0001", "type": "pipe", "length": 1200.0, "diameter": 150.0, "material": "steel",
+        "current_flow": 900.0, "flow_capacity": 2000.0, "pressure_loss": 0.3,
+        "installation_date": now - timedelta(days=3000), "last_inspection": None, "status": "operational"
+    }
+    node = {
+        "id": "NODE-0001", "type": "junction", "pressure": 2.5, "max_pressure": 4.0, "flow_rate": None,
+        "temperature": None, "status": "active", "last_updated": now, "latitude": 19.0, "longitude": 72.8
+    }
+    return [pipe, node]
+
+def test_live_gaps_take_training_medians():
+    features = maintenance_predictor._prepare_feature_batch(live_components())["features"]
+    assert not np.isnan(features).any()
+    column = {name: i for i, name in enumerate(NUMERIC_FEATURES)}
+    pipe, node = features
+    for name in ("pressure", "max_pressure", "temperature"):
+        assert pipe[column[name]] == np.float32(MEDIAN_FILLED[name])
+    assert node[column["temperature"]] == np.float32(MEDIAN_FILLED["temperature"])
+    assert node[column["flow_rate"]] == np.float32(MEDIAN_FILLED["flow_rate"])
+    assert pipe[column["flow_rate"]] == 900.0
+
+@pytest.mark.skipif(not model_registry.versions(), reason="no trained model in MODEL_DIR")
+def test_live_components_are_scored_by_the_model():
+    predictions = maintenance_predictor.predict_maintenance_batch(live_components())
+    assert [p["prediction_source"] for p in predictions] == ["ai_model", "ai_model"]
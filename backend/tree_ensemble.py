@@ -0,0 +1,144 @@
+from typing import Dict
+
+import numpy as np
+
+class CompiledForest:
+    """Random-forest regressor evaluated with NumPy from the arrays written by ai/export_model.py.
+
+    Rows are scored in chunks. Every (row, tree) pair starts at its tree's
+    root and all pairs descend together, one level per step. At load the
+    nodes are renumbered breadth-first within each tree so siblings are
+    adjacent (left child = right child - 1), and each node's feature,
+    threshold and right child are packed into one 16-byte record. A step
+    is then a single gather of records, a gather of feature values, a
+    comparison and a subtraction.
+
+    Leaves have a NaN threshold and point at themselves, so finished pairs
+    keep stepping in place. They are only dropped from the active set once
+    they are the majority, because compacting any earlier costs more than
+    the steps it saves. Inputs are cast to float32 first, as scikit-learn
+    does. Each threshold is rounded down to a float32, so every split lands
+    on the same side as in the original model.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], chunk_rows: int = 256):
+        left, right = arrays["left"].astype(np.int64), arrays["right"].astype(np.int64)
+        n_nodes = len(left)
+        is_leaf = left == np.arange(n_nodes)
+
+        # Breadth-first order with children in (left, right) pairs, then grouped by tree
+        tree = np.empty(n_nodes, dtype=np.int64)
+        frontier = arrays["roots"].astype(np.int64)
+        tree[frontier] = np.arange(len(frontier))
+        levels = [frontier]
+        while len(frontier):
+            internal = frontier[~is_leaf[frontier]]
+            children = np.empty(2 * len(internal), dtype=np.int64)
+            children[0::2], children[1::2] = left[internal], right[internal]
+            tree[children] = np.repeat(tree[internal], 2)
+            levels.append(children)
+            frontier = children
+        order = np.concatenate(levels)
+        order = order[np.argsort(tree[order], kind="stable")]
+        new_id = np.empty(n_nodes, dtype=np.int64)
+        new_id[order] = np.arange(n_nodes)
+
+        # Largest float32 not above the float64 threshold, so x <= t gives the same answer
+        threshold = arrays["threshold"].astype(np.float32)
+        above = threshold.astype(np.float64) > arrays["threshold"]
+        threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+
+        # Record: [feature, threshold bits, right child, unused]; leaves test feature 0 against NaN
+        records = np.zeros((n_nodes, 4), dtype=np.int32)
+        records[new_id, 0] = np.where(is_leaf, 0, arrays["feature"])
+        records[new_id, 1] = np.where(is_leaf, np.float32(np.nan), threshold).view(np.int32)
+        records[new_id, 2] = np.where(is_leaf, new_id, new_id[right])
+        self.records = records.view(np.complex128).ravel()
+
+        self.is_leaf = np.empty(n_nodes, dtype=bool)
+        self.is_leaf[new_id] = is_leaf
+        self.value = np.empty(n_nodes, dtype=np.float64)
+        self.value[new_id] = arrays["value"]
+        # Never set on a leaf, so a missing value can't move a finished pair
+        self.missing_left = np.empty(n_nodes, dtype=bool)
+        self.missing_left[new_id] = arrays["missing_left"] & ~is_leaf
+        self.roots = new_id[arrays["roots"]].astype(np.int32)
+        self.n_features_in_ = int(arrays["n_features"])
+        # Absent (or empty) in exports that predate the shared feature pipeline
+        columns = arrays.get("feature_columns")
+        self.feature_columns = tuple(str(c) for c in columns) if columns is not None and len(columns) else None
+        self.chunk_rows = chunk_rows
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledForest":
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.records, self.is_leaf, self.value, self.missing_left, self.roots))
+
+    def predict(self, X) -> np.ndarray:
+        """Mean leaf value over all trees for each row of X (one row may be 1-D)"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features per row, got shape {X.shape}")
+
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), self.chunk_rows):
+            chunk = X[start:start + self.chunk_rows]
+            out[start:start + len(chunk)] = self.value[self._leaves(chunk)].mean(axis=1)
+        return out
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Leaf index reached in every tree, shape (rows, trees)"""
+        n_rows, n_trees = len(X), self.n_trees
+        flat = np.ascontiguousarray(X).ravel()
+        check_nan = bool(np.isnan(flat).any())
+
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.int32) * np.int32(X.shape[1]), n_trees)
+        leaves = nodes
+        active = None  # positions of the pairs still descending, once any were dropped
+        size = len(nodes)
+        records = np.empty(size, dtype=np.complex128)
+        index = np.empty(size, dtype=np.int32)
+        values = np.empty(size, dtype=np.float32)
+        went_left = np.empty(size, dtype=bool)
+        step = 0
+        while True:
+            np.take(self.records, nodes, out=records)
+            fields = records.view(np.int32).reshape(size, 4)
+            np.add(fields[:, 0], row_offsets, out=index)
+            np.take(flat, index, out=values)
+            np.less_equal(values, fields[:, 1].view(np.float32), out=went_left)
+            if check_nan:
+                missing = np.isnan(values)
+                went_left[missing] = self.missing_left.take(nodes[missing])
+            np.subtract(fields[:, 2], went_left, out=nodes)
+
+            # Checking every other step is cheaper; a finished pair just stays on its leaf
+            step += 1
+            if step % 2:
+                continue
+            done = self.is_leaf.take(nodes)
+            finished = np.count_nonzero(done)
+            if finished == size:
+                if active is not None:
+                    leaves[active] = nodes
+                return leaves.reshape(n_rows, n_trees)
+            if 2 * finished > size:
+                if active is None:
+                    leaves = np.empty_like(nodes)
+                    active = np.arange(size, dtype=np.int32)
+                finished, pending = np.flatnonzero(done), np.flatnonzero(~done)
+                leaves[active.take(finished)] = nodes.take(finished)
+                active, nodes, row_offsets = active.take(pending), nodes.take(pending), row_offsets.take(pending)
+                size = len(nodes)
+                records, index, values, went_left = records[:size], index[:size], values[:size], went_left[:size]
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+class WorkerPoolBusy(Exception):
+    """Raised when a job cannot get a worker within the queue limits"""
+
+class InferenceWorkerPool:
+    """Bounded thread pool for model inference and the queries that feed it.
+
+    `run()` is awaited from request handlers: at most `max_workers` jobs run
+    at once, up to `max_queue` more wait on the event loop (not in the
+    executor), and anything beyond that, or waiting longer than
+    `queue_timeout` seconds, is rejected with `WorkerPoolBusy`. A slow fleet
+    prediction therefore occupies one worker instead of the event loop.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 64, queue_timeout: float = 5.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="inference")
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run `fn(*args)` on a worker thread and return its result"""
+        self._ensure_started()
+        if self.queued >= self.max_queue and self._slots.locked():
+            self.rejected += 1
+            raise WorkerPoolBusy("Inference queue is full")
+
+        self.queued += 1
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise WorkerPoolBusy("Timed out waiting for an inference worker")
+        finally:
+            self.queued -= 1
+
+        waited = time.perf_counter() - queued_at
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+        self.running += 1
+        started_at = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            self._slots.release()
+        self.completed += 1
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._slots = None
+
+    def stats(self) -> Dict:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.max_workers,
+            "running": self.running,
+            "queued": self.queued,
+            "queue_capacity": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_seconds / finished * 1000, 2) if finished else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            "avg_run_ms": round(self.total_run_seconds / finished * 1000, 2) if finished else 0.0
+        }
+
+# Global instance
+inference_pool = InferenceWorkerPool(
+    max_workers=int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", "64")),
+    queue_timeout=float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "5.0"))
+)